@@ -0,0 +1,277 @@
+"""
+admission.py — controle de admissão por razão de reservas (ledger) por domínio/enlace.
+
+Hoje a sobrecarga só aparece depois do apply, quando a vazão despenca. Aqui
+cada intent reserva a sua garantia (min_mbps) em todos os recursos do
+caminho — os domínios (A, B, C, ...) e, se houver capacidade declarada para
+eles, os enlaces entre domínios consecutivos ("A-B", "B-C") — ANTES de
+synthesize_ir, e é recusado se algum não comporta.
+
+Capacidades: a porta mais rápida do perfil (budget.profile_capacity),
+sobreposta por variáveis de ambiente BW_<DOM>_MBPS (ex.: BW_A_MBPS=100, ver
+env_capacity) ou por valores explícitos. Recursos ainda não vistos são
+semeados sob demanda pelo `resolve_profile` (aceita A/B/C e profile_ids).
+
+Reservas por recurso ficam em somas de prefixo por nível de prioridade num
+array plano (4 posições por recurso): _pre[r·4 + p] = Σ reservado com rank ≤ p.
+Admitir/liberar custa O(|caminho| · 4); o total reservado é _pre[r·4 + 3] e o
+que um intent de rank p NÃO poderia preemptar é _pre[r·4 + p].
+
+Recusa: E_ADMIT_CAPACITY por recurso insuficiente (pedido, livre, capacidade)
+e uma contraproposta — a maior garantia que cabe hoje no caminho e, se
+preemptar reservas de prioridade menor resolveria, quanto seria preciso.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import re
+import threading
+from array import array
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from budget import path_domains, profile_capacity
+from fair_alloc import domain_links
+from intent import Intent, as_intent
+from plan_ir import PRIORITY_LEVELS
+
+_NPRIO = 4
+_EPS = 1e-9
+# só BW_<DOM>_MBPS: um prefixo solto (bw*) pegava variáveis alheias (bwrap → domínio "rap")
+_ENV_BW = re.compile(r"^BW_([A-Za-z0-9-]+)_MBPS$")
+
+
+class AdmitMsg:
+    def __init__(self, code: str, msg: str, resource: Optional[str] = None):
+        self.code = code
+        self.msg = msg
+        self.resource = resource
+
+
+class Decision:
+    __slots__ = ("key", "admitted", "resources", "min_mbps", "priority", "msgs", "offer")
+
+    def __init__(self, key: str, admitted: bool, resources: Sequence[str], min_mbps: float, priority: int,
+                 msgs: List[AdmitMsg], offer: Optional[Dict[str, Any]] = None):
+        self.key = key; self.admitted = admitted; self.resources = list(resources)
+        self.min_mbps = min_mbps; self.priority = priority
+        self.msgs = msgs; self.offer = offer
+
+    def to_json_dict(self) -> Dict[str, Any]:
+        out = {"key": self.key, "admitted": self.admitted, "resources": self.resources,
+               "min_mbps": self.min_mbps, "priority": PRIORITY_LEVELS[self.priority]}
+        if self.msgs:
+            out["msgs"] = [m.__dict__ for m in self.msgs]
+        if self.offer is not None:
+            out["counter_offer"] = self.offer
+        return out
+
+
+def env_capacity(env: Mapping[str, Any]) -> Dict[str, float]:
+    """BW_A_MBPS/BW_B_MBPS/BW_A-B_MBPS → {"A": Mbps, "B": Mbps, "A-B": Mbps}."""
+    out = {}
+    for k, v in env.items():
+        m = _ENV_BW.match(str(k))
+        if m and v not in (None, ""):
+            try:
+                out[m.group(1)] = float(v)
+            except (TypeError, ValueError):
+                continue
+    return out
+
+
+def spec_resources(spec: Any, profile: Optional[Dict[str, Any]] = None, it: Optional[Intent] = None) -> List[str]:
+    """Domínios do caminho (+ enlaces entre eles); sem caminho, o próprio perfil."""
+    doms = path_domains(spec, it)
+    if not doms:
+        return [profile["profile_id"]] if profile else []
+    return doms + (domain_links(doms) if len(doms) > 1 else [])
+
+
+class Ledger:
+    def __init__(self, resolve_profile: Optional[Callable[[str], Dict[str, Any]]] = None,
+                 capacity_mbps: Optional[Mapping[str, float]] = None):
+        self.resolve_profile = resolve_profile
+        self._declared = dict(capacity_mbps or {})   # sobreposições (ambiente / explícitas)
+        self._index: Dict[str, int] = {}
+        self._names: List[str] = []
+        self._cap = array("d")
+        self._pre = array("d")
+        self._count = array("l")
+        self._held: Dict[str, Tuple[Tuple[int, ...], int, float]] = {}   # chave → (recursos, rank, Mbps)
+        self._lock = threading.Lock()
+
+    # ------------------------- recursos -------------------------
+
+    def _seed(self, name: str) -> Optional[float]:
+        if name in self._declared:
+            return float(self._declared[name])
+        if self.resolve_profile is None:
+            return None
+        try:
+            return profile_capacity(self.resolve_profile(name))
+        except KeyError:
+            return None   # ex.: enlace "A-B" sem capacidade declarada — não é controlado
+
+    def _resource(self, name: str) -> Optional[int]:
+        r = self._index.get(name)
+        if r is not None:
+            return r
+        cap = self._seed(name)
+        if cap is None:
+            return None
+        r = self._index[name] = len(self._names)
+        self._names.append(name)
+        self._cap.append(cap)
+        self._pre.extend([0.0] * _NPRIO)
+        self._count.append(0)
+        return r
+
+    def _bump(self, r: int, rank: int, mbps: float, n: int) -> None:
+        base = r * _NPRIO
+        for p in range(rank, _NPRIO):
+            self._pre[base + p] += mbps
+        self._count[r] += n
+
+    def capacity(self, name: str) -> Optional[float]:
+        with self._lock:
+            r = self._resource(name)
+            return None if r is None else self._cap[r]
+
+    def reserved(self, name: str, rank: int = _NPRIO - 1) -> float:
+        """Reservado em `name` por intents de rank ≤ `rank` (default: todos)."""
+        with self._lock:
+            r = self._index.get(name)
+            return 0.0 if r is None else self._pre[r * _NPRIO + rank]
+
+    def free(self, name: str) -> float:
+        with self._lock:
+            r = self._resource(name)
+            return float("inf") if r is None else self._cap[r] - self._pre[r * _NPRIO + _NPRIO - 1]
+
+    # ------------------------- admissão -------------------------
+
+    def admit(self, spec: Any, profile: Optional[Dict[str, Any]] = None,
+              resources: Optional[Sequence[str]] = None, reserve: bool = True) -> Decision:
+        """
+        Admite (e reserva, se `reserve`) a garantia de `spec` em todo o caminho.
+        Reenviar a mesma chave (tenant/scope/flow) substitui a reserva anterior.
+        """
+        it = as_intent(spec)
+        key = f"{it.tenant}/{it.scope}/{it.flow_id}"
+        names = list(resources) if resources is not None else spec_resources(spec, profile, it)
+        rank = min(max(it.priority, 0), _NPRIO - 1)
+        need = it.min_mbps
+        with self._lock:
+            idx = [(n, self._resource(n)) for n in names]
+            idx = [(n, r) for n, r in idx if r is not None]
+            old = self._held.get(key)
+            own = set(old[0]) if old is not None else set()
+            old_mbps = old[2] if old is not None else 0.0
+            old_rank = old[1] if old is not None else _NPRIO
+            msgs: List[AdmitMsg] = []
+            best = float("inf")
+            preempt = 0.0
+            for n, r in idx:
+                base = r * _NPRIO
+                used = self._pre[base + _NPRIO - 1] - (old_mbps if r in own else 0.0)
+                free = self._cap[r] - used
+                best = min(best, free)
+                if need > free + _EPS:
+                    msgs.append(AdmitMsg(
+                        "E_ADMIT_CAPACITY",
+                        f"{n}: pedido {need:g} Mbps, livre {max(free, 0.0):g} de {self._cap[r]:g} Mbps "
+                        f"({self._count[r] - (1 if r in own else 0)} reservas)", n))
+                    # quanto, de prioridade MENOR, teria de ser preemptado neste recurso
+                    hard = self._pre[base + rank] - (old_mbps if r in own and old_rank <= rank else 0.0)
+                    if need <= self._cap[r] - hard + _EPS:
+                        preempt = max(preempt, need - free)
+                    else:
+                        preempt = float("inf")
+            if msgs:
+                offer: Dict[str, Any] = {}
+                fit = math.floor(max(best, 0.0) * 1000) / 1000
+                if fit > 0:
+                    offer["min_mbps"] = fit   # maior garantia que cabe agora
+                if preempt != float("inf"):
+                    offer["preempt_mbps"] = round(preempt, 6)   # ou: preemptar tanto de prioridade menor
+                return Decision(key, False, [n for n, _ in idx], need, rank, msgs, offer or None)
+            if reserve:
+                if old is not None:
+                    for r in old[0]:
+                        self._bump(r, old[1], -old[2], -1)
+                rs = tuple(r for _, r in idx)
+                for r in rs:
+                    self._bump(r, rank, need, 1)
+                self._held[key] = (rs, rank, need)
+            return Decision(key, True, [n for n, _ in idx], need, rank, [])
+
+    __call__ = admit
+
+    def release(self, key: str) -> bool:
+        with self._lock:
+            old = self._held.pop(key, None)
+            if old is None:
+                return False
+            for r in old[0]:
+                self._bump(r, old[1], -old[2], -1)
+            return True
+
+    # ------------------------- estado -------------------------
+
+    def usage(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return self._usage()
+
+    def _usage(self) -> Dict[str, Dict[str, float]]:
+        out = {}
+        for n, r in sorted(self._index.items()):
+            base = r * _NPRIO
+            res = self._pre[base + _NPRIO - 1]
+            out[n] = {"capacity_mbps": self._cap[r], "reserved_mbps": round(res, 6),
+                      "free_mbps": round(self._cap[r] - res, 6), "reservations": int(self._count[r]),
+                      "by_priority": {PRIORITY_LEVELS[p]: round(self._pre[base + p] - (self._pre[base + p - 1] if p else 0.0), 6)
+                                      for p in range(_NPRIO)}}
+        return out
+
+    def to_json_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return self._to_json_dict()
+
+    def _to_json_dict(self) -> Dict[str, Any]:
+        return {"capacity_mbps": {n: self._cap[r] for n, r in self._index.items()},
+                "reservations": {k: {"resources": [self._names[r] for r in rs],
+                                     "priority": PRIORITY_LEVELS[rank], "min_mbps": mbps}
+                                 for k, (rs, rank, mbps) in self._held.items()}}
+
+    def load_reservations(self, doc: Dict[str, Any]) -> None:
+        """Recarrega reservas de to_json_dict() (capacidades atuais prevalecem)."""
+        from plan_ir import priority_rank
+        with self._lock:
+            for k, v in doc.get("reservations", {}).items():
+                rs = tuple(r for r in (self._resource(n) for n in v["resources"]) if r is not None)
+                rank = min(max(priority_rank(v["priority"]), 0), _NPRIO - 1)
+                for r in rs:
+                    self._bump(r, rank, float(v["min_mbps"]), 1)
+                self._held[k] = (rs, rank, float(v["min_mbps"]))
+
+    def save(self, path: str) -> None:
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_json_dict(), f, indent=2, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def __len__(self) -> int:
+        return len(self._held)
+
+
+def open_ledger(path: Optional[str], resolve_profile: Optional[Callable[[str], Dict[str, Any]]] = None,
+                capacity_mbps: Optional[Mapping[str, float]] = None) -> Ledger:
+    """Ledger semeado pelas capacidades e com as reservas salvas em `path` (se existir)."""
+    led = Ledger(resolve_profile, capacity_mbps)
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            led.load_reservations(json.load(f))
+    return led
@@ -0,0 +1,232 @@
+"""
+async_apply.py — aplicação concorrente dos domínios (asyncio), com ordem declarada.
+
+Os domínios A (tc/HTB), B (NETCONF) e C (P4Runtime) eram aplicados um depois
+do outro, e o control_plane_ms_total era a soma das três latências. Aqui cada
+domínio é uma corrotina; as independentes rodam juntas e só esperam as que
+declararam em `after` (ex.: C depois de B quando o grupo multicast de C
+depende do encaminhamento de B). O resumo traz, por domínio, início/fim
+relativos ao despacho (ms) e em relógio de parede, e:
+
+  - control_plane_ms_total: makespan (despacho → último domínio termina);
+  - control_plane_ms_sum:   soma das latências (o total do modo sequencial);
+  - critical_path:          cadeia de dependências que definiu o makespan.
+
+Falha num domínio não cancela os independentes; os que dependem dele não
+rodam (ok=false, skipped=true). Os appliers concretos (tc -batch pelo
+tc_batch, NETCONF pelo netconf_pool, P4Runtime pelo p4rt_client) estão no
+fim do módulo; as chamadas bloqueantes vão para o executor padrão do loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+ApplyFn = Callable[[], Awaitable[Optional[Dict[str, Any]]]]
+
+
+class ApplyError(ValueError):
+    pass
+
+
+def _wall(t: float) -> str:
+    return datetime.fromtimestamp(t, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+class DomainApply:
+    __slots__ = ("domain", "fn", "after")
+
+    def __init__(self, domain: str, fn: ApplyFn, after: Sequence[str] = ()):
+        self.domain = domain; self.fn = fn; self.after = tuple(after)
+
+
+class DomainResult:
+    __slots__ = ("domain", "ok", "skipped", "start_ms", "end_ms", "t_wall_start", "t_wall_end",
+                 "after", "detail", "error")
+
+    def __init__(self, domain: str, after: Sequence[str] = ()):
+        self.domain = domain; self.after = tuple(after)
+        self.ok = False; self.skipped = False
+        self.start_ms = self.end_ms = 0.0
+        self.t_wall_start = self.t_wall_end = ""
+        self.detail: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+
+    @property
+    def ms(self) -> float:
+        return self.end_ms - self.start_ms
+
+    def to_json_dict(self) -> Dict[str, Any]:
+        out = {"ok": self.ok, "start_ms": round(self.start_ms, 3), "end_ms": round(self.end_ms, 3),
+               "ms": round(self.ms, 3), "t_wall_start": self.t_wall_start, "t_wall_end": self.t_wall_end}
+        if self.after:
+            out["after"] = list(self.after)
+        if self.skipped:
+            out["skipped"] = True
+        if self.detail:
+            out["detail"] = self.detail
+        if self.error:
+            out["error"] = self.error
+        return out
+
+
+class ApplySummary:
+    __slots__ = ("results", "t_wall_start", "makespan_ms")
+
+    def __init__(self, results: Dict[str, DomainResult], t_wall_start: str, makespan_ms: float):
+        self.results = results; self.t_wall_start = t_wall_start; self.makespan_ms = makespan_ms
+
+    @property
+    def ok(self) -> bool:
+        return all(r.ok for r in self.results.values())
+
+    def critical_path(self) -> List[str]:
+        # do domínio que terminou por último, volta pela dependência que terminou mais tarde
+        ran = {d: r for d, r in self.results.items() if not r.skipped}
+        if not ran:
+            return []
+        cur = max(ran.values(), key=lambda r: r.end_ms)
+        path = [cur.domain]
+        while cur.after:
+            deps = [ran[d] for d in cur.after if d in ran]
+            if not deps:
+                break
+            cur = max(deps, key=lambda r: r.end_ms)
+            path.append(cur.domain)
+        return path[::-1]
+
+    def to_json_dict(self) -> Dict[str, Any]:
+        return {
+            "mode": "concurrent",
+            "t_wall_start": self.t_wall_start,
+            "control_plane_ms_total": round(self.makespan_ms, 3),
+            "control_plane_ms_sum": round(sum(r.ms for r in self.results.values()), 3),
+            "critical_path": self.critical_path(),
+            "backend_apply": {d: r.ok for d, r in self.results.items()},
+            "domains": {d: r.to_json_dict() for d, r in self.results.items()},
+        }
+
+
+def check_order(applies: Sequence[DomainApply]) -> None:
+    """ApplyError se `after` cita domínio inexistente ou forma ciclo."""
+    deps = {a.domain: a.after for a in applies}
+    if len(deps) != len(applies):
+        raise ApplyError("domínio repetido")
+    for d, after in deps.items():
+        for x in after:
+            if x not in deps:
+                raise ApplyError(f"{d}: depende de domínio desconhecido {x}")
+    state: Dict[str, int] = {}   # 1 = visitando, 2 = ok
+
+    def visit(d: str, stack: List[str]) -> None:
+        if state.get(d) == 2:
+            return
+        if state.get(d) == 1:
+            raise ApplyError("ciclo em after: " + " → ".join(stack[stack.index(d):] + [d]))
+        state[d] = 1
+        for x in deps[d]:
+            visit(x, stack + [d])
+        state[d] = 2
+
+    for d in deps:
+        visit(d, [])
+
+
+async def apply_all(applies: Sequence[DomainApply]) -> ApplySummary:
+    check_order(applies)
+    t0 = time.perf_counter()
+    wall0 = time.time()
+    results = {a.domain: DomainResult(a.domain, a.after) for a in applies}
+    done = {a.domain: asyncio.Event() for a in applies}
+
+    def stamp(r: DomainResult, start: bool) -> None:
+        ms = (time.perf_counter() - t0) * 1000.0
+        wall = _wall(wall0 + ms / 1000.0)
+        if start:
+            r.start_ms, r.t_wall_start = ms, wall
+        else:
+            r.end_ms, r.t_wall_end = ms, wall
+
+    async def one(a: DomainApply) -> None:
+        r = results[a.domain]
+        try:
+            for d in a.after:
+                await done[d].wait()
+            failed = [d for d in a.after if not results[d].ok]
+            if failed:
+                stamp(r, True); r.end_ms, r.t_wall_end = r.start_ms, r.t_wall_start
+                r.skipped = True
+                r.error = f"não aplicado: dependência falhou ({', '.join(failed)})"
+                return
+            stamp(r, True)
+            try:
+                r.detail = await a.fn()
+                r.ok = True
+            except Exception as e:  # um domínio com erro não derruba os independentes
+                r.error = f"{type(e).__name__}: {e}"
+            stamp(r, False)
+        finally:
+            done[a.domain].set()
+
+    await asyncio.gather(*(one(a) for a in applies))
+    return ApplySummary(results, _wall(wall0), (time.perf_counter() - t0) * 1000.0)
+
+
+def run(applies: Sequence[DomainApply]) -> ApplySummary:
+    return asyncio.run(apply_all(applies))
+
+
+def parse_after(items: Optional[Sequence[str]]) -> Dict[str, List[str]]:
+    """["C:B", "C:A"] → {"C": ["B", "A"]} (C só depois de B e de A)."""
+    out: Dict[str, List[str]] = {}
+    for item in items or ():
+        d, sep, deps = item.partition(":")
+        if not sep or not d or not deps:
+            raise ApplyError(f"ordem inválida (esperado DOM:DEP[,DEP]): {item}")
+        out.setdefault(d.strip(), []).extend(x.strip() for x in deps.split(",") if x.strip())
+    return out
+
+
+# ------------------------- appliers por backend -------------------------
+
+def tc_apply(plan: Any, dev: str, force: bool = False, reset: bool = False,
+             tc: Sequence[str] = ("tc",), link_mbps: Optional[float] = None, prev: Any = None) -> ApplyFn:
+    """
+    Domínio A: o plano num único `tc -batch` (tc_batch.py) — inteiro, ou só o
+    delta desde `prev` (o último plano aplicado) —, com rollback das linhas
+    já aplicadas se alguma falhar. reset=True (exige prev) apaga e recria a
+    hierarquia no mesmo batch; se falhar, a configuração de prev volta.
+    """
+    from tc_batch import TcBatch
+
+    async def fn() -> Dict[str, Any]:
+        res = await TcBatch(dev, force=force, tc=tc).apply_async(plan, prev=prev, reset=reset, link_mbps=link_mbps)
+        if not res.ok:
+            first = res.errors[0]
+            where = (f"linha {first['line']} ({first.get('cmd', '?')})" if first["line"] is not None
+                     else "linha desconhecida")
+            raise RuntimeError(f"tc -batch {where}: {first['msg']}"
+                               f" [{len(res.errors)} erro(s), rollback={'sim' if res.rolled_back else 'não'}]")
+        return res.to_json_dict()
+    return fn
+
+
+def netconf_apply(pool: Any, target: Dict[str, Any], config: str) -> ApplyFn:
+    """Domínio B: edit-config por uma sessão do pool (netconf_pool.NetconfPool)."""
+    async def fn() -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        res = await loop.run_in_executor(None, pool.edit_config, target, config)
+        if not res.pop("ok"):
+            raise RuntimeError("edit-config sem <ok/>")
+        return res
+    return fn
+
+
+def p4rt_apply(client: Any, updates: List[Dict[str, Any]]) -> ApplyFn:
+    """Domínio C: um Write pelo canal persistente (p4rt_client.P4RuntimeClient)."""
+    async def fn() -> Dict[str, Any]:
+        return await client.write_updates_async(updates)
+    return fn
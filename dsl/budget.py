@@ -0,0 +1,168 @@
+"""
+budget.py — decomposição do orçamento fim a fim em sub-intents por domínio.
+
+Um spec multidomínio (scope "multidomain-A-B-C", ou endpoints em vários
+domínios) declara latência e banda fim a fim, mas cada domínio era tratado
+isoladamente e reservava como se tivesse o orçamento inteiro. Aqui o
+orçamento é repartido entre os domínios do caminho (em série):
+
+Latência — cada domínio i tem atraso medido d_i (ms) e recebe l_i ≥ d_i,
+com Σ l_i = L (max_ms do spec). Maximiza-se a menor folga relativa
+(l_i − d_i) / w_i, com peso w_i = max(d_i, DELAY_FLOOR_MS): domínios mais
+lentos (e mais variáveis) ganham folga proporcionalmente maior. O ótimo
+max-min iguala todas as folgas relativas:
+
+    t* = (L − Σ d_i) / Σ w_i,   l_i = d_i + w_i · t*
+
+Sem medições, todos os pesos são iguais e a divisão é uniforme. Σ d_i > L
+torna o spec inviável (E_BUDGET_LATENCY).
+
+Banda — no caminho em série todo domínio carrega a garantia inteira
+(min_mbps); o que se reparte é o teto: nenhum domínio reserva acima do
+gargalo, max_i = min(max_mbps, min_j cap_j), onde cap_j é a porta mais rápida
+do perfil (ou a capacidade informada em `capacity_mbps`), limitada pelo
+max_rate_mbps dos meters. cap_j < min_mbps → E_BUDGET_BANDWIDTH.
+"""
+
+from __future__ import annotations
+
+import csv
+import re
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from intent import Intent, as_intent
+
+DELAY_FLOOR_MS = 0.1
+_MULTIDOMAIN = re.compile(r"^multidomain-(.+)$")
+
+
+class BudgetMsg:
+    def __init__(self, code: str, msg: str, domain: Optional[str] = None):
+        self.code = code
+        self.msg = msg
+        self.domain = domain
+
+
+class DomainBudget:
+    __slots__ = ("domain", "profile_id", "measured_ms", "latency_ms", "headroom_ms",
+                 "capacity_mbps", "min_mbps", "max_mbps")
+
+    def __init__(self, domain: str, profile_id: str, measured_ms: float, latency_ms: Optional[float],
+                 capacity_mbps: float, min_mbps: float, max_mbps: float):
+        self.domain = domain; self.profile_id = profile_id
+        self.measured_ms = measured_ms; self.latency_ms = latency_ms
+        self.headroom_ms = None if latency_ms is None else latency_ms - measured_ms
+        self.capacity_mbps = capacity_mbps; self.min_mbps = min_mbps; self.max_mbps = max_mbps
+
+    def to_json_dict(self) -> Dict[str, Any]:
+        out = {s: getattr(self, s) for s in self.__slots__}
+        for k in ("latency_ms", "headroom_ms"):
+            if out[k] is not None:
+                out[k] = round(out[k], 6)
+        return out
+
+
+class Budget:
+    __slots__ = ("flow_id", "latency_ms", "min_mbps", "max_mbps", "domains", "headroom_ratio", "bottleneck")
+
+    def __init__(self, flow_id: str, latency_ms: Optional[float], min_mbps: float, max_mbps: float,
+                 domains: List[DomainBudget], headroom_ratio: Optional[float], bottleneck: Optional[str]):
+        self.flow_id = flow_id; self.latency_ms = latency_ms
+        self.min_mbps = min_mbps; self.max_mbps = max_mbps
+        self.domains = domains; self.headroom_ratio = headroom_ratio; self.bottleneck = bottleneck
+
+    def to_json_dict(self) -> Dict[str, Any]:
+        return {
+            "flow_id": self.flow_id,
+            "e2e": {"latency_ms": self.latency_ms, "min_mbps": self.min_mbps, "max_mbps": self.max_mbps},
+            "headroom_ratio": None if self.headroom_ratio is None else round(self.headroom_ratio, 6),
+            "bottleneck": self.bottleneck,
+            "domains": [d.to_json_dict() for d in self.domains],
+        }
+
+
+def path_domains(spec: Any, it: Optional[Intent] = None) -> List[str]:
+    """Domínios do caminho: scope "multidomain-A-B-C" ou os endpoints do spec."""
+    it = it or as_intent(spec)
+    m = _MULTIDOMAIN.match(it.scope or "")
+    if m:
+        return [d for d in m.group(1).split("-") if d]
+    return list(it.domains)
+
+
+def profile_capacity(profile: Dict[str, Any]) -> float:
+    cap = max((float(p["speed_mbps"]) for p in profile.get("ports", [])), default=float("inf"))
+    meters = profile.get("meters", {})
+    if meters.get("supported") and "max_rate_mbps" in meters:
+        cap = min(cap, float(meters["max_rate_mbps"]))
+    return cap
+
+
+def split_latency(total_ms: float, measured: Sequence[float]) -> Tuple[Optional[List[float]], float]:
+    """(l_i, t*) do max-min de folga relativa; l_i = None se Σ d_i > total."""
+    weights = [max(d, DELAY_FLOOR_MS) for d in measured]
+    t = (total_ms - sum(measured)) / sum(weights)
+    if t < 0:
+        return None, t
+    return [d + w * t for d, w in zip(measured, weights)], t
+
+
+def decompose(spec: Any, resolve_profile: Callable[[str], Dict[str, Any]],
+              delays_ms: Optional[Dict[str, float]] = None,
+              capacity_mbps: Optional[Dict[str, float]] = None,
+              domains: Optional[Sequence[str]] = None) -> Tuple[Optional[Budget], List[BudgetMsg]]:
+    """
+    Orçamento por domínio para `spec`. `resolve_profile` mapeia o nome do
+    domínio (A, B, domC, ...) para o perfil; `delays_ms` e `capacity_mbps` são
+    medições/limites por domínio (ausente = 0 ms / porta do perfil).
+    """
+    it = as_intent(spec)
+    doms = list(domains) if domains else path_domains(spec, it)
+    if not doms:
+        return None, []
+    delays_ms = delays_ms or {}
+    capacity_mbps = capacity_mbps or {}
+    errs: List[BudgetMsg] = []
+    profiles = []
+    for d in doms:
+        try:
+            profiles.append(resolve_profile(d))
+        except KeyError as e:
+            errs.append(BudgetMsg("E_BUDGET_PROFILE", str(e.args[0] if e.args else e), d))
+    if errs:
+        return None, errs
+
+    measured = [float(delays_ms.get(d, 0.0)) for d in doms]
+    caps = [float(capacity_mbps.get(d, profile_capacity(p))) for d, p in zip(doms, profiles)]
+    lat = it.latency_ms
+    shares: List[Optional[float]] = [None] * len(doms)
+    ratio = None
+    if lat is not None:
+        split, ratio = split_latency(lat, measured)
+        if split is None:
+            errs.append(BudgetMsg("E_BUDGET_LATENCY",
+                                  f"atraso medido somado {sum(measured):g} ms excede max_ms {lat:g}"))
+        else:
+            shares = split
+    for d, c in zip(doms, caps):
+        if c < it.min_mbps:
+            errs.append(BudgetMsg("E_BUDGET_BANDWIDTH",
+                                  f"domínio {d} comporta {c:g} Mbps < min_mbps {it.min_mbps:g}", d))
+    if errs:
+        return None, errs
+
+    k = min(range(len(doms)), key=lambda i: caps[i])
+    ceil = min(max(it.max_mbps, it.min_mbps), caps[k])
+    out = [DomainBudget(d, p["profile_id"], m, s, c, it.min_mbps, ceil)
+           for d, p, m, s, c in zip(doms, profiles, measured, shares, caps)]
+    return Budget(it.flow_id, lat, it.min_mbps, ceil, out, ratio, doms[k]), []
+
+
+def load_rtt_csv(path: str, percentile: str = "P99") -> float:
+    """Percentil de rtt_ms de um CSV de medição (t_ms,seq,rtt_ms) dos cenários."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        vals = sorted(float(r["rtt_ms"]) for r in csv.DictReader(f) if r.get("rtt_ms"))
+    if not vals:
+        return 0.0
+    q = {"P50": 0.50, "P95": 0.95, "P99": 0.99}.get(str(percentile).upper(), 0.99)
+    return vals[min(len(vals) - 1, int(round(q * (len(vals) - 1))))]
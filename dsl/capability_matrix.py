@@ -0,0 +1,191 @@
+"""
+capability_matrix.py — verificação de capacidades em lote (N specs × M perfis).
+
+Complementa check_capabilities(spec, profile), que decide uma célula por
+chamada: aqui os requisitos dos N specs (banda mín/máx, prioridade, multicast)
+e os limites dos M perfis (faixa dos meters, velocidade de porta, max_queues,
+modo/grupos multicast) viram vetores NumPy, e cada regra é uma comparação
+N×1 contra 1×M. O resultado sai numa passada só:
+
+  status[i, j]   0 = allow, 1 = adjust, 2 = deny   (uint8)
+  reasons[i, j]  máscara de bits dos motivos       (uint16, ver REASONS)
+
+status é a maior severidade entre os motivos presentes. As regras cobrem os
+limites numéricos declarados no schema l2i-capability-v0; verificações que
+dependem do conteúdo do plano continuam em check_capabilities. Um modo de
+multicast fora de MC_MODES vira MC_UNKNOWN (listado em
+ProfileArrays.unknown_modes) e nega os specs com multicast nesse perfil.
+compare_scalar confere uma amostra de células contra check_capabilities.
+
+Uso:
+    m = check_matrix(specs, profiles)
+    m.status_name(i, j), m.reason_codes(i, j)
+    m.to_json_dict()   # {"specs", "profiles", "status", "reasons"}
+    compare_scalar(m, specs, profiles, check_capabilities, max_cells=1000)
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from intent import as_intent
+
+STATUS = ("allow", "adjust", "deny")
+ALLOW, ADJUST, DENY = 0, 1, 2
+
+# bit i de reasons ↔ REASONS[i] = (código, severidade)
+REASONS = (
+    ("E_CAP_METER_UNSUPPORTED", DENY),   # banda pedida, perfil sem meters
+    ("E_CAP_MIN_ABOVE_METER", DENY),     # min_mbps > max_rate_mbps
+    ("E_CAP_MIN_ABOVE_PORT", DENY),      # min_mbps > porta mais rápida
+    ("E_CAP_MC_UNSUPPORTED", DENY),      # multicast pedido, modo "none"
+    ("E_CAP_MC_NO_GROUPS", DENY),        # multicast pedido, max_groups = 0
+    ("W_CAP_MIN_BELOW_METER", ADJUST),   # min_mbps < min_rate_mbps: sobe para o mínimo
+    ("W_CAP_MAX_ABOVE_METER", ADJUST),   # max_mbps > max_rate_mbps: teto limitado
+    ("W_CAP_MAX_ABOVE_PORT", ADJUST),    # max_mbps > porta mais rápida: teto limitado
+    ("W_CAP_PRIORITY_MERGED", ADJUST),   # nível de prioridade sem fila própria
+    ("W_CAP_MC_FLOOD", ADJUST),          # multicast emulado por flood na VLAN
+    ("E_CAP_MC_MODE_UNKNOWN", DENY),     # multicast pedido, modo fora de MC_MODES
+)
+_BIT = {code: 1 << i for i, (code, _) in enumerate(REASONS)}
+_DENY_MASK = sum(_BIT[c] for c, sev in REASONS if sev == DENY)
+_ADJUST_MASK = sum(_BIT[c] for c, sev in REASONS if sev == ADJUST)
+
+MC_MODES = ("none", "vlan_flood", "l2mc_static")
+MC_UNKNOWN = -1
+_MC_INDEX = {mode: i for i, mode in enumerate(MC_MODES)}
+
+
+class SpecArrays:
+    """Requisitos de N specs em colunas (um vetor por campo)."""
+
+    __slots__ = ("ids", "min_mbps", "max_mbps", "priority", "mc_enabled")
+
+    def __init__(self, specs: Sequence[Any]):
+        intents = [as_intent(s) for s in specs]
+        n = len(intents)
+        self.ids = [it.flow_id for it in intents]
+        self.min_mbps = np.fromiter((it.min_mbps for it in intents), np.float64, n)
+        self.max_mbps = np.fromiter((it.max_mbps for it in intents), np.float64, n)
+        self.priority = np.fromiter((it.priority for it in intents), np.int16, n)
+        self.mc_enabled = np.fromiter((it.mc_enabled for it in intents), np.bool_, n)
+
+
+class ProfileArrays:
+    """Limites de M perfis em colunas."""
+
+    __slots__ = ("ids", "meters", "meter_min", "meter_max", "port_max", "max_queues",
+                 "mc_mode", "mc_groups", "unknown_modes")
+
+    def __init__(self, profiles: Sequence[Dict[str, Any]]):
+        m = len(profiles)
+        self.ids = [p["profile_id"] for p in profiles]
+        meters = [p.get("meters", {}) for p in profiles]
+        self.meters = np.fromiter((bool(x.get("supported")) for x in meters), np.bool_, m)
+        self.meter_min = np.fromiter((x.get("min_rate_mbps", 0.0) for x in meters), np.float64, m)
+        self.meter_max = np.fromiter((x.get("max_rate_mbps", np.inf) for x in meters), np.float64, m)
+        self.port_max = np.fromiter(
+            (max((pt["speed_mbps"] for pt in p.get("ports", [])), default=np.inf) for p in profiles),
+            np.float64, m)
+        self.max_queues = np.fromiter((p["queues"]["max_queues"] for p in profiles), np.int16, m)
+        modes = [p["multicast"].get("mode") for p in profiles]
+        self.mc_mode = np.fromiter((_MC_INDEX.get(x, MC_UNKNOWN) for x in modes), np.int8, m)
+        self.unknown_modes = {pid: x for pid, x in zip(self.ids, modes) if x not in _MC_INDEX}
+        self.mc_groups = np.fromiter((p["multicast"].get("max_groups", 1) for p in profiles), np.int64, m)
+
+
+class CapabilityMatrix:
+    __slots__ = ("spec_ids", "profile_ids", "status", "reasons")
+
+    def __init__(self, spec_ids: List[str], profile_ids: List[str], status: Any, reasons: Any):
+        self.spec_ids = spec_ids; self.profile_ids = profile_ids
+        self.status = status; self.reasons = reasons
+
+    def status_name(self, i: int, j: int) -> str:
+        return STATUS[int(self.status[i, j])]
+
+    def reason_codes(self, i: int, j: int) -> List[str]:
+        return decode_reasons(int(self.reasons[i, j]))
+
+    def counts(self) -> Dict[str, int]:
+        c = np.bincount(self.status.ravel(), minlength=len(STATUS))
+        return {name: int(c[k]) for k, name in enumerate(STATUS)}
+
+    def to_json_dict(self) -> Dict[str, Any]:
+        return {
+            "specs": self.spec_ids,
+            "profiles": self.profile_ids,
+            "status": self.status.tolist(),
+            "reasons": self.reasons.tolist(),
+            "reason_bits": [code for code, _ in REASONS],
+        }
+
+
+def decode_reasons(mask: int) -> List[str]:
+    return [code for i, (code, _) in enumerate(REASONS) if mask >> i & 1]
+
+
+def check_matrix(specs: Any, profiles: Any) -> CapabilityMatrix:
+    """
+    Decide as N×M células de uma vez. `specs` e `profiles` podem ser listas
+    (specs/Intents e dicts de perfil) ou SpecArrays/ProfileArrays já montados,
+    para reaproveitar a codificação entre chamadas.
+    """
+    s = specs if isinstance(specs, SpecArrays) else SpecArrays(specs)
+    p = profiles if isinstance(profiles, ProfileArrays) else ProfileArrays(profiles)
+    lo, hi = s.min_mbps[:, None], s.max_mbps[:, None]
+    want_bw = lo > 0
+    mc = s.mc_enabled[:, None]
+    rules = (
+        ("E_CAP_METER_UNSUPPORTED", want_bw & ~p.meters),
+        ("E_CAP_MIN_ABOVE_METER", want_bw & p.meters & (lo > p.meter_max)),
+        ("E_CAP_MIN_ABOVE_PORT", lo > p.port_max),
+        ("E_CAP_MC_UNSUPPORTED", mc & (p.mc_mode == 0)),
+        ("E_CAP_MC_NO_GROUPS", mc & (p.mc_mode > 0) & (p.mc_groups < 1)),
+        ("W_CAP_MIN_BELOW_METER", want_bw & p.meters & (lo < p.meter_min)),
+        ("W_CAP_MAX_ABOVE_METER", want_bw & p.meters & (hi > p.meter_max) & (lo <= p.meter_max)),
+        ("W_CAP_MAX_ABOVE_PORT", (hi > p.port_max) & (lo <= p.port_max)),
+        # níveis 0..3; com menos de 4 filas os níveis ≥ max_queues dividem fila
+        ("W_CAP_PRIORITY_MERGED", s.priority[:, None] >= p.max_queues),
+        ("W_CAP_MC_FLOOD", mc & (p.mc_mode == 1)),
+        ("E_CAP_MC_MODE_UNKNOWN", mc & (p.mc_mode == MC_UNKNOWN)),
+    )
+    reasons = np.zeros((len(s.ids), len(p.ids)), np.uint16)
+    for code, hit in rules:
+        reasons |= np.where(hit, np.uint16(_BIT[code]), np.uint16(0))
+    status = np.where(reasons & _DENY_MASK, DENY,
+                      np.where(reasons & _ADJUST_MASK, ADJUST, ALLOW)).astype(np.uint8)
+    return CapabilityMatrix(s.ids, p.ids, status, reasons)
+
+
+def compare_scalar(m: CapabilityMatrix, specs: Sequence[Any], profiles: Sequence[Dict[str, Any]],
+                   check: Callable[[Any, Dict[str, Any]], Any],
+                   max_cells: Optional[int] = None, max_report: int = 20) -> Dict[str, Any]:
+    """
+    Confere células da matriz contra check(spec, profile) → (status, spec, msgs)
+    (a assinatura de check_capabilities). Com max_cells, amostra células em passo
+    fixo sobre as N×M. Divergências esperadas só onde check_capabilities olha
+    além dos limites numéricos; o resto é bug de uma das duas implementações.
+    O relatório lista só as primeiras max_report divergências.
+    """
+    n, k = len(m.spec_ids), len(m.profile_ids)
+    total = n * k
+    step = max(1, total // max_cells) if max_cells else 1
+    while step > 1 and math.gcd(step, k) > 1:
+        step += 1   # passo coprimo com M: a amostra passa por todas as colunas
+    cells, disagree, mismatches = 0, 0, []
+    for c in range(0, total, step):
+        i, j = divmod(c, k)
+        scalar = check(specs[i], profiles[j])[0]
+        cells += 1
+        if scalar == m.status_name(i, j):
+            continue
+        disagree += 1
+        if len(mismatches) < max_report:
+            mismatches.append({"spec": m.spec_ids[i], "profile": m.profile_ids[j],
+                               "matrix": m.status_name(i, j), "scalar": scalar,
+                               "reasons": m.reason_codes(i, j)})
+    return {"cells": cells, "agree": cells - disagree, "disagree": disagree, "mismatches": mismatches}
@@ -1,71 +1,692 @@
-import argparse, json, sys
-from l2i.validator import validate_spec
-from l2i.policies import apply_policies
-from l2i.capabilities import ensure_capability_valid, check_capabilities
-from l2i.compose import compose_specs
-from l2i.synth import synthesize_ir
-#from l2i.emit import emit_netconf, emit_p4runtime_stub
-from l2i.emit import emit_netconf_like, emit_p4runtime_like
-
-# Perfis embutidos
-LEGACY_PROFILE = {
-  "profile_id":"legacy-vlan-tc",
-  "queues":{"max_queues":4,"modes":{"strict":True,"wfq":{"supported":True,"weights_min":0.5,"weights_max":16}}},
-  "meters":{"supported":True,"types":["tbf"],"min_rate_mbps":1,"max_rate_mbps":10000},
-  "multicast":{"mode":"vlan_flood","max_groups":64,"max_replications_per_group":64},
-  "ports":[{"name":"eth0","speed_mbps":1000},{"name":"eth1","speed_mbps":1000}],
-  "atomic_commit": False,
-  "telemetry":{"rtt_percentile":True,"throughput_sustained":True,"queue_occupancy":True,"delivery_ratio":False}
-}
+import argparse, json, os, sys
+from importlib import import_module
 
-P4_PROFILE = {
-  "profile_id":"p4-bmv2-basic",
-  "queues":{"max_queues":8,"modes":{"strict":True,"wfq":{"supported":True,"weights_min":1,"weights_max":100}}},
-  "meters":{"supported":True,"types":["trtcm"],"min_rate_mbps":1,"max_rate_mbps":40000},
-  "multicast":{"mode":"l2mc_static","max_groups":1024,"max_replications_per_group":128},
-  "ports":[{"name":"p1","speed_mbps":10000},{"name":"p2","speed_mbps":10000}],
-  "atomic_commit": True,
-  "telemetry":{"rtt_percentile":True,"throughput_sustained":True,"queue_occupancy":True,"delivery_ratio":True}
+# Módulos l2i.* (e emissores) carregados sob demanda: cada subcomando só paga
+# o import do que de fato usa — `plan` nunca importa l2i.emit, e batch/serve
+# só importam o que precisam. Medir com `cli.py bench-startup`.
+L2I_SYMBOLS = {
+  "validate_spec": "l2i.validator",
+  "apply_policies": "l2i.policies",
+  "ensure_capability_valid": "l2i.capabilities",
+  "check_capabilities": "l2i.capabilities",
+  "compose_specs": "l2i.compose",
+  "synthesize_ir": "l2i.synth",
+  "emit_netconf_like": "l2i.emit",
+  "emit_p4runtime_like": "l2i.emit",
 }
 
-def e2e_pipeline(spec_doc, profile):
+def l2i(name):
+  return getattr(import_module(L2I_SYMBOLS[name]), name)
+
+def __getattr__(name):
+  # compatibilidade: `from cli import validate_spec` continua funcionando
+  if name in L2I_SYMBOLS: return l2i(name)
+  raise AttributeError(name)
+
+# Perfis: registro indexado de dsl/profiles/*.json (ver profile_registry.py),
+# com os apelidos históricos legacy → legacy-vlan-tc e p4 → p4-bmv2-basic
+_registry = None
+_validated_profiles = set()
+
+def profile_registry():
+  global _registry
+  if _registry is None:
+    from profile_registry import ProfileRegistry
+    _registry = ProfileRegistry()
+  return _registry
+
+def resolve_profile(name):
+  # O(1) no registro; ensure_capability_valid roda uma vez por versão de cada
+  # perfil (um arquivo alterado em disco é recarregado e revalidado)
+  reg = profile_registry()
+  profile = reg.resolve(name)
+  key = (profile["profile_id"], reg.version(name))
+  if key not in _validated_profiles:
+    l2i("ensure_capability_valid")(profile); _validated_profiles.add(key)
+  return profile
+
+def spec_profile(spec_doc, name=None):
+  # --profile explícito tem precedência; senão o target_profile do próprio spec
+  name = name or (spec_doc.get("target_profile") if isinstance(spec_doc, dict) else None)
+  if not name:
+    from profile_registry import UnknownProfile
+    raise UnknownProfile("sem --profile e o spec não declara target_profile")
+  return resolve_profile(name)
+
+def e2e_pipeline(spec_doc, profile, cache=None, policies=None, budget=None, admission=None, mc_groups=None,
+                 mc_graph=None):
+  # cache (opcional): cada estágio é memoizado pelo hash do que recebe,
+  # então só reexecuta o que está a jusante de uma mudança (ver stage_cache.py)
+  run = cache.run if cache is not None else (lambda stage, fn, *a: fn(*a))
   # 1) schema+semântica
-  spec, errs = validate_spec(spec_doc)
+  spec, errs = run("validate", l2i("validate_spec"), spec_doc)
   if errs: return None, {"errors":[e.__dict__ for e in errs]}
-  # 2) políticas
-  st, specP, pol = apply_policies(spec)
+  # 2) políticas (policies = tabela compilada de policy_table.py, fora do cache:
+  #    a decisão já é O(1) e os contadores de acerto precisam ver todo spec)
+  st, specP, pol = policies(spec) if policies is not None else run("policies", l2i("apply_policies"), spec)
   if st == "deny": return None, {"errors":[p.__dict__ for p in pol]}
   # 3) capacidades
-  st2, specC, cap = check_capabilities(specP, profile)
+  st2, specC, cap = run("capabilities", l2i("check_capabilities"), specP, profile)
   if st2 == "deny": return None, {"errors":[c.__dict__ for c in cap]}
+  # 3b) orçamento fim a fim repartido por domínio (budget.py), se pedido
+  split = None
+  if budget is not None:
+    split, berrs = budget(specC)
+    if berrs: return None, {"errors":[b.__dict__ for b in berrs]}
+  # 3c) admissão: reserva a garantia no caminho (admission.py) antes da síntese;
+  #     qualquer erro ou exceção daqui em diante devolve a reserva
+  adm = None
+  if admission is not None:
+    adm = admission.admit(specC, profile)
+    if not adm.admitted: return None, {"errors":[m.__dict__ for m in adm.msgs], "counter_offer": adm.offer}
+  try: plan, err = synth_stage(run, spec_doc, specC, profile, split, adm, mc_groups, mc_graph)
+  except BaseException:
+    if adm is not None: admission.release(adm.key)
+    raise
+  if not plan and adm is not None: admission.release(adm.key)
+  return plan, err
+
+def synth_stage(run, spec_doc, specC, profile, split, adm, mc_groups, mc_graph):
+  # 3d) gids numéricos do grupo multicast em cada domínio (mcast_groups.py)
+  gids = None
+  if mc_groups is not None:
+    gids, gerr = assign_gids(mc_groups, specC, profile)
+    if gerr: return None, {"errors":[gerr]}
+  # daqui em diante, erro ou exceção devolve os gids que este spec alocou
+  try: plan, err = tree_synth_stage(run, spec_doc, specC, profile, split, adm, mc_graph, gids)
+  except BaseException:
+    release_gids(mc_groups, gids); raise
+  if not plan: release_gids(mc_groups, gids)
+  return plan, err
+
+def tree_synth_stage(run, spec_doc, specC, profile, split, adm, mc_graph, gids):
+  # 3e) árvore multicast por domínio (mcast_tree.py), a partir dos endpoints do spec
+  tree = None
+  if mc_graph is not None:
+    import mcast_tree
+    try: tree = mcast_tree.spec_tree(spec_doc, mc_graph or None, resolve_profile)
+    except mcast_tree.TreeError as e: return None, {"errors":[{"code":"E_MC_TREE", "msg":str(e)}]}
   # 4) composição (aqui 1 doc → trivial)
-  merged, confl = compose_specs([specC])
+  merged, confl = run("compose", l2i("compose_specs"), [specC])
   if confl: return None, {"errors":[confl.__dict__]}
   # 5) síntese
-  plan = synthesize_ir(merged, profile)
+  plan = run("synth", l2i("synthesize_ir"), merged, profile)
+  for attr, extra in (("budget", split), ("admission", adm), ("mc_tree", tree)):
+    if extra is None: continue
+    if isinstance(plan, dict): plan[attr] = extra.to_json_dict()
+    else: setattr(plan, attr, extra.to_json_dict())
+  if gids:
+    if isinstance(plan, dict): plan["mc_gids"] = gids
+    else: plan.mc_gids = gids
   return plan, None
 
+def release_gids(mc_groups, gids):
+  # devolve só os domínios que o spec alocou (gids["new"]): os demais já eram
+  # do grupo, de outro fluxo, e continuam em uso
+  if mc_groups is None or not gids or not gids.get("new"): return
+  mc_groups.free(gids["group"], gids["new"])
+
+def release_admission(admission, plan, mc_groups=None):
+  # devolve a reserva (e os gids novos) de um plano que não chegou a ser emitido
+  if not plan: return
+  get = plan.get if isinstance(plan, dict) else (lambda k: getattr(plan, k, None))
+  adm = get("admission")
+  if admission is not None and adm: admission.release(adm["key"])
+  release_gids(mc_groups, get("mc_gids"))
+
+def assign_gids(mc_groups, spec, profile):
+  # grupo "tenant/group_id" → gid por domínio do caminho (ou do próprio perfil);
+  # "new": os domínios em que o grupo ainda não tinha gid (release_gids)
+  from intent import as_intent
+  from mcast_groups import GroupError
+  from budget import path_domains
+  it = as_intent(spec)
+  if not (it.mc_enabled and it.mc_group): return None, None
+  doms = path_domains(spec, it) or [profile["profile_id"]]
+  group = f"{it.tenant}/{it.mc_group}"
+  had = set(mc_groups.groups.get(group, ()))
+  try: gids = mc_groups.allocate(group, doms)
+  except GroupError as e: return None, {"code":"E_MC_GROUPS", "msg":str(e.args[0])}
+  return {"group": group, "gids": gids, "new": [d for d in doms if d not in had]}, None
+
 def build_arg_parser():
   p = argparse.ArgumentParser(description="L2I v0 (pipeline end-to-end)")
   sub = p.add_subparsers(dest="cmd", required=True)
-  sp = sub.add_parser("plan");    sp.add_argument("--profile", choices=["legacy","p4"], required=True); sp.add_argument("--spec", required=True)
-  sn = sub.add_parser("netconf"); sn.add_argument("--profile", choices=["legacy","p4"], required=True); sn.add_argument("--spec", required=True)
-  sp4 = sub.add_parser("p4");     sp4.add_argument("--profile", choices=["legacy","p4"], required=True); sp4.add_argument("--spec", required=True)
+  sp = sub.add_parser("plan");    sp.add_argument("--spec", required=True)
+  sp.add_argument("--format", choices=["json","ir","bin"], default="json",
+                  help="json = plano como sai do synthesize_ir; ir = visão JSON da IR compacta; bin = IR binária (plan_ir.py) em stdout")
+  sn = sub.add_parser("netconf"); sn.add_argument("--spec", required=True)
+  sp4 = sub.add_parser("p4");     sp4.add_argument("--spec", required=True)
+  sp4.add_argument("--ports", metavar="ARQ", help="com --since: JSON {host|domínio: porta} com a porta do switch de cada réplica multicast (além das portas do perfil)")
+  sb = sub.add_parser("batch", help="compila vários specs (NDJSON em stdin ou glob de arquivos), uma linha de saída por spec")
+  sb.add_argument("--glob", dest="pattern", help="glob de arquivos de spec (*.json = 1 doc; *.ndjson = 1 doc por linha); sem ele lê NDJSON de stdin")
+  sb.add_argument("--emit", choices=["plan","netconf","p4"], default="plan", help="o que emitir por spec (default: plan)")
+  sb.add_argument("--compose", action="store_true", help="compõe o lote inteiro (compose_index.py): specs em conflito E_COMPOSE_* saem como erro, W_COMPOSE_* como warnings")
+  sb.add_argument("--capacity-mbps", type=float, default=None, help="capacidade por porta para --compose (sem ela não há checagem de sobrecarga)")
+  sb.add_argument("--links", metavar="L=MBPS,...", help="enlaces entre domínios (ex.: A-B=40,B-C=10): garantia e teto de cada intent saem da alocação max-min justa do lote (fair_alloc.py)")
+  sb.add_argument("--pack-queues", action="store_true", help="empacota os intents de cada perfil nas suas max_queues filas (queue_packing.py) e anexa fila/peso WFQ a cada plano")
+  sb.add_argument("--fast-schema", action="store_true", help="rejeita specs fora do schema l2i-v0 com o validador compilado (schema_compiler.py) antes do pipeline")
+  sd = sub.add_parser("serve", help="compilador residente: atende plan/netconf/p4 por socket local (ver l2i_daemon.py)")
+  sd.add_argument("--socket", default=None, help="caminho do Unix socket (default: /tmp/l2i.sock)")
+  sd.add_argument("--tcp", default=None, metavar="HOST:PORT", help="escuta TCP só em loopback (ex.: 127.0.0.1:7979) em vez de Unix socket")
+  sd.add_argument("--workers", type=int, default=4, help="threads de compilação (default: 4)")
+  sd.add_argument("--netconf-sessions", type=int, default=0, metavar="N", help="habilita netconf-apply com até N sessões NETCONF persistentes por alvo (netconf_pool.py; default: 0 = desligado)")
+  sd.add_argument("--p4rt", action="store_true", help="habilita p4-apply: canais P4Runtime persistentes com mastership mantida (p4rt_client.py)")
+  sd.add_argument("--netconf-idle-s", type=float, default=300.0, help="fecha sessões NETCONF ociosas há mais que isso (default: 300)")
+  for s in (sp, sn, sp4, sb):
+    s.add_argument("--profile", help="perfil: profile_id, arquivo de profiles/ ou apelido (legacy, p4, A, B, C); default: target_profile do spec")
+  for s in (sp, sn, sp4):
+    s.add_argument("--since", metavar="PLANO", help="emite só o delta em relação ao último plano aplicado (JSON ou binário; inexistente = vazio)")
+    s.add_argument("--save", metavar="PLANO", help="grava o plano resultante (IR binária) para o próximo --since")
+  for s in (sp, sn, sp4, sb):
+    s.add_argument("--decompose", action="store_true", help="reparte latência/banda fim a fim entre os domínios do caminho (budget.py) e anexa ao plano")
+    s.add_argument("--delay", action="append", metavar="DOM=MS|CSV", help="atraso medido do domínio (ms, ou CSV t_ms,seq,rtt_ms → P99) para --decompose; repetível")
+  for s in (sp, sn, sp4, sb):
+    s.add_argument("--admit", action="store_true", help="controle de admissão (admission.py): reserva min_mbps em cada domínio/enlace do caminho e recusa com contraproposta o que não cabe")
+    s.add_argument("--bw", action="append", metavar="DOM=MBPS", help="capacidade do domínio/enlace para --admit (ex.: B=10, A-B=40); default: porta mais rápida do perfil e $BW_A_MBPS/$BW_B_MBPS/$BW_C_MBPS")
+    s.add_argument("--ledger", metavar="ARQ", help="razão de reservas persistente para --admit (lido antes, gravado depois)")
+  for s in (sp, sn, sp4, sb):
+    s.add_argument("--mc-gids", metavar="ARQ", help="aloca gids multicast densos e consistentes entre domínios (mcast_groups.py); ARQ guarda o estado entre execuções")
+    s.add_argument("--mc-tree", nargs="?", const="", metavar="L=MS,...", help="árvore multicast por domínio (mcast_tree.py) sobre o grafo de enlaces (ex.: A-B=1,B-C=2); sem valor: cadeia origem → receptores")
+  for s in (sp, sn, sp4, sb, sd):
+    s.add_argument("--policy-table", metavar="ARQ", help="regras de política compiladas (policy_table.py) no lugar de apply_policies")
+  for s in (sp, sn, sp4, sb, sd):
+    s.add_argument("--cache-dir", default=os.environ.get("L2I_CACHE_DIR"),
+                   help="diretório do cache de estágios em disco (default: $L2I_CACHE_DIR; vazio = sem cache)")
+  smd = sub.add_parser("mc-delta", help="join/leave de receptores multicast: só as mudanças de grupo por domínio (graft/prune em mcast_tree.py)")
+  smd.add_argument("--spec", required=True)
+  smd.add_argument("--join", action="append", default=[], metavar="DOM:HOST", help="receptor que entra (repetível)")
+  smd.add_argument("--leave", action="append", default=[], metavar="DOM:HOST", help="receptor que sai (repetível)")
+  smd.add_argument("--mc-tree", default="", metavar="L=MS,...", help="grafo de enlaces entre domínios (default: cadeia origem → receptores → novos)")
+  smd.add_argument("--mc-gids", metavar="ARQ", help="estado do alocador de gids (mcast_groups.py) para os ids numéricos")
+  smd.add_argument("--emit", choices=["json","netconf","p4"], default="json", help="formato das mudanças por domínio")
+  smd.add_argument("--ports", metavar="ARQ", help="com --emit p4: JSON {DOM: {host|domínio: porta}} com a porta do switch de cada réplica (além das portas do perfil)")
+  sa = sub.add_parser("apply", help="compila o spec para cada domínio e aplica os domínios concorrentemente (async_apply.py)")
+  sa.add_argument("--spec", required=True)
+  sa.add_argument("--targets", required=True, metavar="ARQ", help="JSON {DOM: alvo}, ou um resumo de execução com \"targets\"; alvo com dev (tc -batch; force, tc, link_mbps, state e reset opcionais, ex.: \"tc\": \"sudo tc\"; state = arquivo do último plano aplicado, o apply vira delta e reset recria a hierarquia restaurando esse plano se falhar), host (NETCONF) ou address (P4Runtime), e profile opcional (default: o nome do domínio)")
+  sa.add_argument("--after", action="append", metavar="DOM:DEP[,DEP]", help="DOM só começa quando DEP terminar com sucesso (repetível)")
+  sa.add_argument("--sequential", action="store_true", help="um domínio depois do outro, na ordem do arquivo (comparação com o modo antigo)")
+  sa.add_argument("--dry-run", action="store_true", help="só imprime o que seria aplicado em cada domínio")
+  sa.add_argument("--policy-table", metavar="ARQ", help="regras de política compiladas (policy_table.py) no lugar de apply_policies")
+  sbs = sub.add_parser("bench-startup", help="mede o tempo de import por módulo e o tempo total de `plan` em interpretador frio")
+  sbs.add_argument("--spec", help="spec pequeno para cronometrar `plan` de ponta a ponta")
+  sbs.add_argument("--profile", default="p4")
+  sbs.add_argument("--repeat", type=int, default=5, help="execuções por medida; reporta a mediana (default: 5)")
   return p
 
+def render(cmd, plan):
+  # saída de um plano já sintetizado, no formato pedido pelo subcomando
+  if cmd == "netconf": return l2i("emit_netconf_like")(plan)
+  if cmd == "p4": return l2i("emit_p4runtime_like")(plan)
+  return plan
+
+def iter_batch_docs(pattern=None, stream=None):
+  # gera (origem, texto-json); um doc por arquivo .json, um por linha em NDJSON
+  import glob
+  if pattern is None:
+    for n, line in enumerate(stream, 1):
+      if line.strip(): yield f"<stdin>:{n}", line
+    return
+  for path in sorted(glob.glob(pattern, recursive=True)):
+    with open(path, "r", encoding="utf-8") as f:
+      if path.endswith((".ndjson",".jsonl")):
+        for n, line in enumerate(f, 1):
+          if line.strip(): yield f"{path}:{n}", line
+      else:
+        yield path, f.read()
+
+def flow_key(doc):
+  # chave única do fluxo no lote (composição, fair share, filas): (tenant, scope, flow_id)
+  # None se o spec não vira Intent: quem o reporta é o schema/pipeline
+  from intent import as_intent
+  try: return as_intent(doc).flow_key
+  except (ValueError, KeyError, TypeError, AttributeError): return None
+
+def compose_batch(docs, capacity_mbps=None):
+  # conflitos entre os specs do lote, por Intent.flow_key (tenant, scope, flow_id)
+  from compose_index import ComposeIndex
+  idx = ComposeIndex(capacity_mbps)
+  for _, text in docs:
+    try: idx.add(json.loads(text))
+    except (ValueError, KeyError, TypeError, AttributeError): pass  # o pipeline reporta o spec ruim
+  by_flow = {}
+  for c in idx.conflicts():
+    for k in c.flow_keys():
+      by_flow.setdefault(k, []).append(c)
+  return by_flow
+
+def make_budget(args):
+  # --decompose: callable spec → (Budget, erros) com os atrasos de --delay
+  if not getattr(args, "decompose", False): return None
+  import budget
+  delays = {}
+  for item in args.delay or []:
+    dom, _, v = item.partition("=")
+    delays[dom] = budget.load_rtt_csv(v) if v.endswith(".csv") else float(v)
+  return lambda spec: budget.decompose(spec, resolve_profile, delays_ms=delays)
+
+def make_admission(args):
+  # --admit: ledger semeado pelos perfis, pelo ambiente (BW_<DOM>_MBPS) e por --bw
+  if not getattr(args, "admit", False): return None
+  from admission import env_capacity, open_ledger
+  caps = env_capacity(os.environ)
+  for item in args.bw or []:
+    caps.update(parse_links(item))
+  return open_ledger(args.ledger, resolve_profile, caps)
+
+def make_mc_graph(args):
+  # None = sem árvore; grafo vazio = cadeia dos domínios do próprio spec
+  text = getattr(args, "mc_tree", None)
+  if text is None: return None
+  from mcast_tree import DomainGraph
+  return DomainGraph.parse(text)
+
+def make_mc_groups(args):
+  if not getattr(args, "mc_gids", None): return None
+  from mcast_groups import open_allocator
+  return open_allocator(args.mc_gids, resolve_profile)
+
+def parse_links(text):
+  # "A-B=40,B-C=10" → {"A-B": 40.0, "B-C": 10.0}
+  out = {}
+  for item in text.split(","):
+    name, _, mbps = item.partition("=")
+    out[name.strip()] = float(mbps)
+  return out
+
+def fair_share_batch(docs, links):
+  # alocação max-min do lote inteiro sobre os enlaces (ver fair_alloc.py)
+  from fair_alloc import FairAllocator
+  fa = FairAllocator(links)
+  items = []
+  for _, text in docs:
+    try:
+      doc = json.loads(text)
+      item = fa.intent_item(doc)
+      if not all(l in links for l in item[1]): continue  # caminho fora dos enlaces informados
+      key = flow_key(doc)
+      if key is None: continue
+      items.append((key,) + item[1:])   # o alocador é chaveado pelo flow_key
+    except (ValueError, KeyError, TypeError, AttributeError): pass
+  fa.add_many(items)
+  out = {}
+  for item in items:
+    key = item[0]
+    out[key] = dict(fa.get(key).to_json_dict(), flow_id=key[2])
+  if fa.oversubscribed:
+    sys.stderr.write(f"[batch] enlaces com garantias acima da capacidade: {', '.join(sorted(fa.oversubscribed))}\n")
+  return out
+
+def pack_batch(docs, profile_name=None):
+  # filas compartilhadas por perfil (ver queue_packing.py): chave = Intent.flow_key
+  from queue_packing import pack
+  groups = {}
+  for _, text in docs:
+    try:
+      doc = json.loads(text)
+      prof = spec_profile(doc, profile_name)
+      groups.setdefault(prof["profile_id"], (prof, []))[1].append(doc)
+    except (ValueError, KeyError, TypeError, AttributeError): pass
+  out = {}
+  for pid, (prof, specs) in groups.items():
+    pk = pack(specs, prof)
+    by_qid = {q["qid"]: q for q in pk.queues}
+    for key, qid in pk.assignment.items():
+      q = by_qid[qid]
+      out[key] = {"profile_id": pid, "qid": qid, "weight": q["weight"],
+                  "priority": q["priority"], "latency_ms": q["latency_ms"]}
+    sys.stderr.write(f"[batch] {pid}: {len(specs)} intents em {len(pk.queues)} filas, erro {json.dumps(pk.error)}\n")
+  return out
+
+def open_stage_cache(cache_dir):
+  from stage_cache import StageCache
+  cache = StageCache(cache_dir=cache_dir)
+  if cache.disk_error: sys.stderr.write(f"[cache] só em memória: {cache.disk_error}\n")
+  return cache
+
+def load_policy_table(path):
+  if not path: return None
+  from policy_table import PolicyTable
+  return PolicyTable.from_file(path)
+
+def run_batch(args, cache, out=sys.stdout):
+  # perfis validados uma vez e cache em memória compartilhado por todo o lote;
+  # cada resultado é escrito (e descarregado) assim que fica pronto
+  n_ok = n_err = 0
+  schema_errors = None
+  policies = load_policy_table(args.policy_table)
+  budget = make_budget(args)
+  admission = make_admission(args)
+  mc_groups, mc_graph = make_mc_groups(args), make_mc_graph(args)
+  if args.fast_schema:
+    from schema_compiler import load_validator
+    schema_errors = load_validator(cache_dir=os.path.join(args.cache_dir, "schemas") if args.cache_dir else None)
+  docs = iter_batch_docs(args.pattern, sys.stdin)
+  by_flow, shares, queues = {}, {}, {}
+  if args.compose or args.links or args.pack_queues:
+    docs = list(docs)
+  if args.compose:
+    # composição do lote inteiro antes de emitir (ver compose_index.py)
+    by_flow = compose_batch(docs, args.capacity_mbps)
+  if args.links:
+    shares = fair_share_batch(docs, parse_links(args.links))
+  if args.pack_queues:
+    queues = pack_batch(docs, args.profile)
+  for seq, (src, text) in enumerate(docs):
+    rec = {"seq": seq, "source": src}
+    try:
+      doc = json.loads(text)
+      errs = schema_errors(doc) if schema_errors else None
+      fkey = flow_key(doc) if (by_flow or shares or queues) and not errs else None
+      confl = by_flow.get(fkey) if fkey else None
+      if errs: plan, err = None, {"errors": errs}
+      elif confl and any(c.code.startswith("E_") for c in confl): plan, err = None, {"errors": [c.__dict__ for c in confl]}
+      else: plan, err = e2e_pipeline(doc, spec_profile(doc, args.profile), cache=cache, policies=policies, budget=budget,
+                                    admission=admission, mc_groups=mc_groups, mc_graph=mc_graph)
+      for attr, table in (("allocation", shares), ("queue", queues)):
+        extra = table.get(fkey) if fkey and table and plan else None
+        if extra is None: continue
+        if isinstance(plan, dict): plan[attr] = extra
+        else: setattr(plan, attr, extra)
+      if plan:
+        try: rec.update(ok=True, result=render(args.emit, plan))
+        except Exception:
+          release_admission(admission, plan, mc_groups); raise
+        if confl: rec["warnings"] = [c.__dict__ for c in confl]
+      else: rec.update(ok=False, **err)
+    except Exception as e:  # um spec ruim não derruba o lote
+      rec.update(ok=False, errors=[{"code":"E_BATCH", "msg":f"{type(e).__name__}: {e}"}])
+    if rec["ok"]: n_ok += 1
+    else: n_err += 1
+    out.write(json.dumps(rec, default=lambda o:o.__dict__, ensure_ascii=False) + "\n")
+    out.flush()
+  sys.stderr.write(f"[batch] ok={n_ok} erro={n_err}\n")
+  if policies is not None:
+    sys.stderr.write(f"[batch] acertos por regra: {json.dumps(policies.hits())}\n")
+  if admission is not None:
+    sys.stderr.write(f"[batch] reservas: {json.dumps(admission.usage())}\n")
+    if args.ledger: admission.save(args.ledger)
+  if mc_groups is not None:
+    sys.stderr.write(f"[batch] grupos multicast: {json.dumps(mc_groups.usage())}\n")
+    mc_groups.save(args.mc_gids)
+  return n_err == 0
+
+def run_daemon(args):
+  import asyncio
+  from l2i_daemon import CompileService, DaemonError, check_loopback, serve_forever
+  tcp = None
+  if args.tcp:
+    host, _, port = args.tcp.rpartition(":"); tcp = (host.strip("[]") or "127.0.0.1", int(port))
+    try: check_loopback(tcp[0])
+    except DaemonError as e:
+      print(json.dumps({"errors":[{"code":"E_DAEMON", "msg":str(e)}]}, indent=2, ensure_ascii=False)); sys.exit(2)
+  for pid in profile_registry().ids(): resolve_profile(pid)  # perfis validados antes do 1º pedido
+  policies = load_policy_table(args.policy_table)
+  pipeline = e2e_pipeline if policies is None else (lambda d, p, cache=None: e2e_pipeline(d, p, cache=cache, policies=policies))
+  nc_pool = None
+  if args.netconf_sessions > 0:
+    from netconf_pool import NetconfPool
+    nc_pool = NetconfPool(max_per_target=args.netconf_sessions, max_idle_s=args.netconf_idle_s)
+    nc_pool.start_reaper()
+  p4rt = None
+  if args.p4rt:
+    from p4rt_client import P4RuntimeManager
+    p4rt = P4RuntimeManager()
+  svc = CompileService(pipeline, spec_profile, render,
+                       cache=open_stage_cache(args.cache_dir), workers=args.workers,
+                       netconf_pool=nc_pool, p4rt=p4rt)
+  try: asyncio.run(serve_forever(svc, socket_path=args.socket, tcp=tcp))
+  except KeyboardInterrupt: pass
+  except DaemonError as e:
+    print(json.dumps({"errors":[{"code":"E_DAEMON", "msg":str(e)}]}, indent=2, ensure_ascii=False)); sys.exit(2)
+
+def load_ports(path):
+  # topologia para as réplicas P4: {nome: porta} (ou {DOM: {nome: porta}} no mc-delta)
+  if not path: return {}
+  with open(path,"r",encoding="utf-8") as f: return json.load(f)
+
+def emit_delta(cmd, since, plan, ports=None, meters=None):
+  # só o que mudou desde o último plano aplicado (ver plan_delta.py)
+  import plan_delta, plan_ir
+  prev = plan_ir.load_plan(since) if os.path.exists(since) else None
+  changes = plan_delta.diff_plans(prev, plan)
+  if cmd == "netconf": print(plan_delta.render_netconf_delta(changes))
+  elif cmd == "p4": print(json.dumps(plan_delta.render_p4runtime_delta(changes, plan, ports, meters), indent=2))
+  else: print(json.dumps({"since": since, "summary": plan_delta.summarize(changes),
+                          "changes": [c.to_json_dict() for c in changes]}, indent=2))
+
+STARTUP_MODULES = ["l2i.validator", "l2i.policies", "l2i.capabilities", "l2i.compose",
+                   "l2i.synth", "l2i.emit", "stage_cache", "schema_compiler", "profile_registry", "plan_ir",
+                   "plan_delta", "l2i_daemon", "cli"]
+
+def bench_startup(args):
+  # cada medida roda num interpretador novo (nada em sys.modules), como nos sweeps
+  import statistics, subprocess, time
+  here = os.path.dirname(os.path.abspath(__file__))
+  env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in (here, os.environ.get("PYTHONPATH")) if p))
+  def wall_ms(cmd):
+    ts = []
+    for _ in range(args.repeat):
+      t0 = time.perf_counter(); subprocess.run(cmd, env=env, cwd=here, capture_output=True)
+      ts.append((time.perf_counter() - t0) * 1000.0)
+    return round(statistics.median(ts), 2)
+  def import_ms(mod):
+    ts = []
+    for _ in range(args.repeat):
+      r = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {mod}"],
+                         env=env, cwd=here, capture_output=True, text=True)
+      if r.returncode != 0: return None
+      # linhas: "import time: self [us] | cumulative | nome"
+      for line in r.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == mod:
+          ts.append(int(parts[1]) / 1000.0)
+    return round(statistics.median(ts), 2) if ts else None
+  report = {"python": sys.version.split()[0], "repeat": args.repeat,
+            "interpreter_ms": wall_ms([sys.executable, "-c", "pass"]),
+            "import_ms": {m: import_ms(m) for m in STARTUP_MODULES}}
+  if args.spec:
+    plan_ms = wall_ms([sys.executable, os.path.join(here, "cli.py"), "plan",
+                       "--profile", args.profile, "--spec", os.path.abspath(args.spec)])
+    report.update(plan_ms=plan_ms, plan_under_100ms=plan_ms < 100.0)
+  print(json.dumps(report, indent=2))
+
+def mc_delta(args):
+  # árvore do spec + join/leave incrementais; imprime só o que muda em cada domínio
+  import mcast_tree, plan_delta
+  from intent import as_intent
+  with open(args.spec,"r",encoding="utf-8") as f: spec_doc = json.load(f)
+  joins = [tuple(r.split(":", 1)) for r in args.join]
+  leaves = [tuple(r.split(":", 1)) for r in args.leave]
+  graph = mcast_tree.DomainGraph.parse(args.mc_tree)
+  if not len(graph):
+    ends = spec_doc.get("endpoints", {})
+    doms = [ends.get("source", {}).get("domain")] + [r.get("domain") for r in ends.get("receivers", [])]
+    graph = mcast_tree.DomainGraph.chain(list(dict.fromkeys(d for d in doms + [d for d, _ in joins] if d)))
+  try: tree = mcast_tree.spec_tree(spec_doc, graph, resolve_profile)
+  except mcast_tree.TreeError as e:
+    print(json.dumps({"errors":[{"code":"E_MC_TREE", "msg":str(e)}]}, indent=2, ensure_ascii=False)); sys.exit(2)
+  if tree is None:
+    print(json.dumps({"errors":[{"code":"E_MC_TREE", "msg":"spec sem endpoints.source"}]}, indent=2)); sys.exit(2)
+  gids = None
+  if args.mc_gids:
+    from mcast_groups import open_allocator
+    it = as_intent(spec_doc)
+    ga = open_allocator(args.mc_gids, resolve_profile)
+    gids = ga.allocate(f"{it.tenant}/{it.mc_group}", sorted(tree.nodes) + sorted({d for d, _ in joins if d not in tree.nodes}))
+    tree.gids.update(gids)
+  try: changes = tree.graft(joins, gids=gids)
+  except mcast_tree.TreeError as e:
+    print(json.dumps({"errors":[{"code":"E_MC_TREE", "msg":str(e)}]}, indent=2, ensure_ascii=False)); sys.exit(2)
+  pruned = tree.prune(leaves)
+  for d, cs in pruned.items():
+    changes.setdefault(d, []).extend(cs)
+  if args.mc_gids:
+    # domínio que saiu da árvore (grupo apagado nele) devolve o gid
+    ga.free(f"{it.tenant}/{it.mc_group}", [d for d, cs in pruned.items() if cs[-1].op == "delete"])
+    ga.save(args.mc_gids)
+  from profile_registry import UnknownProfile
+  topo = load_ports(args.ports) if args.emit == "p4" else {}
+  out = {}
+  for d, cs in sorted(changes.items()):
+    if args.emit == "netconf": out[d] = plan_delta.render_netconf_delta(cs)
+    elif args.emit == "p4":
+      try: dprof = resolve_profile(d)
+      except UnknownProfile: dprof = None   # domínio sem perfil: só as portas de --ports
+      try: out[d] = plan_delta.render_p4runtime_delta(cs, ports=plan_delta.port_map(dprof, topo.get(d)))
+      except plan_delta.PortMapError as e:
+        print(json.dumps({"errors":[{"code":"E_PORT_MAP", "domain":d, "msg":str(e.args[0])}]}, indent=2, ensure_ascii=False)); sys.exit(2)
+    else: out[d] = [c.to_json_dict() for c in cs]
+  print(json.dumps({"group": tree.group, "changes": out, "unreachable": tree.unreachable,
+                    "tree": tree.to_json_dict()["links"]}, indent=2, ensure_ascii=False))
+
+def target_kind(t):
+  if "dev" in t: return "tc"
+  if "host" in t: return "netconf"
+  if "address" in t or "addr" in t: return "p4"
+  return None
+
+def apply_domains(args):
+  # um plano por domínio (perfil do alvo), aplicados em paralelo respeitando --after
+  import async_apply, plan_delta, plan_ir
+  from profile_registry import UnknownProfile
+  with open(args.spec,"r",encoding="utf-8") as f: spec_doc = json.load(f)
+  with open(args.targets,"r",encoding="utf-8") as f: targets = json.load(f)
+  targets = targets.get("targets", targets)
+  try: after = async_apply.parse_after(args.after)
+  except async_apply.ApplyError as e:
+    print(json.dumps({"errors":[{"code":"E_APPLY", "msg":str(e)}]}, indent=2, ensure_ascii=False)); sys.exit(2)
+  if args.sequential:
+    doms = list(targets)
+    after = {d: [doms[i-1]] for i, d in enumerate(doms) if i}
+  policies = load_policy_table(args.policy_table)
+  nc_pool = p4rt = None
+  applies, rendered, errors, states = [], {}, [], {}
+  for d, t in targets.items():
+    kind = target_kind(t)
+    if kind is None:
+      errors.append({"code":"E_APPLY", "msg":f"{d}: alvo sem dev/host/address"}); continue
+    try: profile = resolve_profile(t.get("profile", d))
+    except UnknownProfile as e:
+      errors.append({"code":"E_PROFILE", "domain":d, "msg":str(e.args[0])}); continue
+    plan, err = e2e_pipeline(spec_doc, profile, policies=policies)
+    if not plan:
+      errors.extend({"domain": d, **e} for e in err.get("errors", [])); continue
+    try: changes = plan_delta.diff_plans(None, plan_ir.from_plan(plan))
+    except plan_ir.PlanShapeError as e:
+      errors.append({"code":"E_PLAN_SHAPE", "domain":d, "msg":str(e)}); continue
+    if kind == "tc":
+      from tc_batch import TcBatchError, render_batch
+      # taxa da classe do enlace 1:1: a do alvo, senão a porta mais rápida do perfil
+      link = t.get("link_mbps") or max((p.get("speed_mbps", 0) for p in profile.get("ports", [])), default=0) or None
+      # último plano aplicado neste device: o apply é o delta, e o rollback volta a ele
+      prev = plan_ir.load_plan(t["state"]) if t.get("state") and os.path.exists(t["state"]) else None
+      reset = bool(t.get("reset"))
+      try: payload = [ln.text for ln in render_batch(plan, t["dev"], prev, link, reset)]
+      except TcBatchError as e:
+        errors.append({"code":"E_APPLY", "domain":d, "msg":str(e)}); continue
+      tc = t.get("tc", ["tc"])
+      fn = async_apply.tc_apply(plan, t["dev"], force=bool(t.get("force")), reset=reset, link_mbps=link, prev=prev,
+                                tc=tc.split() if isinstance(tc, str) else tc)
+      if t.get("state"): states[d] = (t["state"], plan)
+    elif kind == "netconf":
+      from netconf_pool import default_pool
+      payload = plan_delta.render_netconf_delta(changes)
+      nc_pool = default_pool()
+      fn = async_apply.netconf_apply(nc_pool, t, payload)
+    else:
+      from p4rt_client import P4RuntimeManager
+      try:
+        payload = plan_delta.render_p4runtime_delta(
+          changes, plan, plan_delta.port_map(profile, t.get("ports")), plan_delta.meter_names(profile))["updates"]
+      except plan_delta.PortMapError as e:
+        errors.append({"code":"E_PORT_MAP", "domain":d, "msg":str(e.args[0])}); continue
+      p4rt = p4rt or P4RuntimeManager(tuple(t.get("election_id", (0, 1))))
+      client = p4rt.client(t.get("address") or t["addr"], t.get("device_id", 0), p4info=t.get("p4info"),
+                           connect=False)
+      fn = async_apply.p4rt_apply(client, payload)
+    rendered[d] = payload
+    applies.append(async_apply.DomainApply(d, fn, after.get(d, ())))
+  if errors:
+    print(json.dumps({"errors": errors}, indent=2, ensure_ascii=False)); sys.exit(2)
+  if args.dry_run:
+    print(json.dumps({"after": after, "domains": rendered}, indent=2, ensure_ascii=False)); return
+  try:
+    summary = async_apply.run(applies)
+  except async_apply.ApplyError as e:
+    print(json.dumps({"errors":[{"code":"E_APPLY", "msg":str(e)}]}, indent=2)); sys.exit(2)
+  finally:
+    if nc_pool is not None: nc_pool.close_all()
+    if p4rt is not None: p4rt.close_all()
+  for d, (path, plan) in states.items():
+    if summary.results[d].ok:
+      with open(path, "wb") as f: f.write(plan_ir.encode(plan))
+  out = summary.to_json_dict()
+  if args.sequential: out["mode"] = "sequential"
+  print(json.dumps(out, indent=2, ensure_ascii=False))
+  sys.exit(0 if summary.ok else 1)
+
 def main(argv):
   ap = build_arg_parser(); args = ap.parse_args(argv)
-  profile = LEGACY_PROFILE if args.profile == "legacy" else P4_PROFILE
-  ensure_capability_valid(profile)
+  if args.cmd == "bench-startup":
+    bench_startup(args); return
+  if args.cmd == "mc-delta":
+    mc_delta(args); return
+  if args.cmd == "apply":
+    apply_domains(args); return
+  if args.cmd == "serve":
+    run_daemon(args); return
+  if args.cmd == "batch":
+    ok = run_batch(args, open_stage_cache(args.cache_dir))
+    sys.exit(0 if ok else 1)
   with open(args.spec,"r",encoding="utf-8") as f: spec_doc = json.load(f)
-  plan, err = e2e_pipeline(spec_doc, profile)
-  if args.cmd == "plan":
+  from profile_registry import UnknownProfile
+  try: profile = spec_profile(spec_doc, args.profile)
+  except UnknownProfile as e:
+    print(json.dumps({"errors":[{"code":"E_PROFILE", "msg":str(e.args[0])}]}, indent=2)); sys.exit(2)
+  cache = None
+  if args.cache_dir:
+    cache = open_stage_cache(args.cache_dir)
+  admission, mc_groups = make_admission(args), make_mc_groups(args)
+  plan, err = e2e_pipeline(spec_doc, profile, cache=cache, policies=load_policy_table(args.policy_table),
+                           budget=make_budget(args), admission=admission, mc_groups=mc_groups,
+                           mc_graph=make_mc_graph(args))
+  # ledger e gids só são gravados depois que o plano foi emitido
+  try: emit_plan(args, plan, err, profile)
+  except BaseException as e:
+    release_admission(admission, plan, mc_groups)
+    import plan_ir
+    if not isinstance(e, plan_ir.PlanShapeError): raise
+    print(json.dumps({"errors":[{"code":"E_PLAN_SHAPE", "msg":str(e)}]}, indent=2, ensure_ascii=False)); sys.exit(2)
+  if plan and admission is not None and args.ledger: admission.save(args.ledger)
+  if plan and mc_groups is not None: mc_groups.save(args.mc_gids)
+
+def emit_plan(args, plan, err, profile):
+  if plan and (args.since or args.save):
+    # o delta é calculado antes de --save sobrescrever o estado anterior
+    if args.since:
+      import plan_delta
+      try:
+        ports = plan_delta.port_map(profile, load_ports(args.ports)) if args.cmd == "p4" else None
+        emit_delta(args.cmd, args.since, plan, ports, plan_delta.meter_names(profile))
+      except plan_delta.PortMapError as e:
+        print(json.dumps({"errors":[{"code":"E_PORT_MAP", "msg":str(e.args[0])}]}, indent=2, ensure_ascii=False)); sys.exit(2)
+    if args.save:
+      import plan_ir
+      blob = plan_ir.encode(plan)   # antes do open: um plano inválido não trunca o estado
+      with open(args.save, "wb") as f: f.write(blob)
+    if args.since: return
+  if args.cmd == "plan" and plan and args.format != "json":
+    import plan_ir
+    if args.format == "bin": sys.stdout.buffer.write(plan_ir.encode(plan))
+    else: print(json.dumps(plan_ir.from_plan(plan).to_json_dict(), indent=2))
+  elif args.cmd == "plan":
     print(json.dumps(plan, default=lambda o:o.__dict__, indent=2) if plan else json.dumps(err, indent=2))
   elif args.cmd == "netconf":
-    if plan: print(emit_netconf(plan))
+    if plan: print(render("netconf", plan))
     else: print(json.dumps(err, indent=2))
   elif args.cmd == "p4":
-    if plan: print(json.dumps(emit_p4runtime_stub(plan), indent=2))
+    if plan: print(json.dumps(render("p4", plan), indent=2))
     else: print(json.dumps(err, indent=2))
 
 if __name__ == "__main__":
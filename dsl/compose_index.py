@@ -0,0 +1,278 @@
+"""
+compose_index.py — composição de muitos intents com índices incrementais.
+
+compose_specs recebe um documento por vez no e2e_pipeline. Para compor
+milhares de specs, este índice agrupa os intents (intent.py) por
+(tenant, scope, porta) e mantém, a cada insert/remove, agregados que tornam
+as verificações baratas:
+
+  - por chave: soma de min_mbps por nível de prioridade (4 contadores) e soma
+    de max_mbps → sobrecarga detectada em O(1) por mudança;
+  - por chave: fluxos em (prioridade, -min_mbps); o insert só anexa (O(1)) e
+    a lista é ordenada uma vez, na próxima varredura que a lê (O(k log k));
+    a varredura acha quais fluxos ficam sem garantia e as inversões de
+    prioridade em O(k) sobre a chave alterada; remover custa O(k);
+  - global: group_id multicast → fluxos que o usam, com contagem por
+    (tenant, scope) → conflito de grupo em O(1).
+
+Conflitos (Conflict, com __dict__ como as demais mensagens da L2I):
+
+  E_COMPOSE_DUP_FLOW          mesmo flow_id duas vezes na mesma chave
+  E_COMPOSE_OVERSUB           soma das garantias (min) excede a capacidade;
+                              `flows` = os que ficam sem garantia, na ordem de
+                              prioridade estrita
+  W_COMPOSE_CEIL_OVERSUB      soma dos tetos (max) excede a capacidade
+  W_COMPOSE_PRIO_INVERSION    fluxo de prioridade menor com latência mais
+                              apertada que um de prioridade maior na mesma porta
+  E_COMPOSE_MC_GROUP          group_id usado por mais de um (tenant, scope);
+                              `flows` = [tenant, scope, flow_id] de cada fluxo
+
+Conflict.flow_keys() dá os (tenant, scope, flow_id) afetados em qualquer caso.
+
+Construir o índice para n intents custa O(n) e o primeiro conflicts(),
+O(n log n) (uma ordenação por chave); depois, conflicts() reavalia só as
+chaves tocadas desde a última chamada (ver dirty).
+"""
+
+from __future__ import annotations
+
+import bisect
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from intent import Intent, as_intent
+
+Key = Tuple[str, str, str]
+Capacity = Union[None, float, Dict[str, float], Callable[[Key], Optional[float]]]
+
+
+class Conflict:
+    def __init__(self, code: str, msg: str, key: Any, flows: List[Any], **detail: Any):
+        self.code = code
+        self.msg = msg
+        self.key = list(key) if isinstance(key, tuple) else key
+        self.flows = flows
+        self.detail = detail
+
+    def flow_keys(self) -> List[Tuple[str, str, str]]:
+        """(tenant, scope, flow_id) de cada fluxo afetado."""
+        if self.code == "E_COMPOSE_MC_GROUP":
+            return [tuple(f) for f in self.flows]
+        return [(self.key[0], self.key[1], f) for f in self.flows]
+
+    def __repr__(self) -> str:
+        return f"Conflict({self.code} {self.key} {self.flows})"
+
+
+class _Bucket:
+    """Intents de uma (tenant, scope, porta) + agregados."""
+
+    __slots__ = ("_order", "_unsorted", "flows", "sum_min", "sum_max", "dups")
+
+    def __init__(self) -> None:
+        self._order: List[Tuple[int, float, str]] = []   # (prioridade, -min, flow_id)
+        self._unsorted = False
+        self.flows: Dict[str, Intent] = {}
+        self.sum_min = [0.0, 0.0, 0.0, 0.0]
+        self.sum_max = 0.0
+        self.dups: Dict[str, List[Intent]] = {}   # declarações repetidas, além da primeira
+
+    @staticmethod
+    def _entry(it: Intent) -> Tuple[int, float, str]:
+        return (min(max(it.priority, 0), 3), -it.min_mbps, it.flow_id)
+
+    def add(self, it: Intent) -> None:
+        if it.flow_id in self.flows:
+            self.dups.setdefault(it.flow_id, []).append(it)
+            return
+        self.flows[it.flow_id] = it
+        e = self._entry(it)
+        self._order.append(e)
+        self._unsorted = True
+        self.sum_min[e[0]] += it.min_mbps
+        self.sum_max += it.max_mbps
+
+    def copies(self, flow_id: str) -> List[Intent]:
+        """Todas as declarações ainda presentes de flow_id (a primeira e as repetidas)."""
+        first = self.flows.get(flow_id)
+        return ([first] if first is not None else []) + self.dups.get(flow_id, [])
+
+    def remove(self, flow_id: str) -> Optional[Intent]:
+        extra = self.dups.get(flow_id)
+        if extra:
+            # remove a última duplicata (e devolve ela); a primeira continua valendo
+            it = extra.pop()
+            if not extra:
+                del self.dups[flow_id]
+            return it
+        it = self.flows.pop(flow_id, None)
+        if it is None:
+            return None
+        e = self._entry(it)
+        if self._unsorted:
+            self._order.remove(e)
+        else:
+            del self._order[bisect.bisect_left(self._order, e)]
+        self.sum_min[e[0]] -= it.min_mbps
+        self.sum_max -= it.max_mbps
+        return it
+
+    @property
+    def order(self) -> List[Tuple[int, float, str]]:
+        """Entradas em ordem; ordena uma vez depois de uma leva de inserts."""
+        if self._unsorted:
+            self._order.sort()
+            self._unsorted = False
+        return self._order
+
+
+class ComposeIndex:
+    def __init__(self, capacity_mbps: Capacity = None):
+        self.capacity_mbps = capacity_mbps
+        self._buckets: Dict[Key, _Bucket] = {}
+        self._where: Dict[Tuple[str, str, str], Key] = {}      # (tenant, scope, flow) → chave
+        self._groups: Dict[str, Set[Tuple[str, str, str]]] = {}  # group → {(tenant, scope, flow_id)}
+        self._group_owners: Dict[str, Dict[Tuple[str, str], int]] = {}
+        self.dirty: Set[Key] = set()
+        self.dirty_groups: Set[str] = set()
+        self._cache: Dict[Any, List[Conflict]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(b.flows) for b in self._buckets.values())
+
+    def capacity(self, key: Key) -> Optional[float]:
+        c = self.capacity_mbps
+        if c is None or isinstance(c, (int, float)):
+            return c
+        if isinstance(c, dict):
+            return c.get(key[2], c.get("*"))
+        return c(key)
+
+    # ------------------------- mudanças -------------------------
+
+    def add(self, spec: Any) -> Intent:
+        it = as_intent(spec)
+        key = it.key
+        self._buckets.setdefault(key, _Bucket()).add(it)
+        self._where.setdefault((it.tenant, it.scope, it.flow_id), key)
+        self.dirty.add(key)
+        if it.mc_enabled and it.mc_group:
+            g = str(it.mc_group)
+            self._groups.setdefault(g, set()).add(it.flow_key)
+            owners = self._group_owners.setdefault(g, {})
+            owners[(it.tenant, it.scope)] = owners.get((it.tenant, it.scope), 0) + 1
+            self.dirty_groups.add(g)
+        return it
+
+    def remove(self, tenant: str, scope: str, flow_id: str) -> Optional[Intent]:
+        key = self._where.get((tenant, scope, flow_id))
+        if key is None:
+            return None
+        b = self._buckets[key]
+        it = b.remove(flow_id)
+        if flow_id not in b.flows:
+            del self._where[(tenant, scope, flow_id)]
+        if not b.flows:
+            del self._buckets[key]
+        self.dirty.add(key)
+        if it is not None and it.mc_enabled and it.mc_group:
+            # o grupo da declaração removida (uma duplicata pode ter outro)
+            g = str(it.mc_group)
+            owners = self._group_owners[g]
+            owners[(tenant, scope)] -= 1
+            if not owners[(tenant, scope)]:
+                del owners[(tenant, scope)]
+            if not any(c.mc_enabled and str(c.mc_group) == g for c in b.copies(flow_id)):
+                self._groups[g].discard((tenant, scope, flow_id))
+            if not owners:
+                del self._group_owners[g]; del self._groups[g]
+            self.dirty_groups.add(g)
+        return it
+
+    def replace(self, spec: Any) -> Intent:
+        """Troca o intent de mesmo (tenant, scope, flow_id) — remove + add."""
+        it = as_intent(spec)
+        self.remove(it.tenant, it.scope, it.flow_id)
+        return self.add(it)
+
+    def extend(self, specs: Iterable[Any]) -> None:
+        for s in specs:
+            self.add(s)
+
+    # ------------------------- conflitos -------------------------
+
+    def oversubscribed(self, key: Key) -> bool:
+        """O(1): a soma das garantias da chave excede a capacidade?"""
+        cap = self.capacity(key)
+        b = self._buckets.get(key)
+        return cap is not None and b is not None and sum(b.sum_min) > cap
+
+    def _key_conflicts(self, key: Key) -> List[Conflict]:
+        b = self._buckets.get(key)
+        if b is None:
+            return []
+        out = [Conflict("E_COMPOSE_DUP_FLOW", f"flow_id {f} declarado {len(extra) + 1} vezes", key, [f])
+               for f, extra in sorted(b.dups.items())]
+        cap = self.capacity(key)
+        if cap is not None:
+            demand = sum(b.sum_min)
+            if demand > cap:
+                # prioridade estrita: garante nível a nível, maiores primeiro
+                acc, starved = 0.0, []
+                for prio, neg_min, fid in b.order:
+                    acc -= neg_min
+                    if acc > cap:
+                        starved.append(fid)
+                out.append(Conflict("E_COMPOSE_OVERSUB",
+                                    f"garantias somam {demand:g} Mbps > capacidade {cap:g} Mbps",
+                                    key, starved, demand_mbps=demand, capacity_mbps=cap))
+            elif b.sum_max > cap:
+                out.append(Conflict("W_COMPOSE_CEIL_OVERSUB",
+                                    f"tetos somam {b.sum_max:g} Mbps > capacidade {cap:g} Mbps",
+                                    key, sorted(b.flows), ceil_mbps=b.sum_max, capacity_mbps=cap))
+        # inversão: varre por prioridade guardando o fluxo mais folgado (maior
+        # latência) dentre os níveis acima do atual
+        loosest: Optional[Intent] = None
+        level_best: Optional[Intent] = None
+        level = None
+        for prio, _, fid in b.order:
+            it = b.flows[fid]
+            if prio != level:
+                if level_best is not None and (loosest is None or level_best.latency_ms > loosest.latency_ms):
+                    loosest = level_best
+                level, level_best = prio, None
+            if it.latency_ms is None:
+                continue
+            if loosest is not None and it.latency_ms < loosest.latency_ms:
+                out.append(Conflict("W_COMPOSE_PRIO_INVERSION",
+                                    f"{fid} exige {it.latency_ms:g} ms mas fica atrás de "
+                                    f"{loosest.flow_id} ({loosest.latency_ms:g} ms)",
+                                    key, [fid, loosest.flow_id]))
+            if level_best is None or it.latency_ms > level_best.latency_ms:
+                level_best = it
+        return out
+
+    def _group_conflicts(self, g: str) -> List[Conflict]:
+        owners = self._group_owners.get(g)
+        if not owners or len(owners) < 2:
+            return []
+        flows = [list(k) for k in sorted(self._groups[g])]
+        who = ", ".join(f"{t}/{s}" for t, s in sorted(owners))
+        return [Conflict("E_COMPOSE_MC_GROUP", f"grupo {g} usado por {who}", ["*", "*", g], flows, group=g)]
+
+    def conflicts(self) -> List[Conflict]:
+        """Todos os conflitos; só as chaves/grupos alterados são reavaliados."""
+        for key in self.dirty:
+            self._cache[("k",) + key] = self._key_conflicts(key)
+        for g in self.dirty_groups:
+            self._cache[("g", g)] = self._group_conflicts(g)
+        self.dirty.clear(); self.dirty_groups.clear()
+        for k in [k for k, v in self._cache.items() if not v]:
+            del self._cache[k]
+        return [c for k in sorted(self._cache) for c in self._cache[k]]
+
+
+def compose_many(specs: Iterable[Any], capacity_mbps: Capacity = None) -> Tuple[List[Intent], List[Conflict]]:
+    """Análogo em lote de compose_specs: (intents, conflitos)."""
+    idx = ComposeIndex(capacity_mbps)
+    intents = [idx.add(s) for s in specs]
+    return intents, idx.conflicts()
@@ -0,0 +1,229 @@
+"""
+fair_alloc.py — alocação max-min justa (ponderada) de banda sobre os enlaces.
+
+Com muitos intents dividindo os enlaces A-B e B-C, rate/ceil por intent
+(HTB) isolados somam tetos acima da capacidade. Aqui a alocação é global,
+por enchimento progressivo ponderado (progressive filling): todo fluxo ativo
+cresce a w_f · τ; um fluxo congela ao atingir sua demanda (τ = d_f / w_f) ou
+quando um enlace do seu caminho satura (τ = (c_l − congelado_l) / W_l). Os
+eventos saem de dois heaps (fluxos: estático; enlaces: com invalidação
+preguiçosa), em O((F · |caminho| + L) log).
+
+Duas rodadas por componente:
+  1) garantia: demanda = min_mbps → `guaranteed` (= min_mbps se cabe; senão a
+     parte justa, e o enlace vai para `oversubscribed`);
+  2) teto: demanda = max_mbps − garantia, sobre a capacidade residual →
+     `ceil` = garantia + parte justa do que sobrou. Σ ceil ≤ capacidade em
+     todo enlace.
+
+Os pesos vêm da prioridade (PRIORITY_WEIGHTS) ou de `weight` explícito.
+add/remove recalculam só a componente conexa (intents ligados por enlaces
+compartilhados) afetada.
+"""
+
+from __future__ import annotations
+
+import heapq
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from plan_ir import priority_rank
+
+PRIORITY_WEIGHTS = (8.0, 4.0, 2.0, 1.0)   # critical, high, medium, low
+_EPS = 1e-9
+
+
+def domain_links(domains: Sequence[str]) -> List[str]:
+    """Enlaces entre domínios consecutivos do caminho ("A-B", "B-C"); 1 domínio → ele mesmo."""
+    if len(domains) == 1:
+        return [domains[0]]
+    return ["-".join(sorted((a, b))) for a, b in zip(domains, domains[1:])]
+
+
+def progressive_fill(flows: Dict[str, Tuple[Sequence[str], float, float]],
+                     capacity: Dict[str, float]) -> Tuple[Dict[str, float], Set[str]]:
+    """
+    Max-min ponderado. `flows`: id → (enlaces, demanda, peso). Devolve
+    (taxa por fluxo, enlaces saturados).
+    """
+    rate = {f: 0.0 for f in flows}
+    frozen_use = {l: 0.0 for l in capacity}
+    active_w: Dict[str, float] = {l: 0.0 for l in capacity}
+    users: Dict[str, List[str]] = {l: [] for l in capacity}
+    fheap = []
+    for f, (links, demand, w) in flows.items():
+        if demand <= _EPS or w <= 0:
+            continue
+        for l in links:
+            active_w[l] += w
+            users[l].append(f)
+        heapq.heappush(fheap, (demand / w, f))
+    active = {f for _, f in fheap}
+
+    def link_tau(l: str) -> float:
+        return (capacity[l] - frozen_use[l]) / active_w[l] if active_w[l] > _EPS else float("inf")
+
+    lheap = [(link_tau(l), l) for l in capacity if active_w[l] > _EPS]
+    heapq.heapify(lheap)
+    saturated: Set[str] = set()
+
+    def freeze(f: str, tau: float) -> None:
+        links, _, w = flows[f]
+        rate[f] = w * tau
+        active.discard(f)
+        for l in links:
+            frozen_use[l] += rate[f]
+            active_w[l] -= w
+            if l not in saturated and active_w[l] > _EPS:
+                heapq.heappush(lheap, (link_tau(l), l))
+
+    while active:
+        while fheap and fheap[0][1] not in active:
+            heapq.heappop(fheap)
+        # entrada de enlace obsoleta: τ mudou desde que foi empilhada
+        while lheap and (lheap[0][1] in saturated or active_w[lheap[0][1]] <= _EPS
+                         or abs(lheap[0][0] - link_tau(lheap[0][1])) > _EPS):
+            heapq.heappop(lheap)
+        tf = fheap[0][0] if fheap else float("inf")
+        tl = lheap[0][0] if lheap else float("inf")
+        if tf <= tl:
+            freeze(heapq.heappop(fheap)[1], max(tf, 0.0))
+        else:
+            _, l = heapq.heappop(lheap)
+            saturated.add(l)
+            for f in [f for f in users[l] if f in active]:
+                freeze(f, max(tl, 0.0))
+    return rate, saturated
+
+
+class Allocation:
+    __slots__ = ("flow_id", "links", "weight", "min_mbps", "max_mbps", "guaranteed", "ceil")
+
+    def __init__(self, flow_id: str, links: Sequence[str], weight: float, min_mbps: float, max_mbps: float):
+        self.flow_id = flow_id; self.links = tuple(links); self.weight = weight
+        self.min_mbps = min_mbps; self.max_mbps = max_mbps
+        self.guaranteed = 0.0; self.ceil = 0.0
+
+    def to_json_dict(self) -> Dict[str, Any]:
+        return {"flow_id": self.flow_id, "links": list(self.links), "weight": self.weight,
+                "guaranteed_mbps": round(self.guaranteed, 6), "ceil_mbps": round(self.ceil, 6)}
+
+
+class FairAllocator:
+    def __init__(self, capacity_mbps: Dict[str, float]):
+        self.capacity = dict(capacity_mbps)
+        self.flows: Dict[str, Allocation] = {}
+        self._users: Dict[str, Set[str]] = {l: set() for l in self.capacity}
+        self.oversubscribed: Set[str] = set()
+        self.recomputed = 0   # fluxos recalculados (p/ medir o custo incremental)
+
+    def _insert(self, flow_id: str, links: Sequence[str], min_mbps: float, max_mbps: Optional[float],
+                priority: Any, weight: Optional[float]) -> Allocation:
+        unknown = [l for l in links if l not in self.capacity]
+        if unknown:
+            raise KeyError(f"enlace desconhecido: {', '.join(unknown)}")
+        old = self.flows.pop(flow_id, None)
+        if old is not None:
+            for l in old.links:
+                self._users[l].discard(flow_id)
+        w = float(weight) if weight is not None else PRIORITY_WEIGHTS[min(max(priority_rank(priority), 0), 3)]
+        hi = max(float(max_mbps if max_mbps is not None else min_mbps), float(min_mbps))
+        a = self.flows[flow_id] = Allocation(flow_id, links, w, float(min_mbps), hi)
+        for l in a.links:
+            self._users[l].add(flow_id)
+        return a
+
+    def add(self, flow_id: str, links: Sequence[str], min_mbps: float, max_mbps: Optional[float] = None,
+            priority: Any = "medium", weight: Optional[float] = None) -> Allocation:
+        old = self.flows.get(flow_id)
+        a = self._insert(flow_id, links, min_mbps, max_mbps, priority, weight)
+        self._recompute(a.links + (old.links if old is not None else ()))
+        return a
+
+    def add_many(self, items: Iterable[Tuple[Any, ...]]) -> List[Allocation]:
+        """Carga em lote: (flow_id, enlaces, min, max[, prioridade[, peso]]); recalcula uma vez."""
+        out, touched = [], set()
+        for item in items:
+            flow_id, links, lo, hi, *rest = item
+            old = self.flows.get(flow_id)
+            if old is not None:
+                touched.update(old.links)
+            a = self._insert(flow_id, links, lo, hi, rest[0] if rest else "medium", rest[1] if len(rest) > 1 else None)
+            touched.update(a.links)
+            out.append(a)
+        while touched:
+            comp_l, _ = self._component(touched)
+            self._recompute(comp_l)
+            touched -= comp_l
+        return out
+
+    def intent_item(self, spec: Any, links: Optional[Sequence[str]] = None) -> Tuple[Any, ...]:
+        """Tupla de add_many para um spec; enlaces = domínios consecutivos do caminho."""
+        from budget import path_domains
+        from intent import as_intent
+        it = as_intent(spec)
+        links = links or domain_links(path_domains(spec, it))
+        return (it.flow_id, list(links), it.min_mbps, it.max_mbps, it.priority)
+
+    def add_intent(self, spec: Any, links: Optional[Sequence[str]] = None) -> Allocation:
+        flow_id, links, lo, hi, prio = self.intent_item(spec, links)
+        return self.add(flow_id, links, lo, hi, priority=prio)
+
+    def remove(self, flow_id: str) -> Optional[Allocation]:
+        a = self.flows.pop(flow_id, None)
+        if a is None:
+            return None
+        for l in a.links:
+            self._users[l].discard(flow_id)
+        self._recompute(a.links)
+        return a
+
+    def _component(self, links: Iterable[str]) -> Tuple[Set[str], Set[str]]:
+        seen_l, seen_f = set(), set()
+        q = deque(links)
+        while q:
+            l = q.popleft()
+            if l in seen_l:
+                continue
+            seen_l.add(l)
+            for f in self._users[l]:
+                if f not in seen_f:
+                    seen_f.add(f)
+                    q.extend(self.flows[f].links)
+        return seen_l, seen_f
+
+    def _recompute(self, links: Iterable[str]) -> None:
+        comp_l, comp_f = self._component(links)
+        cap = {l: self.capacity[l] for l in comp_l}
+        flows = {f: (self.flows[f].links, self.flows[f].min_mbps, self.flows[f].weight) for f in comp_f}
+        guar, sat = progressive_fill(flows, cap)
+        used = dict.fromkeys(comp_l, 0.0)
+        wanted = dict.fromkeys(comp_l, 0.0)
+        for f in comp_f:
+            for l in self.flows[f].links:
+                used[l] += guar[f]
+                wanted[l] += self.flows[f].min_mbps
+        self.oversubscribed -= comp_l
+        self.oversubscribed |= {l for l in sat if wanted[l] > cap[l] + _EPS}
+        residual = {l: max(cap[l] - used[l], 0.0) for l in comp_l}
+        extra_in = {f: (self.flows[f].links, self.flows[f].max_mbps - guar[f], self.flows[f].weight)
+                    for f in comp_f}
+        extra, _ = progressive_fill(extra_in, residual)
+        for f in comp_f:
+            a = self.flows[f]
+            a.guaranteed = guar[f]
+            a.ceil = guar[f] + extra[f]
+        self.recomputed += len(comp_f)
+
+    def get(self, flow_id: str) -> Allocation:
+        return self.flows[flow_id]
+
+    def link_usage(self) -> Dict[str, Dict[str, float]]:
+        out = {}
+        for l, c in sorted(self.capacity.items()):
+            fs = [self.flows[f] for f in self._users[l]]
+            out[l] = {"capacity_mbps": c,
+                      "guaranteed_mbps": round(sum(a.guaranteed for a in fs), 6),
+                      "ceil_mbps": round(sum(a.ceil for a in fs), 6),
+                      "flows": len(fs)}
+        return out
@@ -0,0 +1,130 @@
+"""
+intent.py — visão plana e compacta (__slots__) dos requisitos de um spec.
+
+Os estágios em lote (capability_matrix, compose_index, policy_table, ...)
+precisam dos mesmos poucos campos de cada spec — banda, prioridade, latência,
+multicast — e não da árvore completa. from_spec() aceita:
+
+  - o spec L2I-v0 (requirements.{bandwidth,priority,latency,multicast});
+  - o formato antigo dos cenários (bandwidth/priority/latency/multicast no
+    topo, endpoints.source/receivers com o domínio de cada ponta);
+  - o objeto devolvido por validate_spec/apply_policies (dataclass ou dict).
+
+Campos ausentes viram neutros: sem banda → min_mbps = max_mbps = 0; sem
+prioridade → medium; sem latência → latency_ms = None.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from plan_ir import PRIORITY_LEVELS, _get, _num, priority_rank
+
+
+class Intent:
+    __slots__ = ("flow_id", "tenant", "scope", "port", "min_mbps", "max_mbps", "burst_mbps",
+                 "priority", "latency_ms", "mc_enabled", "mc_group", "domains")
+
+    def __init__(self, flow_id: str = "", tenant: str = "", scope: str = "", port: str = "",
+                 min_mbps: float = 0.0, max_mbps: float = 0.0, burst_mbps: float = 0.0,
+                 priority: int = 2, latency_ms: Optional[float] = None,
+                 mc_enabled: bool = False, mc_group: Optional[str] = None,
+                 domains: Tuple[str, ...] = ()):
+        self.flow_id = flow_id; self.tenant = tenant; self.scope = scope; self.port = port
+        self.min_mbps = min_mbps; self.max_mbps = max_mbps; self.burst_mbps = burst_mbps
+        self.priority = priority; self.latency_ms = latency_ms
+        self.mc_enabled = mc_enabled; self.mc_group = mc_group; self.domains = domains
+
+    @property
+    def key(self) -> Tuple[str, str, str]:
+        """Onde o intent compete por recursos: (tenant, scope, porta)."""
+        return (self.tenant, self.scope, self.port)
+
+    @property
+    def flow_key(self) -> Tuple[str, str, str]:
+        """Identidade do fluxo (lote, composição, filas): (tenant, scope, flow_id)."""
+        return (self.tenant, self.scope, self.flow_id)
+
+    def to_json_dict(self) -> Dict[str, Any]:
+        out = {s: getattr(self, s) for s in self.__slots__}
+        out["priority"] = PRIORITY_LEVELS[self.priority] if 0 <= self.priority < 4 else self.priority
+        out["domains"] = list(self.domains)
+        return out
+
+    def __repr__(self) -> str:
+        return f"Intent({self.tenant}/{self.scope}/{self.flow_id})"
+
+
+def _domains(endpoints: Any) -> Tuple[str, ...]:
+    # domínios na ordem origem → receptores, sem repetição
+    if endpoints is None:
+        return ()
+    out: List[str] = []
+    src = _get(endpoints, "source")
+    ends = [src] if src is not None else []
+    ends += list(_get(endpoints, "receivers", "destinations", default=[]) or [])
+    dst = _get(endpoints, "destination", "dst")
+    if dst is not None:
+        ends.append(dst)
+    for e in ends:
+        d = _get(e, "domain")
+        if d is not None and str(d) not in out:
+            out.append(str(d))
+    return tuple(out)
+
+
+def _from_v0(spec: Dict[str, Any], req: Dict[str, Any]) -> Intent:
+    # caminho rápido para o dict L2I-v0 já validado (o caso dos lotes)
+    bw = req.get("bandwidth") or {}
+    lo = float(bw.get("min_mbps") or 0.0)
+    hi = bw.get("max_mbps")
+    lat = req.get("latency")
+    mc = req.get("multicast") or {}
+    prio = req.get("priority")
+    return Intent(
+        flow_id=spec["flow"]["id"], tenant=spec["tenant"], scope=spec["scope"],
+        port=str(spec.get("port") or ""),
+        min_mbps=lo, max_mbps=max(float(hi), lo) if hi is not None else lo,
+        burst_mbps=float(bw.get("burst_mbps") or 0.0),
+        priority=priority_rank(prio["level"]) if prio else 2,
+        latency_ms=float(lat["max_ms"]) if lat else None,
+        mc_enabled=bool(mc.get("enabled")), mc_group=mc.get("group_id"),
+    )
+
+
+def from_spec(spec: Any) -> Intent:
+    if (isinstance(spec, dict) and isinstance(spec.get("requirements"), dict)
+            and isinstance(spec.get("flow"), dict) and "endpoints" not in spec
+            and "tenant" in spec and "scope" in spec):
+        return _from_v0(spec, spec["requirements"])
+    req = _get(spec, "requirements", default=spec)
+    flow = _get(spec, "flow")
+    flow_id = _get(flow, "id") if flow is not None else None
+    bw = _get(req, "bandwidth", default={})
+    lo = _num(_get(bw, "min_mbps"), 0.0)
+    hi = max(_num(_get(bw, "max_mbps"), lo), lo)
+    lat = _get(req, "latency")
+    latency = lat if isinstance(lat, (int, float)) else (_get(lat, "max_ms") if lat is not None else None)
+    mc = _get(req, "multicast", default={})
+    endpoints = _get(spec, "endpoints")
+    src = _get(endpoints, "source") if endpoints is not None else None
+    return Intent(
+        flow_id=str(flow_id or _get(spec, "flow_id", default="")),
+        tenant=str(_get(spec, "tenant", default="")),
+        scope=str(_get(spec, "scope", default="")),
+        port=str(_get(spec, "port", default=None) or (_get(src, "port", default="") if src is not None else "")),
+        min_mbps=lo, max_mbps=hi, burst_mbps=_num(_get(bw, "burst_mbps"), 0.0),
+        priority=priority_rank(_get(req, "priority", default="medium")),
+        latency_ms=_num(latency) if latency is not None else None,
+        mc_enabled=bool(_get(mc, "enabled", default=False)),
+        mc_group=_get(mc, "group_id", "group"),
+        domains=_domains(endpoints),
+    )
+
+
+def as_intent(obj: Any) -> Intent:
+    return obj if isinstance(obj, Intent) else from_spec(obj)
+
+
+def from_specs(specs: Iterable[Any]) -> List[Intent]:
+    return [as_intent(s) for s in specs]
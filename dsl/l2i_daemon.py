@@ -0,0 +1,395 @@
+"""
+l2i_daemon.py — compilador L2I residente (asyncio), servindo plan/netconf/p4.
+
+O processo sobe uma vez, valida os perfis, aquece o cache de estágios e os
+emissores, e então atende pedidos concorrentes por um socket local:
+
+  - Unix socket (default /tmp/l2i.sock), ou
+  - TCP em localhost (--tcp 127.0.0.1:7979; só loopback, sem autenticação).
+
+Um caminho de socket existente só é reaproveitado se for um socket sem
+daemon atendendo; arquivo comum ou daemon vivo → DaemonError.
+
+Protocolo: uma requisição JSON por linha, uma resposta JSON por linha, na mesma
+conexão (pipelining permitido; respostas saem na ordem em que terminam e levam
+o "id" da requisição; toda requisição recebe resposta, mesmo se falhar; linha
+acima de MAX_LINE bytes → erro e a conexão é fechada):
+
+  {"id": 1, "cmd": "plan", "profile": "p4", "spec": {...}}   (profile opcional)
+  {"id": 1, "ok": true, "result": {...}, "elapsed_ms": 0.41}
+
+Comandos: plan | netconf | p4 | netconf-apply | p4-apply | stats | ping. O
+comando "stats" devolve as métricas de latência por comando (p50/p95/p99/max
+em ms), contadores, o estado do cache, do pool NETCONF e dos canais P4Runtime.
+
+"netconf-apply" compila o spec para NETCONF e faz o edit-config no alvo do
+pedido ({"target": {"host", "port", "user", "password", "timeout"}}, como no
+target dos artefatos do domínio B) por uma sessão do pool (netconf_pool.py),
+que fica aberta entre pedidos e é compartilhada pelos workers.
+
+"p4-apply" ({"target": {"addr", "device_id", "p4info", "ports"}}) escreve no switch só
+o delta (plan_delta.py) em relação ao último plano aplicado daquele fluxo
+naquele device, num único RPC Write pelo canal persistente (p4rt_client.py).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import ipaddress
+import socket
+import stat
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+DEFAULT_SOCKET = "/tmp/l2i.sock"
+COMPILE_CMDS = ("plan", "netconf", "p4")
+APPLY_CMDS = ("netconf-apply", "p4-apply")
+MAX_LINE = 1 << 24
+
+
+class DaemonError(ValueError):
+    pass
+
+
+def _error(req_id: Any, msg: str) -> Dict[str, Any]:
+    return {"id": req_id, "ok": False, "errors": [{"code": "E_DAEMON", "msg": msg}]}
+
+
+def _pct(sorted_vals, q: float) -> Optional[float]:
+    if not sorted_vals:
+        return None
+    i = min(len(sorted_vals) - 1, max(0, int(round(q * (len(sorted_vals) - 1)))))
+    return round(sorted_vals[i], 3)
+
+
+class LatencyMetrics:
+    """Contadores e janela deslizante de latências (ms) por comando."""
+
+    def __init__(self, window: int = 4096):
+        self.window = window
+        self.started = time.time()
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._count: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+        self._lat: Dict[str, Deque[float]] = {}
+
+    def observe(self, cmd: str, ms: float, ok: bool) -> None:
+        with self._lock:
+            self._count[cmd] = self._count.get(cmd, 0) + 1
+            if not ok:
+                self._errors[cmd] = self._errors.get(cmd, 0) + 1
+            self._lat.setdefault(cmd, deque(maxlen=self.window)).append(ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            per_cmd = {}
+            for cmd, lat in self._lat.items():
+                s = sorted(lat)
+                per_cmd[cmd] = {
+                    "count": self._count.get(cmd, 0),
+                    "errors": self._errors.get(cmd, 0),
+                    "p50_ms": _pct(s, 0.50),
+                    "p95_ms": _pct(s, 0.95),
+                    "p99_ms": _pct(s, 0.99),
+                    "max_ms": round(s[-1], 3) if s else None,
+                    "window": len(s),
+                }
+            return {
+                "uptime_s": round(time.time() - self.started, 1),
+                "in_flight": self.in_flight,
+                "commands": per_cmd,
+            }
+
+
+class CompileService:
+    """
+    Estado quente do daemon. As dependências do pipeline são injetadas por
+    cli.py (e2e_pipeline, resolução de perfil e render), para que o daemon use
+    exatamente o mesmo caminho de compilação da linha de comando.
+    """
+
+    def __init__(
+        self,
+        pipeline: Callable[..., Tuple[Any, Any]],
+        resolve_profile: Callable[[Dict[str, Any], Optional[str]], Dict[str, Any]],
+        render: Callable[[str, Any], Any],
+        cache: Any = None,
+        workers: int = 4,
+        netconf_pool: Any = None,
+        p4rt: Any = None,
+    ):
+        self.pipeline = pipeline
+        self.resolve_profile = resolve_profile
+        self.render = render
+        self.cache = cache
+        self.netconf_pool = netconf_pool
+        self.p4rt = p4rt
+        self._applied: Dict[Tuple[str, int, Any], Any] = {}   # (addr, device, fluxo) → PlanIR aplicado
+        self._applied_lock = threading.Lock()
+        self.metrics = LatencyMetrics()
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="l2i-compile")
+
+    def compile(self, cmd: str, profile_name: Optional[str], spec_doc: Dict[str, Any]) -> Dict[str, Any]:
+        # sem "profile" no pedido vale o target_profile do spec
+        profile = self.resolve_profile(spec_doc, profile_name)
+        plan, err = self.pipeline(spec_doc, profile, cache=self.cache)
+        if not plan:
+            return {"ok": False, **err}
+        return {"ok": True, "result": self.render(cmd, plan)}
+
+    def apply_netconf(self, profile_name: Optional[str], spec_doc: Dict[str, Any],
+                      target: Dict[str, Any]) -> Dict[str, Any]:
+        resp = self.compile("netconf", profile_name, spec_doc)
+        if not resp["ok"]:
+            return resp
+        applied = self.netconf_pool.edit_config(target, resp["result"])
+        return {"ok": applied.pop("ok"), "result": {"config": resp["result"], "apply": applied}}
+
+    def apply_p4(self, profile_name: Optional[str], spec_doc: Dict[str, Any],
+                 target: Dict[str, Any]) -> Dict[str, Any]:
+        import plan_delta
+        import plan_ir
+        profile = self.resolve_profile(spec_doc, profile_name)
+        plan, err = self.pipeline(spec_doc, profile, cache=self.cache)
+        if not plan:
+            return {"ok": False, **err}
+        try:
+            ports = plan_delta.port_map(profile, target.get("ports"))
+        except plan_delta.PortMapError as e:
+            return {"ok": False, "errors": [{"code": "E_PORT_MAP", "msg": str(e.args[0])}]}
+        client = self.p4rt.client(target.get("addr", "127.0.0.1:9559"), int(target.get("device_id", 0)),
+                                  p4info=target.get("p4info"))
+        try:
+            new = plan_ir.from_plan(plan)
+        except plan_ir.PlanShapeError as e:
+            return {"ok": False, "errors": [{"code": "E_PLAN_SHAPE", "msg": str(e)}]}
+        key = (client.addr, client.device_id, new.key())
+        with self._applied_lock:
+            prev = self._applied.get(key)
+        changes = plan_delta.diff_plans(prev, new)
+        try:
+            updates = plan_delta.render_p4runtime_delta(changes, new, ports, plan_delta.meter_names(profile))["updates"]
+        except plan_delta.PortMapError as e:
+            return {"ok": False, "errors": [{"code": "E_PORT_MAP", "msg": str(e.args[0])}]}
+        written = client.write_updates(updates)
+        with self._applied_lock:
+            self._applied[key] = new
+        return {"ok": True, "result": {"summary": plan_delta.summarize(changes), "apply": written}}
+
+    def stats(self) -> Dict[str, Any]:
+        out = self.metrics.snapshot()
+        if self.cache is not None:
+            out["cache"] = dict(self.cache.stats)
+        if self.netconf_pool is not None:
+            out["netconf_pool"] = self.netconf_pool.stats()
+        if self.p4rt is not None:
+            out["p4rt"] = self.p4rt.stats()
+        return out
+
+    async def handle(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        cmd = req.get("cmd", "plan")
+        if cmd == "ping":
+            return {"ok": True, "result": "pong"}
+        if cmd == "stats":
+            return {"ok": True, "result": self.stats()}
+        if cmd == "netconf-apply":
+            if self.netconf_pool is None:
+                return {"ok": False, "errors": [{"code": "E_DAEMON", "msg": "daemon sem pool NETCONF (serve --netconf-sessions N)"}]}
+            if not isinstance(req.get("target"), dict):
+                return {"ok": False, "errors": [{"code": "E_DAEMON", "msg": "campo 'target' (objeto) ausente"}]}
+        elif cmd == "p4-apply":
+            if self.p4rt is None:
+                return {"ok": False, "errors": [{"code": "E_DAEMON", "msg": "daemon sem P4Runtime (serve --p4rt)"}]}
+            if not isinstance(req.get("target"), dict):
+                return {"ok": False, "errors": [{"code": "E_DAEMON", "msg": "campo 'target' (objeto) ausente"}]}
+        elif cmd not in COMPILE_CMDS:
+            return {"ok": False, "errors": [{"code": "E_DAEMON", "msg": f"comando desconhecido: {cmd}"}]}
+        if not isinstance(req.get("spec"), dict):
+            return {"ok": False, "errors": [{"code": "E_DAEMON", "msg": "campo 'spec' (objeto) ausente"}]}
+
+        t0 = time.perf_counter()
+        self.metrics.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            if cmd in APPLY_CMDS:
+                fn = self.apply_netconf if cmd == "netconf-apply" else self.apply_p4
+                resp = await loop.run_in_executor(self.pool, fn, req.get("profile"), req["spec"], req["target"])
+            else:
+                resp = await loop.run_in_executor(
+                    self.pool, self.compile, cmd, req.get("profile"), req["spec"])
+        except Exception as e:  # erro de um pedido não derruba o daemon
+            resp = {"ok": False, "errors": [{"code": "E_DAEMON", "msg": f"{type(e).__name__}: {e}"}]}
+        finally:
+            self.metrics.in_flight -= 1
+        ms = (time.perf_counter() - t0) * 1000.0
+        self.metrics.observe(cmd, ms, resp.get("ok", False))
+        resp["elapsed_ms"] = round(ms, 3)
+        return resp
+
+
+def _dumps(obj: Any) -> bytes:
+    return (json.dumps(obj, default=lambda o: o.__dict__, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+async def _serve_conn(svc: CompileService, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    write_lock = asyncio.Lock()
+    pending = set()
+
+    async def send(resp: Dict[str, Any]) -> None:
+        async with write_lock:
+            writer.write(_dumps(resp))
+            await writer.drain()
+
+    async def one(line: bytes) -> None:
+        try:
+            req = json.loads(line)
+            if not isinstance(req, dict):
+                raise ValueError("requisição deve ser um objeto JSON")
+        except ValueError as e:
+            await send(_error(None, f"JSON inválido: {e}"))
+            return
+        req_id = req.get("id")
+        try:
+            resp = {"id": req_id, **(await svc.handle(req))}
+            out = _dumps(resp)
+        except Exception as e:  # o cliente sempre recebe uma resposta com o seu id
+            out = _dumps(_error(req_id, f"{type(e).__name__}: {e}"))
+        async with write_lock:
+            writer.write(out)
+            await writer.drain()
+
+    try:
+        while True:
+            try:
+                line = await reader.readline()
+            except (ValueError, asyncio.LimitOverrunError):
+                # linha acima de MAX_LINE: o resto do fluxo está dessincronizado
+                await send(_error(None, f"requisição acima de {MAX_LINE} bytes"))
+                break
+            if not line:
+                break
+            if not line.strip():
+                continue
+            t = asyncio.ensure_future(one(line))
+            pending.add(t)
+            t.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+    except (ConnectionResetError, BrokenPipeError):
+        pass
+    finally:
+        writer.close()
+
+
+def check_loopback(host: str) -> None:
+    """O protocolo não tem autenticação: TCP só em loopback."""
+    if host == "localhost":
+        return
+    try:
+        if ipaddress.ip_address(host).is_loopback:
+            return
+    except ValueError:
+        pass
+    raise DaemonError(f"--tcp só aceita loopback (127.0.0.1, ::1, localhost): {host}")
+
+
+def claim_socket(path: str) -> None:
+    """Libera `path` para o bind: só remove um socket sem daemon vivo."""
+    try:
+        st = os.lstat(path)
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(st.st_mode):
+        raise DaemonError(f"{path} existe e não é um socket; recusando apagar")
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    probe.settimeout(1.0)
+    try:
+        probe.connect(path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        os.unlink(path)   # socket órfão de um daemon que morreu
+        return
+    except OSError as e:
+        raise DaemonError(f"{path}: não foi possível verificar o socket ({e})") from e
+    finally:
+        probe.close()
+    raise DaemonError(f"{path}: já há um daemon atendendo")
+
+
+def _shutdown(svc: CompileService) -> None:
+    svc.pool.shutdown(wait=False)
+    if svc.netconf_pool is not None:
+        svc.netconf_pool.close_all()
+    if svc.p4rt is not None:
+        svc.p4rt.close_all()
+
+
+async def serve_forever(svc: CompileService, socket_path: Optional[str] = None,
+                        tcp: Optional[Tuple[str, int]] = None) -> None:
+    handler = lambda r, w: _serve_conn(svc, r, w)
+    try:
+        if tcp is not None:
+            check_loopback(tcp[0])
+            server = await asyncio.start_server(handler, host=tcp[0], port=tcp[1], limit=MAX_LINE)
+            where = f"tcp://{tcp[0]}:{tcp[1]}"
+        else:
+            socket_path = socket_path or DEFAULT_SOCKET
+            claim_socket(socket_path)
+            server = await asyncio.start_unix_server(handler, path=socket_path, limit=MAX_LINE)
+            where = f"unix://{socket_path}"
+    except BaseException:
+        _shutdown(svc)   # o socket (se existir) é de outro processo: não é removido
+        raise
+    print(f"[l2i-daemon] ouvindo em {where}", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        _shutdown(svc)
+        if tcp is None and socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+# ------------------------- cliente -------------------------
+
+class DaemonClient:
+    """Cliente síncrono mínimo (para sweeps/controladores em malha fechada)."""
+
+    def __init__(self, socket_path: Optional[str] = DEFAULT_SOCKET,
+                 tcp: Optional[Tuple[str, int]] = None, timeout: float = 30.0):
+        if tcp is not None:
+            self._sock = socket.create_connection(tcp, timeout=timeout)
+        else:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.settimeout(timeout)
+            self._sock.connect(socket_path)
+        self._rfile = self._sock.makefile("rb")
+        self._next_id = 0
+
+    def request(self, cmd: str, spec: Optional[Dict[str, Any]] = None,
+                profile: Optional[str] = None, target: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        self._next_id += 1
+        req: Dict[str, Any] = {"id": self._next_id, "cmd": cmd}
+        if profile is not None:
+            req["profile"] = profile
+        if target is not None:
+            req["target"] = target
+        if spec is not None:
+            req["spec"] = spec
+        self._sock.sendall(_dumps(req))
+        return json.loads(self._rfile.readline())
+
+    def close(self) -> None:
+        self._rfile.close()
+        self._sock.close()
+
+    def __enter__(self) -> "DaemonClient":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
@@ -0,0 +1,227 @@
+"""
+mcast_groups.py — ids numéricos de grupo multicast, densos e consistentes entre domínios.
+
+O group_id do spec ("G1" no S2) precisa virar um número em [1, max_groups]
+de cada perfil (64 no legacy, 512 em domA/domB, 1024 no p4-bmv2-basic). Os
+grupos podem ser muitos e de vida curta, então:
+
+  - GidPool: por domínio, um bitmap (bytearray, 1 bit por gid) + pilha de ids
+    liberados + ponteiro para o próximo id nunca usado. alloc/free/take em
+    O(1) amortizado; ids liberados são reutilizados antes de avançar o
+    ponteiro, então os ids em uso ficam em [1, pico de grupos simultâneos] —
+    sem fragmentação.
+  - GroupAllocator: o mesmo gid em todos os domínios do grupo quando
+    possível. Um pool global (união dos ids em uso) propõe o candidato; ele é
+    aceito se cabe no max_groups e está livre em cada domínio (consulta ao
+    bitmap). Antes dele vale o próximo id do domínio mais restrito (menor
+    max_groups), que mantém os ids baixos. Se nenhum servir, até MAX_PROBES
+    candidatos; depois disso cada domínio aloca o seu (o grupo fica não
+    consistente — ver consistent()).
+
+Domínios novos são semeados sob demanda por `resolve_profile`
+(multicast.max_groups; modo "none" → 0 grupos).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+MAX_PROBES = 4
+
+
+class GroupError(KeyError):
+    pass
+
+
+class GidPool:
+    __slots__ = ("size", "_bits", "_free", "_next", "used")
+
+    def __init__(self, size: int):
+        self.size = int(size)
+        self._bits = bytearray((self.size >> 3) + 1)
+        self._free: List[int] = []   # liberados (podem estar obsoletos se take() os pegou)
+        self._next = 1               # menor id nunca entregue por alloc
+        self.used = 0
+
+    def __contains__(self, gid: int) -> bool:
+        return 0 < gid <= self.size and bool(self._bits[gid >> 3] & (1 << (gid & 7)))
+
+    def _set(self, gid: int) -> None:
+        self._bits[gid >> 3] |= 1 << (gid & 7)
+        self.used += 1
+
+    def alloc(self) -> Optional[int]:
+        """Menor custo: um id liberado; senão o próximo nunca usado. None = esgotado."""
+        while self._free:
+            gid = self._free.pop()
+            if gid not in self:
+                self._set(gid)
+                return gid
+        while self._next <= self.size:
+            gid = self._next
+            self._next += 1
+            if gid not in self:
+                self._set(gid)
+                return gid
+        return None
+
+    def take(self, gid: int) -> bool:
+        """Reserva um id específico (o mesmo de outro domínio); False se ocupado/fora."""
+        if not 0 < gid <= self.size or gid in self:
+            return False
+        self._set(gid)
+        return True
+
+    def free(self, gid: int) -> None:
+        if gid not in self:
+            return
+        self._bits[gid >> 3] &= ~(1 << (gid & 7)) & 0xFF
+        self.used -= 1
+        if gid < self._next:
+            self._free.append(gid)
+
+    def peek(self) -> Optional[int]:
+        """Próximo id que alloc() devolveria, sem reservar (descarta obsoletos)."""
+        while self._free and self._free[-1] in self:
+            self._free.pop()
+        if self._free:
+            return self._free[-1]
+        while self._next <= self.size and self._next in self:
+            self._next += 1
+        return self._next if self._next <= self.size else None
+
+
+class GroupAllocator:
+    def __init__(self, resolve_profile: Optional[Callable[[str], Dict[str, Any]]] = None,
+                 max_groups: Optional[Dict[str, int]] = None):
+        self.resolve_profile = resolve_profile
+        self.pools: Dict[str, GidPool] = {d: GidPool(n) for d, n in (max_groups or {}).items()}
+        self._global = GidPool(max((p.size for p in self.pools.values()), default=0))
+        self.groups: Dict[str, Dict[str, int]] = {}   # grupo → {domínio: gid}
+        self._lock = threading.Lock()
+
+    def _pool(self, domain: str) -> GidPool:
+        pool = self.pools.get(domain)
+        if pool is None:
+            if self.resolve_profile is None:
+                raise GroupError(f"domínio sem max_groups: {domain}")
+            mc = self.resolve_profile(domain).get("multicast", {})
+            n = 0 if mc.get("mode", "none") == "none" else int(mc.get("max_groups", 0))
+            pool = self.pools[domain] = GidPool(n)
+            if n > self._global.size:
+                self._grow_global(n)
+        return pool
+
+    def _grow_global(self, n: int) -> None:
+        old = self._global
+        self._global = GidPool(n)
+        for gid in range(1, old.size + 1):
+            if gid in old:
+                self._global.take(gid)
+
+    def allocate(self, group: str, domains: Sequence[str]) -> Dict[str, int]:
+        """
+        gid de `group` em cada domínio (idempotente; domínios novos de um grupo
+        existente reaproveitam o gid dele, se livre). GroupError se algum
+        domínio esgotou os grupos.
+        """
+        with self._lock:
+            pools = {d: self._pool(d) for d in domains}
+            have = self.groups.get(group, {})
+            todo = [d for d in domains if d not in have]
+            if not todo:
+                return {d: have[d] for d in domains}
+            got: Dict[str, int] = {}
+            # 1) o gid que o grupo já usa em outro domínio
+            prev = next(iter(have.values()), None)
+            if prev is not None and all(prev <= pools[d].size and prev not in pools[d] for d in todo):
+                got = {d: prev for d in todo}
+            # 2) o próximo id do domínio mais restrito (ids baixos, cabem em todos)
+            tight = min(todo, key=lambda d: pools[d].size)
+            cand = None if got else pools[tight].peek()
+            if cand is not None and all(cand <= pools[d].size and cand not in pools[d] for d in todo):
+                got = {d: cand for d in todo}
+            # 3) candidatos do pool global, livres em todos os domínios
+            probes: List[int] = []
+            while not got and len(probes) < MAX_PROBES:
+                cand = self._global.alloc()
+                if cand is None:
+                    break
+                probes.append(cand)
+                if all(cand <= pools[d].size and cand not in pools[d] for d in todo):
+                    got = {d: cand for d in todo}
+                    probes.pop()   # fica reservado no global
+            for gid in probes:
+                if not any(gid in p for p in self.pools.values()):
+                    self._global.free(gid)
+            # 4) sem id comum: cada domínio aloca o seu
+            if not got:
+                for d in todo:
+                    gid = pools[d].alloc()
+                    if gid is None:
+                        for d2, g2 in got.items():
+                            self._release_one(d2, g2)
+                        raise GroupError(f"{d}: max_groups ({pools[d].size}) esgotado para {group}")
+                    got[d] = gid
+                    self._global.take(gid)
+            else:
+                for d, gid in got.items():
+                    pools[d].take(gid)
+                self._global.take(next(iter(got.values())))
+            have = self.groups.setdefault(group, {})
+            have.update(got)
+            return {d: have[d] for d in domains}
+
+    def _release_one(self, domain: str, gid: int) -> None:
+        self.pools[domain].free(gid)
+        if not any(gid in p for p in self.pools.values()):
+            self._global.free(gid)
+
+    def free(self, group: str, domains: Optional[Sequence[str]] = None) -> Dict[str, int]:
+        """Libera o grupo (em todos os domínios, ou só nos informados)."""
+        with self._lock:
+            have = self.groups.get(group, {})
+            out = {}
+            for d in list(domains if domains is not None else have):
+                gid = have.pop(d, None)
+                if gid is not None:
+                    self._release_one(d, gid)
+                    out[d] = gid
+            if not have:
+                self.groups.pop(group, None)
+            return out
+
+    def consistent(self, group: str) -> bool:
+        return len(set(self.groups.get(group, {}).values())) <= 1
+
+    def usage(self) -> Dict[str, Dict[str, int]]:
+        return {d: {"max_groups": p.size, "used": p.used} for d, p in sorted(self.pools.items())}
+
+    def to_json_dict(self) -> Dict[str, Any]:
+        return {"max_groups": {d: p.size for d, p in self.pools.items()}, "groups": self.groups}
+
+    def load(self, doc: Dict[str, Any]) -> None:
+        """Recarrega grupos de to_json_dict() preservando os gids."""
+        with self._lock:
+            for group, by_dom in doc.get("groups", {}).items():
+                for d, gid in by_dom.items():
+                    if self._pool(d).take(int(gid)):
+                        self._global.take(int(gid))
+                        self.groups.setdefault(group, {})[d] = int(gid)
+
+    def save(self, path: str) -> None:
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_json_dict(), f, indent=2, ensure_ascii=False)
+        os.replace(tmp, path)
+
+
+def open_allocator(path: Optional[str], resolve_profile: Optional[Callable[[str], Dict[str, Any]]] = None) -> GroupAllocator:
+    ga = GroupAllocator(resolve_profile)
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            ga.load(json.load(f))
+    return ga
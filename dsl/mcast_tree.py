@@ -0,0 +1,387 @@
+"""
+mcast_tree.py — árvore multicast orientada à origem sobre o grafo de domínios.
+
+O S2 fixa a origem h1 (A) e dois receptores (B/h3, C/h4) com tree = SPT. Aqui
+a árvore é calculada para qualquer número de receptores e domínios:
+
+  1) receptores agregados por domínio — O(R);
+  2) Dijkstra a partir do domínio da origem no grafo de domínios (arestas =
+     enlaces entre domínios, custo = atraso em ms) — O(E log V);
+  3) a árvore é a união dos caminhos mais curtos até os domínios com
+     receptores. Cada enlace da árvore leva UMA cópia: a replicação acontece
+     no domínio onde o caminho se ramifica, nunca antes — é o que minimiza os
+     bytes duplicados nos enlaces entre domínios;
+  4) max_replications_per_group de cada perfil: um domínio com mais réplicas
+     (filhos + receptores locais) que o limite tenta primeiro passar filhos
+     para outro domínio já na árvore, vizinho e com folga (o de menor custo);
+     o que sobrar vira replicação em cascata dentro do domínio — `groups`
+     grupos em `depth` níveis (cada grupo filho ocupa 1 réplica do pai).
+
+Devolve o plano de replicação por domínio (pai, filhos, receptores locais,
+réplicas, grupos, profundidade, custo desde a origem).
+
+Join/leave não recalculam a árvore: graft() pendura o receptor (e, se
+preciso, o ramo novo pelo caminho mais curto até o primeiro domínio já na
+árvore) e prune() remove o receptor e os ramos que ficarem vazios. Ambos
+devolvem, por domínio, só as mudanças de grupo (plan_delta.Change de kind
+mc_group), prontas para render_netconf_delta / render_p4runtime_delta; os
+receptores existentes mantêm pai e portas. Um join que deixa um domínio sem
+como replicar (max_replications_per_group < 2 e mais réplicas que ele) é
+desfeito e levanta TreeError, como em build_tree.
+"""
+
+from __future__ import annotations
+
+import heapq
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from plan_delta import Change
+from plan_ir import McGroupIR, _get
+
+DEFAULT_MAX_REPLICATIONS = 32
+
+
+class TreeError(ValueError):
+    pass
+
+
+class DomainGraph:
+    """Grafo não direcionado de domínios; custo por enlace (ms)."""
+
+    def __init__(self, links: Optional[Dict[Tuple[str, str], float]] = None):
+        self.adj: Dict[str, Dict[str, float]] = defaultdict(dict)
+        for (a, b), cost in (links or {}).items():
+            self.add_link(a, b, cost)
+
+    def add_link(self, a: str, b: str, cost: float = 1.0) -> None:
+        self.adj[a][b] = float(cost)
+        self.adj[b][a] = float(cost)
+
+    def __len__(self) -> int:
+        return len(self.adj)
+
+    @classmethod
+    def parse(cls, text: str) -> "DomainGraph":
+        """"A-B=1,B-C=2.5" (custo opcional, default 1)."""
+        g = cls()
+        for item in text.split(","):
+            if not item.strip():
+                continue
+            name, _, cost = item.partition("=")
+            a, _, b = name.strip().partition("-")
+            g.add_link(a, b, float(cost) if cost else 1.0)
+        return g
+
+    @classmethod
+    def chain(cls, domains: Sequence[str], cost: float = 1.0) -> "DomainGraph":
+        g = cls()
+        for a, b in zip(domains, domains[1:]):
+            g.add_link(a, b, cost)
+        return g
+
+    def shortest_paths(self, src: str) -> Tuple[Dict[str, float], Dict[str, Optional[str]]]:
+        dist: Dict[str, float] = {src: 0.0}
+        parent: Dict[str, Optional[str]] = {src: None}
+        heap = [(0.0, src)]
+        done: Set[str] = set()
+        while heap:
+            d, u = heapq.heappop(heap)
+            if u in done:
+                continue
+            done.add(u)
+            for v, c in self.adj.get(u, {}).items():
+                nd = d + c
+                # empate: o pai de nome menor, para a árvore ser determinística
+                if nd < dist.get(v, float("inf")) or (nd == dist.get(v) and v not in done and u < (parent[v] or "")):
+                    dist[v] = nd
+                    parent[v] = u
+                    heapq.heappush(heap, (nd, v))
+        return dist, parent
+
+
+class DomainNode:
+    __slots__ = ("domain", "parent", "children", "receivers", "_hosts", "cost_ms", "max_replications",
+                 "groups", "depth")
+
+    def __init__(self, domain: str, parent: Optional[str], cost_ms: float, max_replications: int):
+        self.domain = domain; self.parent = parent; self.cost_ms = cost_ms
+        self.children: List[str] = []
+        self.receivers: List[str] = []   # na ordem de chegada (portas do grupo)
+        self._hosts: Set[str] = set()    # os mesmos, para o teste de pertinência
+        self.max_replications = max_replications
+        self.groups = 0; self.depth = 0
+
+    @property
+    def replicas(self) -> int:
+        return len(self.children) + len(self.receivers)
+
+    def add_receivers(self, hosts: Iterable[str]) -> None:
+        for h in hosts:
+            if h not in self._hosts:
+                self._hosts.add(h); self.receivers.append(h)
+
+    def drop_receivers(self, gone: Set[str]) -> None:
+        self.receivers = [h for h in self.receivers if h not in gone]
+        self._hosts -= gone
+
+    def to_json_dict(self) -> Dict[str, Any]:
+        return {"parent": self.parent, "children": sorted(self.children), "receivers": self.receivers,
+                "replicas": self.replicas, "max_replications": self.max_replications,
+                "groups": self.groups, "depth": self.depth, "cost_ms": round(self.cost_ms, 6)}
+
+
+def cascade(replicas: int, cap: int) -> Tuple[int, int]:
+    """(grupos, níveis) para `replicas` cópias com até `cap` por grupo (1 slot por grupo filho)."""
+    if replicas <= 0:
+        return 0, 0
+    if cap < 2:
+        return (1, 1) if replicas <= cap else (0, 0)
+    groups = 1 if replicas <= cap else 1 + -(-(replicas - cap) // (cap - 1))
+    depth, reach = 1, cap
+    while reach < replicas:   # árvore de grupos balanceada: cap^depth saídas
+        reach *= cap
+        depth += 1
+    return groups, depth
+
+
+class McastTree:
+    __slots__ = ("group", "source", "nodes", "unreachable", "graph", "gids", "_dist", "_parent", "_cap")
+
+    def __init__(self, group: str, source: str, graph: DomainGraph):
+        self.group = group; self.source = source; self.graph = graph
+        self.nodes: Dict[str, DomainNode] = {}
+        self.unreachable: Dict[str, List[str]] = {}
+        self.gids: Dict[str, int] = {}   # gid numérico por domínio (ver mcast_groups.py)
+        self._dist: Dict[str, float] = {}
+        self._parent: Dict[str, Optional[str]] = {}
+        self._cap: Callable[[str], int] = lambda d: DEFAULT_MAX_REPLICATIONS
+
+    # ------------------------- graft / prune -------------------------
+
+    def group_ir(self, domain: str) -> Optional[McGroupIR]:
+        """Grupo do domínio como na IR: portas = domínios filhos + receptores locais."""
+        n = self.nodes.get(domain)
+        if n is None or not n.replicas:
+            return None
+        return McGroupIR(self.group, self.gids.get(domain, 0), sorted(n.children) + n.receivers)
+
+    def _node(self, d: str) -> DomainNode:
+        n = self.nodes.get(d)
+        if n is None:
+            n = self.nodes[d] = DomainNode(d, self._parent.get(d), self._dist.get(d, 0.0), int(self._cap(d)))
+        return n
+
+    def _delta(self, before: Dict[str, Optional[McGroupIR]], gids: Optional[Dict[str, int]]) -> Dict[str, List[Change]]:
+        self.gids.update(gids or {})
+        out: Dict[str, List[Change]] = {}
+        for d, old in before.items():
+            n = self.nodes.get(d)
+            if n is not None:
+                n.groups, n.depth = cascade(n.replicas, n.max_replications)
+            new = self.group_ir(d)
+            if old == new:
+                continue
+            op = "add" if old is None else "delete" if new is None else "modify"
+            out[d] = [Change(op, "mc_group", self.group, old=old, new=new)]
+        return out
+
+    def graft(self, receivers: Iterable[Any], gids: Optional[Dict[str, int]] = None) -> Dict[str, List[Change]]:
+        """
+        Junta receptores (join). Só toca o domínio do receptor e, se ele ainda
+        não está na árvore, o ramo novo até o primeiro domínio que já está —
+        pais e portas existentes não mudam. Devolve as mudanças por domínio;
+        `gids` (domínio → gid) atualiza os ids numéricos dos grupos. Domínio
+        que passaria do max_replications sem cascata possível → TreeError, com
+        a árvore como estava.
+        """
+        before: Dict[str, Optional[McGroupIR]] = {}
+        added: List[Tuple[str, str]] = []
+
+        def touch(d: str) -> None:
+            if d not in before:
+                before[d] = self.group_ir(d)
+
+        for dom, hosts in receivers_by_domain(receivers).items():
+            if dom not in self._dist:
+                self.unreachable.setdefault(dom, []).extend(hosts)
+                continue
+            touch(dom)
+            n = self.nodes.get(dom)
+            fresh = n is None
+            n = self._node(dom)
+            added.extend((dom, h) for h in dict.fromkeys(hosts) if h not in n._hosts)
+            n.add_receivers(hosts)
+            d = dom
+            while fresh and n.parent is not None:
+                p = n.parent
+                touch(p)
+                fresh = p not in self.nodes
+                q = self._node(p)
+                if d not in q.children:
+                    q.children.append(d)
+                d, n = p, q
+        for d in before:
+            n = self.nodes.get(d)
+            if n is not None and n.replicas and not cascade(n.replicas, n.max_replications)[0]:
+                msg = f"{d}: max_replications_per_group = {n.max_replications} não replica {n.replicas}"
+                self.prune(added)   # desfaz o join
+                raise TreeError(msg)
+        return self._delta(before, gids)
+
+    def prune(self, receivers: Iterable[Any]) -> Dict[str, List[Change]]:
+        """
+        Remove receptores (leave). Um domínio sem receptores nem filhos sai da
+        árvore e libera a porta no pai, subindo enquanto o ramo ficar vazio.
+        """
+        before: Dict[str, Optional[McGroupIR]] = {}
+        for dom, hosts in receivers_by_domain(receivers).items():
+            n = self.nodes.get(dom)
+            if n is None:
+                continue
+            gone = set(hosts)
+            before.setdefault(dom, self.group_ir(dom))
+            n.drop_receivers(gone)
+            while n.replicas == 0 and n.parent is not None:
+                p = self.nodes[n.parent]
+                before.setdefault(p.domain, self.group_ir(p.domain))
+                p.children.remove(n.domain)
+                del self.nodes[n.domain]
+                n = p
+        return self._delta(before, None)
+
+    @property
+    def links(self) -> List[Tuple[str, str]]:
+        return sorted((n.parent, d) for d, n in self.nodes.items() if n.parent is not None)
+
+    def receivers(self) -> int:
+        return sum(len(n.receivers) for n in self.nodes.values())
+
+    def to_json_dict(self) -> Dict[str, Any]:
+        return {
+            "group": self.group, "source": self.source,
+            "inter_domain_copies": len(self.links),
+            "receivers": self.receivers(),
+            "links": [f"{a}-{b}" for a, b in self.links],
+            "domains": {d: n.to_json_dict() for d, n in sorted(self.nodes.items())},
+            "unreachable": self.unreachable,
+        }
+
+
+def receivers_by_domain(receivers: Iterable[Any]) -> Dict[str, List[str]]:
+    """Receptores ({"domain", "host"} ou (domínio, host)) agregados por domínio, na ordem."""
+    out: Dict[str, List[str]] = defaultdict(list)
+    for r in receivers:
+        if isinstance(r, (tuple, list)):
+            dom, host = r[0], r[1]
+        else:
+            dom, host = _get(r, "domain"), _get(r, "host", "name", default="")
+        out[str(dom)].append(str(host))
+    return out
+
+
+def build_tree(source_domain: str, receivers: Iterable[Any], graph: DomainGraph,
+               max_replications: Optional[Callable[[str], int]] = None, group: str = "") -> McastTree:
+    """SPT a partir de `source_domain`; `max_replications(domínio)` vem do perfil."""
+    cap_of = max_replications or (lambda d: DEFAULT_MAX_REPLICATIONS)
+    by_dom = receivers_by_domain(receivers)
+    dist, parent = graph.shortest_paths(source_domain)
+    tree = McastTree(group, source_domain, graph)
+    tree._dist, tree._parent, tree._cap = dist, parent, cap_of
+    node = tree._node
+
+    node(source_domain)
+    for dom, hosts in by_dom.items():
+        if dom not in dist:
+            tree.unreachable[dom] = hosts
+            continue
+        node(dom).add_receivers(hosts)
+        # sobe até encontrar um domínio já na árvore
+        d = dom
+        while parent.get(d) is not None and parent[d] not in tree.nodes:
+            p = parent[d]
+            node(p).children.append(d)
+            d = p
+        if parent.get(d) is not None and d not in tree.nodes[parent[d]].children:
+            tree.nodes[parent[d]].children.append(d)
+    _fit_replications(tree)
+    return tree
+
+
+def _descendants(tree: McastTree, d: str) -> Set[str]:
+    out, stack = set(), [d]
+    while stack:
+        u = stack.pop()
+        if u in out:
+            continue
+        out.add(u)
+        stack.extend(tree.nodes[u].children)
+    return out
+
+
+def _fit_replications(tree: McastTree) -> None:
+    # domínios da origem para as folhas; filhos excedentes vão para um vizinho com folga
+    order = sorted(tree.nodes.values(), key=lambda n: n.cost_ms)
+    for n in order:
+        excess = n.replicas - n.max_replications
+        if excess > 0 and n.children:
+            for child in sorted(n.children, key=lambda c: -tree.nodes[c].cost_ms):
+                if excess <= 0:
+                    break
+                below = _descendants(tree, child)
+                best = None
+                for p, c in tree.graph.adj.get(child, {}).items():
+                    q = tree.nodes.get(p)
+                    if q is None or p == n.domain or p in below or q.replicas >= q.max_replications:
+                        continue
+                    cost = q.cost_ms + c
+                    if best is None or cost < best[0]:
+                        best = (cost, q)
+                if best is None:
+                    continue
+                n.children.remove(child)
+                best[1].children.append(child)
+                moved = tree.nodes[child]
+                delta = best[0] - moved.cost_ms
+                moved.parent = best[1].domain
+                for d in below:
+                    tree.nodes[d].cost_ms += delta
+                excess -= 1
+    for n in order:
+        n.groups, n.depth = cascade(n.replicas, n.max_replications)
+        if n.replicas and not n.groups:
+            raise TreeError(f"{n.domain}: max_replications_per_group = {n.max_replications} não replica")
+
+
+def profile_max_replications(resolve_profile: Callable[[str], Dict[str, Any]]) -> Callable[[str], int]:
+    """max_replications_per_group do perfil de cada domínio (memoizado)."""
+    memo: Dict[str, int] = {}
+
+    def cap(domain: str) -> int:
+        v = memo.get(domain)
+        if v is None:
+            try:
+                mc = resolve_profile(domain).get("multicast", {})
+                v = int(mc.get("max_replications_per_group", DEFAULT_MAX_REPLICATIONS))
+            except KeyError:
+                v = DEFAULT_MAX_REPLICATIONS
+            memo[domain] = v
+        return v
+    return cap
+
+
+def spec_tree(spec: Any, graph: Optional[DomainGraph] = None,
+              resolve_profile: Optional[Callable[[str], Dict[str, Any]]] = None) -> Optional[McastTree]:
+    """Árvore de um spec com endpoints.source/receivers (None se não houver origem)."""
+    endpoints = _get(spec, "endpoints")
+    src = _get(endpoints, "source") if endpoints is not None else None
+    if src is None or _get(src, "domain") is None:
+        return None
+    receivers = list(_get(endpoints, "receivers", "destinations", default=[]) or [])
+    mc = _get(spec, "multicast", default=None) or _get(_get(spec, "requirements", default={}), "multicast", default={})
+    group = str(_get(mc, "group", "group_id", default="") or "")
+    if graph is None:
+        doms = [str(_get(src, "domain"))] + [str(_get(r, "domain")) for r in receivers]
+        graph = DomainGraph.chain(list(dict.fromkeys(doms)))
+    cap = profile_max_replications(resolve_profile) if resolve_profile is not None else None
+    return build_tree(str(_get(src, "domain")), receivers, graph, cap, group)
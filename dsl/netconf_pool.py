@@ -0,0 +1,309 @@
+"""
+netconf_pool.py — pool de sessões NETCONF persistentes (backend do domínio B).
+
+O backend real abria uma sessão SSH/NETCONF nova (127.0.0.1:830, timeout
+10 s) a cada execução e a cada apply; o handshake SSH + <hello> dominava, e
+deixava ruidoso, o control_plane_ms_total do domínio B. Aqui:
+
+  - sessões autenticadas ficam abertas e são reaproveitadas, até
+    `max_per_target` por alvo (host, porta, usuário), compartilhadas por
+    appliers concorrentes (acquire bloqueia até liberar uma, com timeout);
+  - o <hello> do servidor (capacidades e session-id) fica em cache por alvo;
+  - uma sessão ociosa há mais de `check_after_s` é verificada antes de ser
+    entregue (transporte SSH ativo e um <get-config> filtrado vazio
+    respondido); se caiu, é descartada e outra é aberta;
+  - prune_idle() fecha as ociosas há mais de `max_idle_s` (pode rodar numa
+    thread com start_reaper());
+  - close-session (bloqueante) sempre roda fora do lock do pool; close_all()
+    fecha as ociosas e, depois dele, as que voltam por release().
+
+A chave do servidor é verificada contra o known_hosts (~/.ssh/known_hosts)
+por padrão; um alvo de laboratório desliga com "hostkey_verify": false.
+
+ncclient é dependência opcional: só é importado ao abrir a primeira sessão.
+`connect` pode ser injetado (testes, outro cliente NETCONF).
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+TargetKey = Tuple[str, int, str]
+
+DEFAULT_PORT = 830
+DEFAULT_TIMEOUT_S = 10.0
+
+
+class PoolError(RuntimeError):
+    pass
+
+
+def target_key(target: Dict[str, Any]) -> TargetKey:
+    return (str(target.get("host", "127.0.0.1")), int(target.get("port", DEFAULT_PORT)), str(target.get("user", "")))
+
+
+def _ncclient_connect(target: Dict[str, Any]) -> Any:
+    try:
+        from ncclient import manager
+    except ImportError as e:
+        raise PoolError("pacote ncclient ausente (pip install ncclient)") from e
+    return manager.connect(
+        host=target.get("host", "127.0.0.1"), port=int(target.get("port", DEFAULT_PORT)),
+        username=target.get("user"), password=target.get("password"),
+        timeout=float(target.get("timeout", DEFAULT_TIMEOUT_S)),
+        hostkey_verify=bool(target.get("hostkey_verify", True)),
+        allow_agent=False, look_for_keys=bool(target.get("look_for_keys", False)),
+    )
+
+
+def _transport_error(e: BaseException) -> bool:
+    # erros de transporte (socket, ou TransportError/SessionCloseError do ncclient) matam a sessão
+    return isinstance(e, (OSError, EOFError)) or type(e).__name__ in ("TransportError", "SessionCloseError", "SSHError")
+
+
+# filtro subtree que não casa com nada: o <get-config> mais barato que o servidor responde
+_PROBE_FILTER = ("subtree", '<l2i-probe xmlns="urn:l2i:probe"/>')
+
+
+def _healthy(mgr: Any) -> bool:
+    if not getattr(mgr, "connected", False):
+        return False
+    transport = getattr(getattr(mgr, "_session", None), "_transport", None)
+    return transport is None or bool(transport.is_active())
+
+
+def _probe(mgr: Any) -> bool:
+    """Sessão ociosa há muito: transporte ativo e um RPC de ida e volta."""
+    if not _healthy(mgr):
+        return False
+    try:
+        mgr.get_config(source="running", filter=_PROBE_FILTER)
+    except Exception as e:
+        # rpc-error do servidor ainda prova que a sessão responde
+        return not _transport_error(e) and type(e).__name__ not in ("TimeoutExpiredError",)
+    return True
+
+
+class PooledSession:
+    __slots__ = ("mgr", "key", "created", "last_used", "uses")
+
+    def __init__(self, mgr: Any, key: TargetKey):
+        self.mgr = mgr; self.key = key
+        self.created = self.last_used = time.monotonic()
+        self.uses = 0
+
+
+class _Slot:
+    # sessões de um alvo: ociosas (pilha: a mais recente primeiro) + contagem em uso
+    __slots__ = ("idle", "in_use", "cond", "hello", "stats")
+
+    def __init__(self, lock: threading.Lock):
+        self.idle: List[PooledSession] = []
+        self.in_use = 0
+        self.cond = threading.Condition(lock)
+        self.hello: Optional[Dict[str, Any]] = None
+        self.stats = {"opened": 0, "reused": 0, "closed": 0, "health_failures": 0,
+                      "connect_ms_total": 0.0, "waits": 0}
+
+
+class NetconfPool:
+    def __init__(self, max_per_target: int = 4, check_after_s: float = 30.0, max_idle_s: float = 300.0,
+                 connect: Optional[Callable[[Dict[str, Any]], Any]] = None):
+        self.max_per_target = max(1, int(max_per_target))
+        self.check_after_s = check_after_s
+        self.max_idle_s = max_idle_s
+        self.connect = connect or _ncclient_connect
+        self._lock = threading.Lock()
+        self._slots: Dict[TargetKey, _Slot] = {}
+        self._reaper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _slot(self, key: TargetKey) -> _Slot:
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._slots[key] = _Slot(self._lock)
+        return slot
+
+    # ------------------------- acquire / release -------------------------
+
+    def acquire(self, target: Dict[str, Any], wait_s: Optional[float] = None) -> PooledSession:
+        key = target_key(target)
+        deadline = time.monotonic() + (wait_s if wait_s is not None else float(target.get("timeout", DEFAULT_TIMEOUT_S)))
+        while True:
+            s = None
+            with self._lock:
+                slot = self._slot(key)
+                while True:
+                    if self._stop.is_set():
+                        raise PoolError("pool fechado")
+                    if slot.idle:
+                        s = slot.idle.pop()
+                        slot.in_use += 1   # a verificação (RPC) roda fora do lock
+                        break
+                    if slot.in_use < self.max_per_target:
+                        slot.in_use += 1   # reserva a vaga; o handshake roda fora do lock
+                        break
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        raise PoolError(f"{key[0]}:{key[1]}: {self.max_per_target} sessões ocupadas")
+                    slot.stats["waits"] += 1
+                    slot.cond.wait(left)
+            if s is None:
+                break
+            if time.monotonic() - s.last_used <= self.check_after_s or _probe(s.mgr):
+                with self._lock:
+                    slot.stats["reused"] += 1
+                s.uses += 1
+                return s
+            with self._lock:
+                slot.stats["health_failures"] += 1
+                slot.in_use -= 1
+                slot.cond.notify()
+            self._close(slot, s)
+        t0 = time.perf_counter()
+        try:
+            mgr = self.connect(target)
+        except BaseException:
+            with self._lock:
+                slot.in_use -= 1
+                slot.cond.notify()
+            raise
+        ms = (time.perf_counter() - t0) * 1000.0
+        s = PooledSession(mgr, key)
+        s.uses = 1
+        with self._lock:
+            slot.stats["opened"] += 1
+            slot.stats["connect_ms_total"] += ms
+            if slot.hello is None:
+                slot.hello = {"capabilities": sorted(str(c) for c in getattr(mgr, "server_capabilities", []) or []),
+                              "session_id": getattr(mgr, "session_id", None)}
+        return s
+
+    def release(self, s: PooledSession, broken: bool = False) -> None:
+        close = broken or self._stop.is_set() or not _healthy(s.mgr)
+        with self._lock:
+            slot = self._slot(s.key)
+            slot.in_use -= 1
+            if not close:
+                s.last_used = time.monotonic()
+                slot.idle.append(s)
+            slot.cond.notify()
+        if close:   # pool fechado (close_all) ou sessão ruim: não volta para a fila
+            self._close(slot, s)
+
+    @contextmanager
+    def session(self, target: Dict[str, Any], wait_s: Optional[float] = None) -> Iterator[Any]:
+        """with pool.session(alvo) as mgr: mgr.edit_config(...) — erro de transporte descarta a sessão."""
+        s = self.acquire(target, wait_s)
+        broken = False
+        try:
+            yield s.mgr
+        except Exception as e:
+            broken = _transport_error(e)
+            raise
+        finally:
+            self.release(s, broken)
+
+    def _close(self, slot: _Slot, s: PooledSession) -> None:
+        # fora do lock: close-session espera a resposta do servidor
+        with self._lock:
+            slot.stats["closed"] += 1
+        try:
+            s.mgr.close_session()
+        except Exception:
+            pass
+
+    # ------------------------- operações -------------------------
+
+    def capabilities(self, target: Dict[str, Any]) -> List[str]:
+        """Capacidades do <hello> do servidor (abre uma sessão só se ainda não houver cache)."""
+        key = target_key(target)
+        with self._lock:
+            slot = self._slots.get(key)
+            hello = slot.hello if slot is not None else None
+        if hello is None:
+            self.release(self.acquire(target))
+            with self._lock:
+                hello = self._slots[key].hello
+        return list(hello["capabilities"])
+
+    def edit_config(self, target: Dict[str, Any], config: str, datastore: str = "running") -> Dict[str, Any]:
+        """edit-config numa sessão do pool; devolve tempos e se a sessão foi reaproveitada."""
+        t0 = time.perf_counter()
+        s = self.acquire(target)
+        acquired_ms = (time.perf_counter() - t0) * 1000.0
+        broken = False
+        try:
+            reply = s.mgr.edit_config(target=datastore, config=config)
+            return {"ok": bool(getattr(reply, "ok", True)), "reused": s.uses > 1,
+                    "acquire_ms": round(acquired_ms, 3), "total_ms": round((time.perf_counter() - t0) * 1000.0, 3)}
+        except Exception as e:
+            broken = _transport_error(e)
+            raise
+        finally:
+            self.release(s, broken)
+
+    # ------------------------- manutenção -------------------------
+
+    def prune_idle(self) -> int:
+        now = time.monotonic()
+        stale = []
+        with self._lock:
+            for slot in self._slots.values():
+                keep = []
+                for s in slot.idle:
+                    if now - s.last_used > self.max_idle_s:
+                        stale.append((slot, s))
+                    else:
+                        keep.append(s)
+                slot.idle = keep
+        for slot, s in stale:
+            self._close(slot, s)
+        return len(stale)
+
+    def start_reaper(self, interval_s: float = 30.0) -> None:
+        if self._reaper is not None:
+            return
+        def run() -> None:
+            while not self._stop.wait(interval_s):
+                self.prune_idle()
+        self._reaper = threading.Thread(target=run, name="netconf-pool-reaper", daemon=True)
+        self._reaper.start()
+
+    def close_all(self) -> None:
+        """Fecha as ociosas; as em uso são fechadas no release() (e acquire() passa a falhar)."""
+        self._stop.set()
+        idle = []
+        with self._lock:
+            for slot in self._slots.values():
+                idle.extend((slot, s) for s in slot.idle)
+                slot.idle = []
+                slot.cond.notify_all()
+        for slot, s in idle:
+            self._close(slot, s)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = {}
+            for (host, port, user), slot in self._slots.items():
+                st = dict(slot.stats, idle=len(slot.idle), in_use=slot.in_use,
+                          hello_cached=slot.hello is not None)
+                st["connect_ms_total"] = round(st["connect_ms_total"], 3)
+                out[f"{user}@{host}:{port}"] = st
+            return out
+
+
+_default: Optional[NetconfPool] = None
+_default_lock = threading.Lock()
+
+
+def default_pool() -> NetconfPool:
+    """Pool do processo (compartilhado por todos os appliers)."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = NetconfPool()
+        return _default
@@ -0,0 +1,510 @@
+"""
+p4rt_client.py — canal P4Runtime persistente, com arbitragem mantida (domínio C).
+
+p4_push_pipeline.py, p4_program_s1/s2.py e o backend real faziam
+sh.setup(...) → ação → sh.teardown() a cada passo: canal gRPC novo,
+StreamChannel novo e nova eleição de mastership. Aqui um P4RuntimeClient por
+(endereço, device_id) segura tudo aberto:
+
+  - canal gRPC + StreamChannel abertos; uma thread consome o stream e
+    acompanha a arbitragem (primary quando o status da resposta é OK);
+  - se o stream cai, a thread reconecta (backoff exponencial até
+    RECONNECT_MAX_S) e reenvia o MasterArbitrationUpdate com o mesmo
+    election_id, então escritas seguintes voltam a ser do primary;
+  - write()/read() síncronos e write_async()/read_async() (asyncio, sobre os
+    futures do gRPC) — uma atualização de tabela custa um RPC Write;
+  - write_updates() aceita o lote JSON de plan_delta.render_p4runtime_delta
+    e traduz nomes para ids pelo p4info (carregado uma vez por cliente);
+  - push_pipeline() marca o pipeline com um cookie (hash do p4info + JSON
+    bmv2) e só o envia se o cookie lido do device (COOKIE_ONLY) for outro.
+
+P4RuntimeManager.client(addr, device_id) devolve o cliente compartilhado
+(manager() é o do processo). grpc e p4runtime (protobufs p4.v1, os mesmos do
+p4runtime-shell) são importados só ao conectar.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import ipaddress
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_ADDR = "127.0.0.1:9559"
+DEFAULT_ELECTION_ID = (0, 1)
+ARBITRATION_TIMEOUT_S = 10.0
+RECONNECT_MAX_S = 8.0
+RPC_TIMEOUT_S = 10.0
+
+UPDATE_TYPES = ("INSERT", "MODIFY", "DELETE")
+
+
+class P4RTError(RuntimeError):
+    pass
+
+
+def _protos() -> Tuple[Any, Any, Any]:
+    try:
+        import grpc
+        from p4.v1 import p4runtime_pb2, p4runtime_pb2_grpc
+    except ImportError as e:
+        raise P4RTError(f"dependência P4Runtime ausente ({e}); pip install grpcio p4runtime") from e
+    return grpc, p4runtime_pb2, p4runtime_pb2_grpc
+
+
+def encode_value(v: Any, bitwidth: int) -> bytes:
+    """Inteiro, IPv4/IPv6 ou MAC → bytes canônicos do P4Runtime (sem zeros à esquerda)."""
+    if isinstance(v, bytes):
+        n = int.from_bytes(v, "big")
+    elif isinstance(v, int):
+        n = v
+    else:
+        s = str(v)
+        if ":" in s and len(s) == 17 and s.count(":") == 5:
+            n = int(s.replace(":", ""), 16)
+        else:
+            try:
+                n = int(ipaddress.ip_address(s))
+            except ValueError:
+                n = int(s, 0)
+    if n < 0 or n >= 1 << bitwidth:
+        raise P4RTError(f"valor {v!r} não cabe em {bitwidth} bits")
+    return n.to_bytes(max(1, (n.bit_length() + 7) // 8), "big")
+
+
+def parse_p4info(data: bytes) -> Any:
+    """p4info em binário ou texto (.txtpb/.txt, saída do p4c)."""
+    try:
+        from google.protobuf import text_format
+        from p4.config.v1 import p4info_pb2
+    except ImportError as e:
+        raise P4RTError(f"dependência P4Runtime ausente ({e}); pip install p4runtime") from e
+    msg = p4info_pb2.P4Info()
+    try:
+        msg.ParseFromString(data)
+    except Exception:
+        text_format.Merge(data.decode("utf-8"), msg)
+    return msg
+
+
+def pipeline_cookie(p4info: bytes, device_config: bytes) -> int:
+    """Cookie de 64 bits do conteúdo (p4info + JSON bmv2), estável entre execuções."""
+    h = hashlib.sha256()
+    for part in (p4info, device_config):
+        h.update(len(part).to_bytes(8, "big"))
+        h.update(part)
+    return int.from_bytes(h.digest()[:8], "big")
+
+
+class P4Info:
+    """Índices nome → (id, metadados) de um p4info (tabelas, ações, meters)."""
+
+    def __init__(self, p4info: Any):
+        self.msg = p4info
+        self.tables = {t.preamble.name: t for t in p4info.tables}
+        self.actions = {a.preamble.name: a for a in p4info.actions}
+        self.meters = {m.preamble.name: m for m in p4info.meters}
+        for idx in (self.tables, self.actions, self.meters):
+            # "MyIngress.qos_table" também responde por "qos_table"
+            for name, obj in list(idx.items()):
+                idx.setdefault(name.rsplit(".", 1)[-1], obj)
+
+    @classmethod
+    def from_file(cls, path: str) -> "P4Info":
+        with open(path, "rb") as f:
+            return cls(parse_p4info(f.read()))
+
+    def _get(self, idx: Dict[str, Any], kind: str, name: str) -> Any:
+        try:
+            return idx[name]
+        except KeyError:
+            raise P4RTError(f"{kind} desconhecido no p4info: {name}") from None
+
+    def table(self, name: str) -> Any:
+        return self._get(self.tables, "tabela", name)
+
+    def action(self, name: str) -> Any:
+        return self._get(self.actions, "ação", name)
+
+    def meter(self, name: str) -> Any:
+        return self._get(self.meters, "meter", name)
+
+
+class P4RuntimeClient:
+    def __init__(self, addr: str = DEFAULT_ADDR, device_id: int = 0,
+                 election_id: Tuple[int, int] = DEFAULT_ELECTION_ID, p4info: Optional[P4Info] = None):
+        self.addr = addr
+        self.device_id = int(device_id)
+        self.election_id = (int(election_id[0]), int(election_id[1]))
+        self.p4info = p4info
+        self.stats = {"connects": 0, "arbitrations": 0, "writes": 0, "reads": 0, "updates": 0,
+                      "errors": 0, "write_ms_total": 0.0}
+        self._stats_lock = threading.Lock()   # thread do stream, executores e loop asyncio
+        self._pb = None
+        self._grpc = None
+        self._channel = None
+        self._stub = None
+        self._requests: "queue.Queue[Any]" = queue.Queue()
+        self._primary = threading.Event()
+        self._closed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.last_arbitration: Optional[Dict[str, Any]] = None
+
+    # ------------------------- conexão / arbitragem -------------------------
+
+    def connect(self, timeout: float = ARBITRATION_TIMEOUT_S) -> "P4RuntimeClient":
+        """Abre canal + StreamChannel e espera virar primary. Idempotente."""
+        with self._lock:
+            if self._thread is None:
+                self._grpc, self._pb, pb_grpc = _protos()
+                self._channel = self._grpc.insecure_channel(self.addr)
+                self._stub = pb_grpc.P4RuntimeStub(self._channel)
+                self._closed.clear()
+                self._thread = threading.Thread(target=self._stream_loop, name=f"p4rt-{self.addr}", daemon=True)
+                self._thread.start()
+        if not self._primary.wait(timeout):
+            raise P4RTError(f"{self.addr}: sem mastership em {timeout:.0f}s "
+                            f"(election_id={self.election_id}, {self.last_arbitration})")
+        return self
+
+    @property
+    def primary(self) -> bool:
+        return self._primary.is_set()
+
+    def _arbitration_request(self) -> Any:
+        req = self._pb.StreamMessageRequest()
+        arb = req.arbitration
+        arb.device_id = self.device_id
+        arb.election_id.high, arb.election_id.low = self.election_id
+        return req
+
+    def _request_iter(self, q: "queue.Queue[Any]") -> Iterable[Any]:
+        while True:
+            msg = q.get()
+            if msg is None:
+                return
+            yield msg
+
+    def _stream_loop(self) -> None:
+        backoff = 0.25
+        while not self._closed.is_set():
+            q: "queue.Queue[Any]" = queue.Queue()
+            self._requests = q
+            q.put(self._arbitration_request())
+            self._count(connects=1)
+            try:
+                for resp in self._stub.StreamChannel(self._request_iter(q)):
+                    if resp.HasField("arbitration"):
+                        code = resp.arbitration.status.code
+                        self._count(arbitrations=1)
+                        self.last_arbitration = {"code": code, "message": resp.arbitration.status.message}
+                        if code == 0:
+                            self._primary.set()
+                            backoff = 0.25
+                        else:
+                            self._primary.clear()
+                    # packet-in / digest / idle-timeout não são usados pelos appliers
+            except Exception as e:  # stream caiu (switch reiniciou, canal fechado)
+                self.last_arbitration = {"error": f"{type(e).__name__}: {e}"}
+            self._primary.clear()
+            q.put(None)
+            if self._closed.wait(backoff):
+                return
+            backoff = min(backoff * 2, RECONNECT_MAX_S)
+
+    def close(self) -> None:
+        self._closed.set()
+        self._primary.clear()
+        self._requests.put(None)
+        with self._lock:
+            if self._channel is not None:
+                self._channel.close()
+            self._channel = self._stub = self._thread = None
+
+    # ------------------------- RPCs -------------------------
+
+    def _ensure(self) -> None:
+        if self._stub is None or not self._primary.is_set():
+            self.connect()
+
+    def _write_request(self, updates: List[Any], atomic: bool) -> Any:
+        req = self._pb.WriteRequest()
+        req.device_id = self.device_id
+        req.election_id.high, req.election_id.low = self.election_id
+        if atomic:
+            req.atomicity = self._pb.WriteRequest.DATAPLANE_ATOMIC
+        req.updates.extend(updates)
+        return req
+
+    def write(self, updates: List[Any], atomic: bool = False, timeout: float = RPC_TIMEOUT_S) -> float:
+        """Um RPC Write com os updates (p4.v1.Update); devolve a latência em ms."""
+        self._ensure()
+        t0 = time.perf_counter()
+        try:
+            self._stub.Write(self._write_request(updates, atomic), timeout=timeout)
+        except Exception:
+            self._count(errors=1)
+            raise
+        ms = (time.perf_counter() - t0) * 1000.0
+        self._count_write(len(updates), ms)
+        return ms
+
+    def read(self, entities: List[Any], timeout: float = RPC_TIMEOUT_S) -> List[Any]:
+        self._ensure()
+        req = self._pb.ReadRequest(device_id=self.device_id)
+        req.entities.extend(entities)
+        self._count(reads=1)
+        return [e for resp in self._stub.Read(req, timeout=timeout) for e in resp.entities]
+
+    def _count(self, **inc: float) -> None:
+        with self._stats_lock:
+            for k, v in inc.items():
+                self.stats[k] += v
+
+    def _count_write(self, n: int, ms: float) -> None:
+        self._count(writes=1, updates=n, write_ms_total=ms)
+
+    async def write_async(self, updates: List[Any], atomic: bool = False, timeout: float = RPC_TIMEOUT_S) -> float:
+        loop = asyncio.get_running_loop()
+        if self._stub is None or not self._primary.is_set():
+            await loop.run_in_executor(None, self.connect)
+        t0 = time.perf_counter()
+        try:
+            await _wrap(loop, self._stub.Write.future(self._write_request(updates, atomic), timeout=timeout))
+        except Exception:
+            self._count(errors=1)
+            raise
+        ms = (time.perf_counter() - t0) * 1000.0
+        self._count_write(len(updates), ms)
+        return ms
+
+    async def read_async(self, entities: List[Any], timeout: float = RPC_TIMEOUT_S) -> List[Any]:
+        # Read é server-streaming (sem .future no gRPC): roda num executor
+        return await asyncio.get_running_loop().run_in_executor(None, self.read, entities, timeout)
+
+    # ------------------------- pipeline -------------------------
+
+    def pipeline_cookie(self, timeout: float = RPC_TIMEOUT_S) -> Optional[int]:
+        """Cookie do pipeline carregado no device (GetForwardingPipelineConfig COOKIE_ONLY); None se não há."""
+        self._ensure()
+        pb = self._pb
+        req = pb.GetForwardingPipelineConfigRequest(
+            device_id=self.device_id, response_type=pb.GetForwardingPipelineConfigRequest.COOKIE_ONLY)
+        try:
+            resp = self._stub.GetForwardingPipelineConfig(req, timeout=timeout)
+        except Exception as e:
+            # sem pipeline o bmv2 responde FAILED_PRECONDITION
+            code = getattr(e, "code", None)
+            if callable(code) and getattr(code(), "name", "") == "FAILED_PRECONDITION":
+                return None
+            raise
+        if not resp.config.HasField("cookie"):
+            return None
+        return int(resp.config.cookie.cookie)
+
+    def set_pipeline(self, p4info: Any, device_config: bytes, cookie: int,
+                     timeout: float = 60.0) -> float:
+        """SetForwardingPipelineConfig VERIFY_AND_COMMIT; devolve a latência em ms."""
+        self._ensure()
+        pb = self._pb
+        req = pb.SetForwardingPipelineConfigRequest(
+            device_id=self.device_id, action=pb.SetForwardingPipelineConfigRequest.VERIFY_AND_COMMIT)
+        req.election_id.high, req.election_id.low = self.election_id
+        req.config.p4info.CopyFrom(p4info)
+        req.config.p4_device_config = device_config
+        req.config.cookie.cookie = cookie
+        t0 = time.perf_counter()
+        self._stub.SetForwardingPipelineConfig(req, timeout=timeout)
+        return (time.perf_counter() - t0) * 1000.0
+
+    def push_pipeline(self, p4info_path: str, device_config_path: str, force: bool = False) -> Dict[str, Any]:
+        """
+        Envia o pipeline só se o device não tem o mesmo (pelo cookie). Devolve
+        {"action": "pushed"|"skipped", "cookie", "device_cookie", "push_ms"};
+        force=True envia sempre. O p4info passa a ser o do cliente.
+        """
+        with open(p4info_path, "rb") as f:
+            p4info_raw = f.read()
+        with open(device_config_path, "rb") as f:
+            device_config = f.read()
+        cookie = pipeline_cookie(p4info_raw, device_config)
+        current = self.pipeline_cookie()
+        msg = parse_p4info(p4info_raw)
+        self.p4info = P4Info(msg)
+        out: Dict[str, Any] = {"cookie": f"{cookie:016x}",
+                               "device_cookie": None if current is None else f"{current:016x}"}
+        if current == cookie and not force:
+            return dict(out, action="skipped", push_ms=0.0)
+        return dict(out, action="pushed", push_ms=round(self.set_pipeline(msg, device_config, cookie), 3))
+
+    # ------------------------- lote JSON (plan_delta) -------------------------
+
+    def build_updates(self, updates: List[Dict[str, Any]]) -> Tuple[List[Any], List[Dict[str, Any]]]:
+        """
+        Traduz updates de render_p4runtime_delta para p4.v1.Update. Devolve
+        (updates, ignorados): entidades sem correspondente no p4info (ex.:
+        meters que o programa não declara) são ignoradas, não derrubam o lote.
+        """
+        if self.p4info is None:
+            raise P4RTError("cliente sem p4info (P4Info.from_file) para traduzir nomes")
+        if self._pb is None:
+            _, self._pb, _ = _protos()
+        out, skipped = [], []
+        for u in updates:
+            try:
+                out.append(self._build_update(u))
+            except P4RTError as e:
+                skipped.append({"update": u, "reason": str(e)})
+        return out, skipped
+
+    def _build_update(self, u: Dict[str, Any]) -> Any:
+        pb = self._pb
+        typ = u.get("type", "INSERT")
+        if typ not in UPDATE_TYPES:
+            raise P4RTError(f"tipo de update desconhecido: {typ}")
+        upd = pb.Update(type=getattr(pb.Update, typ))
+        ent = u.get("entity", {})
+        if "table_entry" in ent:
+            self._table_entry(ent["table_entry"], upd.entity.table_entry)
+        elif "packet_replication_engine_entry" in ent:
+            mge = ent["packet_replication_engine_entry"]["multicast_group_entry"]
+            out = upd.entity.packet_replication_engine_entry.multicast_group_entry
+            out.multicast_group_id = int(mge["multicast_group_id"])
+            for r in mge.get("replicas", ()):
+                port = r["egress_port"]
+                if isinstance(port, str) and not port.isdigit():
+                    raise P4RTError(f"porta de réplica não numérica: {port}")
+                out.replicas.add(egress_port=int(port), instance=int(r.get("instance", 1)))
+        elif "meter_entry" in ent:
+            me = ent["meter_entry"]
+            out = upd.entity.meter_entry
+            out.meter_id = self.p4info.meter(me["meter"]).preamble.id
+            out.index.index = int(me["index"])
+            cfg = me.get("config", {})
+            # Mbps → bytes/s; burst em bytes (1 s de rajada na taxa dada)
+            bps = lambda m: int(float(m) * 125000)
+            out.config.cir = bps(cfg.get("cir_mbps", 0))
+            out.config.pir = bps(cfg.get("pir_mbps", cfg.get("cir_mbps", 0)))
+            out.config.cburst = out.config.pburst = bps(cfg.get("burst_mbps", cfg.get("cir_mbps", 0)))
+        else:
+            raise P4RTError(f"entidade não suportada: {sorted(ent)}")
+        return upd
+
+    def _table_entry(self, te: Dict[str, Any], out: Any) -> None:
+        table = self.p4info.table(te["table"])
+        out.table_id = table.preamble.id
+        fields = {f.name: f for f in table.match_fields}
+        for m in te.get("match", ()):
+            f = fields.get(m["field"])
+            if f is None:
+                raise P4RTError(f"{te['table']}: campo de match desconhecido {m['field']}")
+            fm = out.match.add(field_id=f.id)
+            if "lpm" in m:
+                addr, _, plen = str(m["lpm"]).partition("/")
+                fm.lpm.value = encode_value(addr, f.bitwidth)
+                fm.lpm.prefix_len = int(plen) if plen else f.bitwidth
+            elif "exact" in m:
+                fm.exact.value = encode_value(m["exact"], f.bitwidth)
+            elif "ternary" in m:
+                v, _, mask = str(m["ternary"]).partition("&&&")
+                fm.ternary.value = encode_value(v, f.bitwidth)
+                fm.ternary.mask = encode_value(mask or (1 << f.bitwidth) - 1, f.bitwidth)
+            else:
+                raise P4RTError(f"{te['table']}: tipo de match não suportado em {m}")
+        if "priority" in te:
+            out.priority = int(te["priority"])
+        act = te.get("action")
+        if act:
+            action = self.p4info.action(act["name"])
+            out.action.action.action_id = action.preamble.id
+            params = {p.name: p for p in action.params}
+            for name, v in act.get("params", {}).items():
+                p = params.get(name)
+                if p is None:
+                    raise P4RTError(f"{act['name']}: parâmetro desconhecido {name}")
+                out.action.action.params.add(param_id=p.id, value=encode_value(v, p.bitwidth))
+
+    def write_updates(self, updates: List[Dict[str, Any]], atomic: bool = False) -> Dict[str, Any]:
+        msgs, skipped = self.build_updates(updates)
+        ms = self.write(msgs, atomic) if msgs else 0.0
+        return {"written": len(msgs), "skipped": skipped, "write_ms": round(ms, 3)}
+
+    async def write_updates_async(self, updates: List[Dict[str, Any]], atomic: bool = False) -> Dict[str, Any]:
+        msgs, skipped = self.build_updates(updates)
+        ms = await self.write_async(msgs, atomic) if msgs else 0.0
+        return {"written": len(msgs), "skipped": skipped, "write_ms": round(ms, 3)}
+
+    def to_json_dict(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            st = dict(self.stats)
+        st["write_ms_total"] = round(st["write_ms_total"], 3)
+        return {"addr": self.addr, "device_id": self.device_id, "election_id": list(self.election_id),
+                "primary": self.primary, "last_arbitration": self.last_arbitration, **st}
+
+
+def _wrap(loop: asyncio.AbstractEventLoop, fut: Any) -> "asyncio.Future[Any]":
+    # grpc.Future → asyncio.Future (o callback roda na thread do gRPC)
+    out = loop.create_future()
+
+    def done(f: Any) -> None:
+        def settle() -> None:
+            if out.cancelled():
+                return
+            exc = f.exception()
+            if exc is not None:
+                out.set_exception(exc)
+            else:
+                out.set_result(f.result())
+        loop.call_soon_threadsafe(settle)
+
+    fut.add_done_callback(done)
+    return out
+
+
+class P4RuntimeManager:
+    """Um cliente conectado por (endereço, device_id), compartilhado pelos appliers."""
+
+    def __init__(self, election_id: Tuple[int, int] = DEFAULT_ELECTION_ID):
+        self.election_id = election_id
+        self._clients: Dict[Tuple[str, int], P4RuntimeClient] = {}
+        self._lock = threading.Lock()
+
+    def client(self, addr: str = DEFAULT_ADDR, device_id: int = 0, p4info: Optional[str] = None,
+               connect: bool = True) -> P4RuntimeClient:
+        key = (addr, int(device_id))
+        with self._lock:
+            c = self._clients.get(key)
+            if c is None:
+                c = self._clients[key] = P4RuntimeClient(addr, device_id, self.election_id)
+            if p4info and c.p4info is None:
+                c.p4info = P4Info.from_file(p4info)
+        return c.connect() if connect else c
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {f"{a}#{d}": c.to_json_dict() for (a, d), c in self._clients.items()}
+
+    def close_all(self) -> None:
+        with self._lock:
+            for c in self._clients.values():
+                c.close()
+            self._clients.clear()
+
+
+_manager: Optional[P4RuntimeManager] = None
+_manager_lock = threading.Lock()
+
+
+def manager() -> P4RuntimeManager:
+    """Gerenciador do processo (fecha os canais na saída)."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            import atexit
+            _manager = P4RuntimeManager()
+            atexit.register(_manager.close_all)
+        return _manager
@@ -0,0 +1,316 @@
+"""
+plan_delta.py — conjunto mínimo e ordenado de mudanças entre dois planos.
+
+Em vez de reenviar a configuração completa a cada adaptação, compara o último
+plano aplicado com o novo (ambos como PlanIR, ver plan_ir.py) e produz uma
+lista de Change(op, kind, key, old, new) com op ∈ {add, modify, delete}.
+
+Ordem das mudanças (segura para aplicar em sequência):
+  1) deletes, dos dependentes para as dependências:
+     classifier → meter → queue → mc_group
+  2) adds/modifies, das dependências para os dependentes:
+     mc_group → queue → meter → classifier
+
+Renderizadores do delta por backend:
+  - render_tc_delta:       comandos tc (HTB class / filtro u32) — domínio A;
+                           as filas são classes 1:(10+qid) sob a classe do
+                           enlace 1:1 (root htb 1:), como nos artefatos tc_dump_A;
+                           um classificador modificado vira del + add do
+                           filtro (ver tc_changes)
+  - render_netconf_delta:  <config> com nc:operation por nó (merge no add,
+                           replace no modify, remove no delete) — domínio B
+  - render_p4runtime_delta: updates INSERT/MODIFY/DELETE — domínio C; as
+                           réplicas multicast (hosts/domínios na IR) viram
+                           portas numéricas do switch via port_map()
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+from xml.sax.saxutils import escape
+
+from plan_ir import PlanIR, as_ir
+
+KINDS = ("mc_group", "queue", "meter", "classifier")
+_ATTR = {"mc_group": "mc_groups", "queue": "queues", "meter": "meters", "classifier": "classifiers"}
+
+# DSCP marcado no P4 por nível de prioridade (critical, high, medium, low)
+DSCP_BY_PRIORITY = (46, 34, 18, 0)
+# campo do classificador → (campo P4 match, tipo de match) em l2i_minimal.p4
+P4_MATCH_FIELDS = {"dst_ip": ("hdr.ipv4.dstAddr", "lpm"), "dst": ("hdr.ipv4.dstAddr", "lpm")}
+NC_BASE = "urn:ietf:params:xml:ns:netconf:base:1.0"
+NC_QOS = "urn:l2i:qos"
+# HTB do domínio A: root 1:, classe do enlace 1:1, filas 1:(CLASSID_BASE + qid)
+HTB_LINK_CLASS = "1:1"
+CLASSID_BASE = 10
+
+
+class PortMapError(KeyError):
+    pass
+
+
+class Change:
+    __slots__ = ("op", "kind", "key", "old", "new")
+
+    def __init__(self, op: str, kind: str, key: Any, old: Any = None, new: Any = None):
+        self.op = op; self.kind = kind; self.key = key; self.old = old; self.new = new
+
+    @property
+    def elem(self) -> Any:
+        return self.new if self.new is not None else self.old
+
+    def to_json_dict(self) -> Dict[str, Any]:
+        out = {"op": self.op, "kind": self.kind, "key": self.key}
+        if self.old is not None:
+            out["old"] = self.old.to_json_dict()
+        if self.new is not None:
+            out["new"] = self.new.to_json_dict()
+        return out
+
+    def __repr__(self) -> str:
+        return f"Change({self.op} {self.kind} {self.key!r})"
+
+
+def diff_plans(old: Any, new: Any) -> List[Change]:
+    """Delta ordenado de `old` para `new` (old=None → tudo é add)."""
+    new_ir = as_ir(new)
+    old_ir = as_ir(old) if old is not None else PlanIR()
+    deletes: Dict[str, List[Change]] = {k: [] for k in KINDS}
+    upserts: Dict[str, List[Change]] = {k: [] for k in KINDS}
+    for kind in KINDS:
+        before = {e.key(): e for e in getattr(old_ir, _ATTR[kind])}
+        after = {e.key(): e for e in getattr(new_ir, _ATTR[kind])}
+        for k in sorted(before.keys() - after.keys(), key=repr):
+            deletes[kind].append(Change("delete", kind, k, old=before[k]))
+        for k in sorted(after, key=repr):
+            if k not in before:
+                upserts[kind].append(Change("add", kind, k, new=after[k]))
+            elif before[k] != after[k]:
+                upserts[kind].append(Change("modify", kind, k, old=before[k], new=after[k]))
+    ordered = [c for kind in reversed(KINDS) for c in deletes[kind]]
+    ordered += [c for kind in KINDS for c in upserts[kind]]
+    return ordered
+
+
+def summarize(changes: List[Change]) -> Dict[str, int]:
+    out: Dict[str, int] = {}
+    for c in changes:
+        k = f"{c.kind}.{c.op}"
+        out[k] = out.get(k, 0) + 1
+    return out
+
+
+# ------------------------- tc (HTB) -------------------------
+
+def _mbit(v: float) -> str:
+    return f"{v:g}mbit"
+
+
+def tc_classid(qid: int) -> str:
+    return f"1:{CLASSID_BASE + qid}"
+
+
+def tc_link_class_line(dev: str, link_mbps: float) -> str:
+    """Classe do enlace 1:1 (pai das filas), sem o prefixo `tc`."""
+    return (f"class add dev {dev} parent 1: classid {HTB_LINK_CLASS} "
+            f"htb rate {_mbit(link_mbps)} ceil {_mbit(link_mbps)}")
+
+
+def tc_class_line(op: str, dev: str, q: Any) -> str:
+    """Linha `tc class ...` (sem o prefixo `tc`, no formato aceito por `tc -batch`)."""
+    verb = {"add": "add", "modify": "change", "delete": "del"}[op]
+    head = f"class {verb} dev {dev} parent {HTB_LINK_CLASS} classid {tc_classid(q.qid)}"
+    if op == "delete":
+        return head
+    rate = q.min_mbps or q.max_mbps or 1.0
+    ceil = max(q.max_mbps, rate)
+    return f"{head} htb rate {_mbit(rate)} ceil {_mbit(ceil)} prio {q.priority}"
+
+
+def tc_changes(c: Change) -> List[Change]:
+    """
+    Mudanças como o tc as aplica: um classificador modificado vira delete do
+    antigo + add do novo — `filter replace` sem handle, no u32, só acrescenta
+    um segundo filtro no mesmo prio e o antigo continua casando primeiro.
+    """
+    if c.kind == "classifier" and c.op == "modify":
+        return [Change("delete", c.kind, c.key, old=c.old), Change("add", c.kind, c.key, new=c.new)]
+    return [c]
+
+
+def tc_filter_line(op: str, dev: str, c: Any) -> Optional[str]:
+    """Linha `tc filter` para op ∈ {add, delete} (modify passa por tc_changes)."""
+    verb = {"add": "add", "delete": "del"}[op]
+    # prio do filtro = cid: identifica o filtro para change/del sem handle
+    head = f"filter {verb} dev {dev} parent 1: protocol ip prio {c.cid}"
+    if op == "delete":
+        return head
+    if c.qid is None:
+        return None
+    m = dict(c.match)
+    sel = []
+    if "dst_ip" in m or "dst" in m:
+        sel.append(f"match ip dst {m.get('dst_ip') or m['dst']}")
+    if "src_ip" in m or "src" in m:
+        sel.append(f"match ip src {m.get('src_ip') or m['src']}")
+    if "dport" in m:
+        sel.append(f"match ip dport {m['dport']} 0xffff")
+    if not sel:
+        return None
+    return f"{head} u32 {' '.join(sel)} flowid {tc_classid(c.qid)}"
+
+
+def render_tc_delta(changes: List[Change], dev: str) -> List[str]:
+    """Comandos `tc ...` para as mudanças de queue/classifier (meters e grupos não se aplicam)."""
+    out = []
+    for c in (t for ch in changes for t in tc_changes(ch)):
+        if c.kind == "queue":
+            line = tc_class_line(c.op, dev, c.elem)
+        elif c.kind == "classifier":
+            line = tc_filter_line(c.op, dev, c.elem)
+        else:
+            continue
+        if line:
+            out.append("tc " + line)
+    return out
+
+
+# ------------------------- NETCONF -------------------------
+
+def _nc_node(c: Change) -> Optional[str]:
+    # modify = replace: filhos que saíram (match, portas) não ficam no device
+    op = {"add": "merge", "modify": "replace", "delete": "remove"}[c.op]
+    attr = f' xmlns="{NC_QOS}" nc:operation="{op}"'
+    e = c.elem
+    if c.kind == "queue":
+        body = f"<class>{escape(e.name)}</class>"
+        if c.op != "delete":
+            body += (f"<min-mbps>{e.min_mbps:g}</min-mbps><max-mbps>{e.max_mbps:g}</max-mbps>"
+                     f"<priority>{e.priority}</priority><weight>{e.weight:g}</weight>")
+        return f"  <qos{attr}>{body}</qos>"
+    if c.kind == "classifier":
+        body = f"<id>{e.cid}</id>"
+        if c.op != "delete":
+            body += f"<flow>{escape(e.flow_id)}</flow>"
+            body += "".join(f"<match name=\"{escape(k)}\">{escape(v)}</match>" for k, v in e.match)
+            if e.qid is not None:
+                body += f"<queue>{e.qid}</queue>"
+        return f"  <classifier{attr}>{body}</classifier>"
+    if c.kind == "mc_group":
+        body = f"<group>{escape(e.group)}</group>"
+        if c.op != "delete":
+            body += f"<gid>{e.gid}</gid>" + "".join(f"<port>{escape(p)}</port>" for p in e.ports)
+        return f"  <multicast-group{attr}>{body}</multicast-group>"
+    return None
+
+
+def render_netconf_delta(changes: List[Change]) -> str:
+    """<config> para edit-config contendo só os nós alterados (merge/remove)."""
+    nodes = [n for n in (_nc_node(c) for c in changes) if n]
+    return "\n".join([f'<config xmlns="{NC_BASE}" xmlns:nc="{NC_BASE}">', *nodes, "</config>"])
+
+
+# ------------------------- P4Runtime -------------------------
+
+def _p4_match(e: Any) -> List[Dict[str, str]]:
+    match = []
+    for k, v in e.match:
+        field = P4_MATCH_FIELDS.get(k)
+        if field:
+            name, mtype = field
+            match.append({"field": name, mtype: v if "/" in v or mtype != "lpm" else f"{v}/32"})
+    return match
+
+
+def port_map(profile: Optional[Dict[str, Any]] = None,
+             topology: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+    """
+    Nome → porta numérica do switch. Portas do perfil: campo "port" ou a
+    posição na lista; topologia (host/domínio vizinho → número ou nome de
+    porta do perfil) por cima.
+    """
+    out: Dict[str, int] = {}
+    for i, p in enumerate((profile or {}).get("ports", [])):
+        out[str(p["name"])] = int(p.get("port", i))
+    for name, port in (topology or {}).items():
+        if isinstance(port, str) and not port.isdigit():
+            if port not in out:
+                raise PortMapError(f"{name}: porta {port} não existe no perfil")
+            port = out[port]
+        out[str(name)] = int(port)
+    return out
+
+
+def meter_names(profile: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+    """
+    Tipo de meter do plano (tbf, trtcm) → nome do meter no P4Info, de
+    "meters": {"p4_names": {...}} no perfil. Tipo sem nome → nenhum update:
+    o l2i_minimal.p4 não declara meters.
+    """
+    return {str(k): str(v) for k, v in ((profile or {}).get("meters") or {}).get("p4_names", {}).items()}
+
+
+def _egress_port(name: Any, ports: Optional[Dict[str, int]]) -> int:
+    if isinstance(name, int) or (isinstance(name, str) and name.isdigit()):
+        return int(name)
+    if ports is not None and name in ports:
+        return ports[name]
+    raise PortMapError(f"réplica sem porta no switch: {name} (ver port_map)")
+
+
+def _p4_updates(c: Change, queue_prio: Dict[int, int], ports: Optional[Dict[str, int]] = None,
+                meters: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+    typ = {"add": "INSERT", "modify": "MODIFY", "delete": "DELETE"}[c.op]
+    e = c.elem
+    # chave P4 mudou (match do classificador / gid do grupo): MODIFY não acha a
+    # entrada antiga, então vira DELETE da antiga + INSERT da nova
+    if c.op == "modify" and (
+            (c.kind == "classifier" and c.old.match != c.new.match)
+            or (c.kind == "mc_group" and c.old.gid != c.new.gid)):
+        return (_p4_updates(Change("delete", c.kind, c.key, old=c.old), queue_prio, ports, meters)
+                + _p4_updates(Change("add", c.kind, c.key, new=c.new), queue_prio, ports, meters))
+    if c.kind == "classifier":
+        match = _p4_match(e)
+        if not match:
+            return []
+        entry = {"table": "MyIngress.qos_table", "match": match}
+        if c.op != "delete":
+            rank = queue_prio.get(e.qid, 2)
+            entry["action"] = {"name": "MyIngress.set_dscp",
+                               "params": {"new_dscp": DSCP_BY_PRIORITY[min(rank, 3)]}}
+        return [{"type": typ, "entity": {"table_entry": entry}}]
+    if c.kind == "mc_group":
+        mge = {"multicast_group_id": e.gid}
+        if c.op != "delete":
+            mge["replicas"] = [{"egress_port": _egress_port(p, ports), "instance": 1} for p in e.ports]
+        return [{"type": typ, "entity": {"packet_replication_engine_entry": {"multicast_group_entry": mge}}}]
+    if c.kind == "meter" and c.op != "delete" and e.kind in (meters or {}):
+        # meters indiretos não são inseridos/removidos, só reconfigurados
+        return [{"type": "MODIFY", "entity": {"meter_entry": {
+            "meter": meters[e.kind], "index": e.mid,
+            "config": {"cir_mbps": e.rate_mbps, "pir_mbps": max(e.ceil_mbps, e.rate_mbps),
+                       "burst_mbps": e.burst_mbps}}}}]
+    return []
+
+
+def render_p4runtime_delta(changes: List[Change], plan: Any = None, ports: Optional[Dict[str, int]] = None,
+                           meters: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    Lote de updates P4Runtime. `plan` (o novo) fornece a prioridade das filas
+    para o DSCP; se a prioridade de uma fila mudou, os classificadores que
+    apontam para ela são remarcados mesmo sem mudança própria. `ports`
+    (port_map) dá a porta de cada réplica multicast; réplica sem porta
+    conhecida → PortMapError. `meters` (meter_names) dá o meter do P4Info de
+    cada tipo; meters sem nome ficam de fora.
+    """
+    new_ir = as_ir(plan) if plan is not None else None
+    queue_prio = {q.qid: q.priority for q in new_ir.queues} if new_ir is not None else {}
+    changes = list(changes)
+    if new_ir is not None:
+        reprio = {c.key for c in changes
+                  if c.kind == "queue" and c.op == "modify" and c.old.priority != c.new.priority}
+        touched = {c.key for c in changes if c.kind == "classifier"}
+        changes += [Change("modify", "classifier", cl.cid, old=cl, new=cl) for cl in new_ir.classifiers
+                    if cl.qid in reprio and cl.cid not in touched]
+    updates = [u for c in changes for u in _p4_updates(c, queue_prio, ports, meters)]
+    return {"updates": updates}
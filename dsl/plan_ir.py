@@ -0,0 +1,478 @@
+"""
+plan_ir.py — IR compacta do plano (__slots__) + codificação binária.
+
+O synthesize_ir devolve uma árvore de objetos comuns (com __dict__), serializada
+em cli.py via json.dumps(default=lambda o: o.__dict__). Para manter dezenas de
+milhares de planos residentes num controlador, este módulo oferece:
+
+  - PlanIR e os registros QueueIR / MeterIR / ClassifierIR / McGroupIR, todos
+    com __slots__ (sem __dict__ por instância);
+  - from_plan(): adaptador que aceita o objeto do synthesize_ir, um dict, ou
+    o JSON já exportado por `cli.py plan` (nomes de campo alternativos são
+    tolerados; elemento sem id, nem no campo nem na chave do mapa, levanta
+    PlanShapeError em vez de ganhar um id posicional; id negativo ou além de
+    32 bits e prioridade numérica fora de 0..255, idem);
+  - encode() / PlanView: formato binário com tabela de strings internadas e
+    registros de tamanho fixo; PlanView lê direto do buffer (memoryview +
+    struct.unpack_from), sem copiar nem materializar o plano inteiro;
+  - to_json_dict(): visão JSON para exportação.
+
+Layout binário (little-endian, versão 1):
+
+  cabeçalho   "<4sHH" magic b"L2IP", versão, reservado
+  contagens   "<8I"   n_str, str_bytes, nq, nm, nc, n_match, ng, n_ports
+  meta        "<4I"   flow_id, tenant, scope, profile_id (índices de string)
+  strings     n_str × "<I" (offset final de cada string) + blob UTF-8
+  registros   queues (nq × _Q), classifiers (nc × _C), match (n_match × _KV),
+              meters (nm × _M), groups (ng × _G), ports (n_ports × "<I")
+"""
+
+from __future__ import annotations
+
+import struct
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+PRIORITY_LEVELS = ("critical", "high", "medium", "low")
+_NONE = 0xFFFFFFFF  # índice/referência ausente no formato binário
+
+MAGIC = b"L2IP"
+VERSION = 1
+_HDR = struct.Struct("<4sHH")
+_COUNTS = struct.Struct("<8I")
+_META = struct.Struct("<4I")
+_U32 = struct.Struct("<I")
+_Q = struct.Struct("<IIBdddI")   # qid, name, priority, weight, min, max, port
+_M = struct.Struct("<IIddd")     # mid, kind, rate, ceil, burst
+_C = struct.Struct("<IIIIII")    # cid, flow_id, qid, mid, match_start, match_count
+_KV = struct.Struct("<II")       # campo, valor
+_G = struct.Struct("<IIII")      # group, gid, port_start, port_count
+
+
+def priority_rank(v: Any) -> int:
+    """'critical'..'low' → 0..3; inteiros passam direto; desconhecido → 2 (medium)."""
+    if isinstance(v, bool):
+        return 2
+    if isinstance(v, int):
+        return v
+    if isinstance(v, dict):
+        v = v.get("level")
+    try:
+        return PRIORITY_LEVELS.index(str(v).lower())
+    except ValueError:
+        return 2
+
+
+def _get(obj: Any, *names: str, default: Any = None) -> Any:
+    """Primeiro atributo/chave presente em `obj` dentre `names`."""
+    for n in names:
+        if isinstance(obj, dict):
+            if n in obj and obj[n] is not None:
+                return obj[n]
+        else:
+            v = getattr(obj, n, None)
+            if v is not None:
+                return v
+    return default
+
+
+def _num(v: Any, default: float = 0.0) -> float:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return default
+
+
+def _opt_int(v: Any) -> Optional[int]:
+    try:
+        return None if v is None else int(v)
+    except (TypeError, ValueError):
+        return None
+
+
+class _Record:
+    __slots__ = ()
+
+    def to_json_dict(self) -> Dict[str, Any]:
+        out = {}
+        for k in self.__slots__:
+            v = getattr(self, k)
+            if isinstance(v, tuple):
+                v = dict(v) if k == "match" else list(v)
+            out[k] = v
+        return out
+
+    def key(self) -> Any:
+        return getattr(self, self.__slots__[0])
+
+    def __eq__(self, other: Any) -> bool:
+        return type(self) is type(other) and all(
+            getattr(self, k) == getattr(other, k) for k in self.__slots__)
+
+    def __hash__(self) -> int:
+        return hash(tuple(getattr(self, k) for k in self.__slots__))
+
+    def __repr__(self) -> str:
+        body = ", ".join(f"{k}={getattr(self, k)!r}" for k in self.__slots__)
+        return f"{type(self).__name__}({body})"
+
+
+class QueueIR(_Record):
+    """Fila/classe de serviço (HTB class no tc, fila no P4/NETCONF)."""
+    __slots__ = ("qid", "name", "priority", "weight", "min_mbps", "max_mbps", "port")
+
+    def __init__(self, qid: int, name: str = "", priority: int = 2, weight: float = 1.0,
+                 min_mbps: float = 0.0, max_mbps: float = 0.0, port: str = ""):
+        self.qid = int(qid); self.name = name or f"q{qid}"; self.priority = priority_rank(priority)
+        self.weight = float(weight); self.min_mbps = float(min_mbps)
+        self.max_mbps = float(max_mbps); self.port = port or ""
+
+
+class MeterIR(_Record):
+    __slots__ = ("mid", "kind", "rate_mbps", "ceil_mbps", "burst_mbps")
+
+    def __init__(self, mid: int, kind: str = "tbf", rate_mbps: float = 0.0,
+                 ceil_mbps: float = 0.0, burst_mbps: float = 0.0):
+        self.mid = int(mid); self.kind = kind or "tbf"; self.rate_mbps = float(rate_mbps)
+        self.ceil_mbps = float(ceil_mbps); self.burst_mbps = float(burst_mbps)
+
+
+class ClassifierIR(_Record):
+    """Classificador de fluxo (filtro u32 no tc, entrada de tabela no P4)."""
+    __slots__ = ("cid", "flow_id", "match", "qid", "mid")
+
+    def __init__(self, cid: int, flow_id: str = "", match: Sequence[Tuple[str, str]] = (),
+                 qid: Optional[int] = None, mid: Optional[int] = None):
+        self.cid = int(cid); self.flow_id = flow_id or ""
+        self.match = tuple(sorted((str(k), str(v)) for k, v in match))
+        self.qid = qid; self.mid = mid
+
+
+class McGroupIR(_Record):
+    """Grupo multicast: id simbólico da spec ("G1") + id numérico do domínio."""
+    __slots__ = ("group", "gid", "ports")
+
+    def __init__(self, group: str, gid: int = 0, ports: Sequence[str] = ()):
+        self.group = str(group); self.gid = int(gid); self.ports = tuple(str(p) for p in ports)
+
+
+class PlanIR(_Record):
+    __slots__ = ("flow_id", "tenant", "scope", "profile_id",
+                 "queues", "meters", "classifiers", "mc_groups")
+
+    def __init__(self, flow_id: str = "", tenant: str = "", scope: str = "", profile_id: str = "",
+                 queues: Sequence[QueueIR] = (), meters: Sequence[MeterIR] = (),
+                 classifiers: Sequence[ClassifierIR] = (), mc_groups: Sequence[McGroupIR] = ()):
+        self.flow_id = flow_id or ""; self.tenant = tenant or ""; self.scope = scope or ""
+        self.profile_id = profile_id or ""
+        self.queues = list(queues); self.meters = list(meters)
+        self.classifiers = list(classifiers); self.mc_groups = list(mc_groups)
+
+    __hash__ = None  # listas mutáveis
+
+    def key(self) -> Any:
+        return (self.tenant, self.scope, self.flow_id)
+
+    def to_json_dict(self) -> Dict[str, Any]:
+        return {
+            "flow_id": self.flow_id, "tenant": self.tenant, "scope": self.scope,
+            "profile_id": self.profile_id,
+            "queues": [q.to_json_dict() for q in self.queues],
+            "meters": [m.to_json_dict() for m in self.meters],
+            "classifiers": [c.to_json_dict() for c in self.classifiers],
+            "mc_groups": [g.to_json_dict() for g in self.mc_groups],
+        }
+
+
+# ------------------------- adaptador -------------------------
+
+class PlanShapeError(ValueError):
+    pass
+
+
+def _items(v: Any) -> List[Any]:
+    return [x for _, x in _entries(v)]
+
+
+def _entries(v: Any) -> List[Tuple[Any, Any]]:
+    """(chave do mapa ou None, elemento) de uma lista, um mapa id → elemento ou um elemento só."""
+    if v is None:
+        return []
+    if isinstance(v, dict) and any(k in v for k in ("group", "group_id", "qid", "mid", "cid", "enabled")):
+        return [(None, v)]  # um único elemento, não um mapa id → elemento
+    if isinstance(v, dict):
+        return list(v.items())
+    if isinstance(v, (str, bytes)) or not hasattr(v, "__iter__"):
+        raise PlanShapeError(f"esperava lista ou mapa de elementos, veio {type(v).__name__}")
+    return [(None, x) for x in v]
+
+
+def _element(what: str, k: Any, x: Any) -> Any:
+    if not isinstance(x, dict) and not hasattr(x, "__dict__") and not hasattr(type(x), "__slots__"):
+        where = what if k is None else f"{what} {k}"
+        raise PlanShapeError(f"{where}: elemento {type(x).__name__} não reconhecido")
+    return x
+
+
+def _ident(what: str, k: Any, x: Any, *names: str) -> int:
+    """Id numérico do elemento: do campo ou, num mapa id → elemento, da chave."""
+    v = _get(x, *names)
+    if v is None:
+        v = k
+    i = _opt_int(v)
+    if i is None:
+        raise PlanShapeError(f"{what} sem id ({'/'.join(names)}) reconhecível: {v!r}")
+    return i
+
+
+def _match_pairs(m: Any) -> List[Tuple[str, str]]:
+    if not m:
+        return []
+    if isinstance(m, dict):
+        return list(m.items())
+    if hasattr(m, "__dict__"):
+        return list(vars(m).items())
+    return [tuple(kv) for kv in m]
+
+
+def _group_name(k: Any, g: Any) -> str:
+    name = _get(g, "group", "group_id", "name", default=k)
+    if name is None or name == "":
+        raise PlanShapeError("grupo multicast sem group/group_id/name")
+    return name
+
+
+def _in_range(what: str, v: Optional[int], hi: int) -> None:
+    if v is not None and not 0 <= v <= hi:
+        raise PlanShapeError(f"{what} = {v} fora de [0, {hi}]")
+
+
+def _check_ranges(ir: PlanIR) -> None:
+    """Ids e prioridades cabem nos campos do formato binário (_NONE marca ausente)."""
+    for q in ir.queues:
+        _in_range(f"fila {q.qid}: qid", q.qid, _NONE - 1)
+        _in_range(f"fila {q.qid}: prioridade", q.priority, 0xFF)
+    for m in ir.meters:
+        _in_range(f"meter {m.mid}: mid", m.mid, _NONE - 1)
+    for c in ir.classifiers:
+        _in_range(f"classificador {c.cid}: cid", c.cid, _NONE - 1)
+        _in_range(f"classificador {c.cid}: qid", c.qid, _NONE - 1)
+        _in_range(f"classificador {c.cid}: mid", c.mid, _NONE - 1)
+    for g in ir.mc_groups:
+        _in_range(f"grupo {g.group}: gid", g.gid, _NONE - 1)
+
+
+def from_plan(plan: Any) -> PlanIR:
+    """Converte a saída do synthesize_ir (objeto, dict ou JSON exportado) em PlanIR."""
+    if isinstance(plan, PlanIR):
+        return plan
+    if not isinstance(plan, dict) and not hasattr(plan, "__dict__"):
+        raise PlanShapeError(f"plano {type(plan).__name__} não reconhecido")
+    queues = [
+        QueueIR(
+            qid=_ident("fila", k, _element("fila", k, q), "qid", "queue_id", "id"),
+            name=_get(q, "name", "class", "classid", default=""),
+            priority=_get(q, "priority", "prio", "level", default=2),
+            weight=_num(_get(q, "weight", default=1.0), 1.0),
+            min_mbps=_num(_get(q, "min_mbps", "rate_mbps")),
+            max_mbps=_num(_get(q, "max_mbps", "ceil_mbps")),
+            port=_get(q, "port", "dev", default=""),
+        )
+        for k, q in _entries(_get(plan, "queues", "classes"))
+    ]
+    meters = [
+        MeterIR(
+            mid=_ident("meter", k, _element("meter", k, m), "mid", "meter_id", "id"),
+            kind=_get(m, "kind", "type", default="tbf"),
+            rate_mbps=_num(_get(m, "rate_mbps", "cir_mbps", "min_mbps")),
+            ceil_mbps=_num(_get(m, "ceil_mbps", "pir_mbps", "max_mbps")),
+            burst_mbps=_num(_get(m, "burst_mbps")),
+        )
+        for k, m in _entries(_get(plan, "meters"))
+    ]
+    classifiers = [
+        ClassifierIR(
+            cid=_ident("classificador", k, _element("classificador", k, c), "cid", "classifier_id", "id"),
+            flow_id=_get(c, "flow_id", "flow", default=""),
+            match=_match_pairs(_get(c, "match", "key")),
+            qid=_opt_int(_get(c, "qid", "queue", "queue_id")),
+            mid=_opt_int(_get(c, "mid", "meter", "meter_id")),
+        )
+        for k, c in _entries(_get(plan, "classifiers", "filters"))
+    ]
+    groups = [
+        McGroupIR(
+            group=_group_name(k, _element("grupo", k, g)),
+            gid=_opt_int(_get(g, "gid", "mgrp")) or 0,
+            ports=_items(_get(g, "ports", "replicas")),
+        )
+        for k, g in _entries(_get(plan, "mc_groups", "multicast_groups", "multicast"))
+        if _get(g, "enabled", default=True)
+    ]
+    ir = PlanIR(
+        flow_id=_get(plan, "flow_id", default=""), tenant=_get(plan, "tenant", default=""),
+        scope=_get(plan, "scope", default=""), profile_id=_get(plan, "profile_id", "profile", default=""),
+        queues=queues, meters=meters, classifiers=classifiers, mc_groups=groups,
+    )
+    _check_ranges(ir)
+    return ir
+
+
+# ------------------------- binário -------------------------
+
+def encode(plan: Any) -> bytes:
+    ir = from_plan(plan)
+    if ir is plan:
+        _check_ranges(ir)   # PlanIR montado à mão não passou pelo from_plan
+    strings: List[str] = []
+    index: Dict[str, int] = {}
+
+    def s(v: Optional[str]) -> int:
+        if v is None:
+            return _NONE
+        i = index.get(v)
+        if i is None:
+            i = index[v] = len(strings)
+            strings.append(v)
+        return i
+
+    def ref(v: Optional[int]) -> int:
+        return _NONE if v is None else int(v)
+
+    meta = _META.pack(s(ir.flow_id), s(ir.tenant), s(ir.scope), s(ir.profile_id))
+    q_blob = b"".join(_Q.pack(q.qid, s(q.name), q.priority, q.weight, q.min_mbps, q.max_mbps, s(q.port))
+                      for q in ir.queues)
+    m_blob = b"".join(_M.pack(m.mid, s(m.kind), m.rate_mbps, m.ceil_mbps, m.burst_mbps) for m in ir.meters)
+    c_parts, kv_parts = [], []
+    for c in ir.classifiers:
+        c_parts.append(_C.pack(c.cid, s(c.flow_id), ref(c.qid), ref(c.mid), len(kv_parts), len(c.match)))
+        kv_parts.extend(_KV.pack(s(k), s(v)) for k, v in c.match)
+    g_parts, port_parts = [], []
+    for g in ir.mc_groups:
+        g_parts.append(_G.pack(s(g.group), g.gid, len(port_parts), len(g.ports)))
+        port_parts.extend(_U32.pack(s(p)) for p in g.ports)
+
+    encoded = [x.encode("utf-8") for x in strings]
+    ends, acc = [], 0
+    for e in encoded:
+        acc += len(e)
+        ends.append(_U32.pack(acc))
+    counts = _COUNTS.pack(len(strings), acc, len(ir.queues), len(ir.meters), len(ir.classifiers),
+                          len(kv_parts), len(ir.mc_groups), len(port_parts))
+    return b"".join([_HDR.pack(MAGIC, VERSION, 0), counts, meta, *ends, *encoded,
+                     q_blob, b"".join(c_parts), b"".join(kv_parts), m_blob,
+                     b"".join(g_parts), b"".join(port_parts)])
+
+
+class PlanView:
+    """
+    Leitura sem cópia de um plano codificado por encode(). Os registros são
+    decodificados sob demanda a partir do buffer; strings são decodificadas
+    (e memoizadas) só quando acessadas.
+    """
+
+    __slots__ = ("_mv", "_str_ends", "_str_base", "_off", "_n", "_strcache", "_meta")
+
+    def __init__(self, buf: Any):
+        mv = memoryview(buf)
+        if mv.ndim != 1 or mv.itemsize != 1:
+            mv = mv.cast("B")
+        magic, ver, _ = _HDR.unpack_from(mv, 0)
+        if magic != MAGIC or ver != VERSION:
+            raise ValueError(f"não é um plano L2I binário v{VERSION} (magic={magic!r}, versão={ver})")
+        n_str, str_bytes, nq, nm, nc, nkv, ng, nports = _COUNTS.unpack_from(mv, _HDR.size)
+        pos = _HDR.size + _COUNTS.size
+        self._meta = _META.unpack_from(mv, pos)
+        pos += _META.size
+        self._str_ends = pos
+        self._str_base = pos + 4 * n_str
+        pos = self._str_base + str_bytes
+        self._off: Dict[str, int] = {}
+        self._n = {"q": nq, "c": nc, "kv": nkv, "m": nm, "g": ng, "p": nports}
+        for name, st in (("q", _Q), ("c", _C), ("kv", _KV), ("m", _M), ("g", _G), ("p", _U32)):
+            self._off[name] = pos
+            pos += st.size * self._n[name]
+        if pos > len(mv):
+            raise ValueError("buffer truncado")
+        self._mv = mv
+        self._strcache: Dict[int, str] = {}
+
+    def _s(self, i: int) -> Optional[str]:
+        if i == _NONE:
+            return None
+        v = self._strcache.get(i)
+        if v is None:
+            end = _U32.unpack_from(self._mv, self._str_ends + 4 * i)[0]
+            start = _U32.unpack_from(self._mv, self._str_ends + 4 * (i - 1))[0] if i else 0
+            v = self._strcache[i] = str(self._mv[self._str_base + start:self._str_base + end], "utf-8")
+        return v
+
+    def _rows(self, name: str, st: struct.Struct, start: int = 0, count: Optional[int] = None) -> Iterator[tuple]:
+        n = self._n[name] if count is None else count
+        base = self._off[name] + st.size * start
+        return st.iter_unpack(self._mv[base:base + st.size * n])
+
+    @staticmethod
+    def _opt(v: int) -> Optional[int]:
+        return None if v == _NONE else v
+
+    @property
+    def flow_id(self) -> str:
+        return self._s(self._meta[0]) or ""
+
+    @property
+    def profile_id(self) -> str:
+        return self._s(self._meta[3]) or ""
+
+    def __len__(self) -> int:
+        return self._n["q"] + self._n["m"] + self._n["c"] + self._n["g"]
+
+    def queues(self) -> Iterator[QueueIR]:
+        for qid, name, prio, w, lo, hi, port in self._rows("q", _Q):
+            yield QueueIR(qid, self._s(name), prio, w, lo, hi, self._s(port))
+
+    def meters(self) -> Iterator[MeterIR]:
+        for mid, kind, rate, ceil, burst in self._rows("m", _M):
+            yield MeterIR(mid, self._s(kind), rate, ceil, burst)
+
+    def classifiers(self) -> Iterator[ClassifierIR]:
+        for cid, flow, qid, mid, k0, kn in self._rows("c", _C):
+            match = [(self._s(k), self._s(v)) for k, v in self._rows("kv", _KV, k0, kn)]
+            yield ClassifierIR(cid, self._s(flow), match, self._opt(qid), self._opt(mid))
+
+    def mc_groups(self) -> Iterator[McGroupIR]:
+        for group, gid, p0, pn in self._rows("g", _G):
+            yield McGroupIR(self._s(group), gid, [self._s(p) for (p,) in self._rows("p", _U32, p0, pn)])
+
+    def to_plan(self) -> PlanIR:
+        m = self._meta
+        return PlanIR(self._s(m[0]), self._s(m[1]), self._s(m[2]), self._s(m[3]),
+                      list(self.queues()), list(self.meters()),
+                      list(self.classifiers()), list(self.mc_groups()))
+
+    def to_json_dict(self) -> Dict[str, Any]:
+        return self.to_plan().to_json_dict()
+
+
+def decode(buf: Any) -> PlanView:
+    return PlanView(buf)
+
+
+def as_ir(obj: Any) -> PlanIR:
+    """Aceita PlanIR, PlanView, bytes codificados ou a saída do synthesize_ir."""
+    if isinstance(obj, PlanIR):
+        return obj
+    if isinstance(obj, PlanView):
+        return obj.to_plan()
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return PlanView(obj).to_plan()
+    return from_plan(obj)
+
+
+def load_plan(path: str) -> PlanIR:
+    """Lê um plano salvo em disco: binário (encode) ou JSON (`cli.py plan`)."""
+    import json
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] == MAGIC:
+        return PlanView(data).to_plan()
+    return from_plan(json.loads(data.decode("utf-8")))
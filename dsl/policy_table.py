@@ -0,0 +1,240 @@
+"""
+policy_table.py — regras de política compiladas numa tabela de decisão indexada.
+
+Em vez de percorrer a lista de regras a cada spec, as regras são compiladas
+numa tabela indexada por (tenant, scope, nível de prioridade, faixa de banda):
+
+  - tenant/scope: valores citados em alguma regra; qualquer outro cai em "*";
+  - prioridade: os 4 níveis (critical..low);
+  - faixa de banda: os limites de bw_mbps de todas as regras viram pontos de
+    corte ordenados; a faixa do spec (pelo min_mbps) sai de um bisect.
+
+Cada célula guarda o índice da PRIMEIRA regra que casa (semântica de
+first-match preservada). As linhas (tenant, scope) são montadas sob demanda,
+só com as regras candidatas daquele par, e memoizadas; depois disso a decisão
+de um spec é uma consulta a dict + bisect sobre poucos cortes.
+
+Formato do arquivo (ver policies/example.json):
+
+  {"default": "allow",
+   "rules": [
+     {"id": "no-critical-guests", "match": {"tenant": "guest", "priority": ["critical"]},
+      "action": "deny", "code": "E_POLICY_PRIORITY"},
+     {"id": "cap-bw", "match": {"bw_mbps": [20, null]},
+      "action": "adjust", "set": {"max_mbps": 20}}]}
+
+match: tenant / scope (string, lista ou "*"), priority (lista de níveis ou
+"*"), bw_mbps [lo, hi) sobre min_mbps (null = aberto). Campo ausente = "*".
+action: allow | deny | adjust; adjust aceita set.max_priority (rebaixa o
+nível) e set.max_mbps (teto de banda; garante min ≤ max).
+
+apply(spec) tem a mesma assinatura de apply_policies: (status, spec, msgs).
+"""
+
+from __future__ import annotations
+
+import bisect
+import copy
+import json
+import threading
+from array import array
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from intent import as_intent
+from plan_ir import PRIORITY_LEVELS, priority_rank
+
+ACTIONS = ("allow", "adjust", "deny")
+_ANY = "*"
+
+
+class PolicyMsg:
+    def __init__(self, code: str, msg: str, rule: Optional[str] = None):
+        self.code = code
+        self.msg = msg
+        self.rule = rule
+
+    def __repr__(self) -> str:
+        return f"PolicyMsg({self.code} {self.rule})"
+
+
+class PolicyError(ValueError):
+    pass
+
+
+def _as_set(v: Any) -> Optional[frozenset]:
+    # None = curinga
+    if v is None or v == _ANY or v == [_ANY]:
+        return None
+    return frozenset([v] if isinstance(v, str) else v)
+
+
+class Rule:
+    __slots__ = ("index", "id", "tenants", "scopes", "prios", "lo", "hi", "action", "code", "set")
+
+    def __init__(self, index: int, doc: Dict[str, Any]):
+        m = doc.get("match", {})
+        self.index = index
+        self.id = str(doc.get("id", f"rule{index}"))
+        self.tenants = _as_set(m.get("tenant"))
+        self.scopes = _as_set(m.get("scope"))
+        prios = _as_set(m.get("priority"))
+        self.prios = None if prios is None else frozenset(priority_rank(p) for p in prios)
+        bw = list(m.get("bw_mbps") or []) + [None, None]
+        lo, hi = bw[0], bw[1]
+        self.lo = float(lo) if lo is not None else float("-inf")
+        self.hi = float(hi) if hi is not None else float("inf")
+        self.action = doc.get("action", "allow")
+        if self.action not in ACTIONS:
+            raise PolicyError(f"regra {self.id}: ação desconhecida {self.action!r}")
+        self.code = doc.get("code") or {"deny": "E_POLICY", "adjust": "W_POLICY_ADJUST"}.get(self.action)
+        self.set = dict(doc.get("set", {}))
+        unknown = set(self.set) - {"max_priority", "max_mbps"}
+        if unknown:
+            raise PolicyError(f"regra {self.id}: set não suportado {sorted(unknown)}")
+
+
+class PolicyTable:
+    def __init__(self, rules: Sequence[Dict[str, Any]], default: str = "allow"):
+        if default not in ACTIONS:
+            raise PolicyError(f"default desconhecido: {default!r}")
+        self.default = default
+        self.rules = [Rule(i, r) for i, r in enumerate(rules)]
+        cuts = {x for r in self.rules for x in (r.lo, r.hi)} - {float("-inf"), float("inf")}
+        self.cuts = sorted(cuts)
+        self._nbands = len(self.cuts) + 1
+        self.tenants = frozenset(t for r in self.rules if r.tenants for t in r.tenants)
+        self.scopes = frozenset(s for r in self.rules if r.scopes for s in r.scopes)
+        # candidatas por tenant/scope (índices em ordem); _ANY = regras curinga
+        self._by_tenant: Dict[str, List[int]] = {}
+        self._by_scope: Dict[str, set] = {}
+        for r in self.rules:
+            for t in (r.tenants or (_ANY,)):
+                self._by_tenant.setdefault(t, []).append(r.index)
+            for s in (r.scopes or (_ANY,)):
+                self._by_scope.setdefault(s, set()).add(r.index)
+        self._rows: Dict[Tuple[str, str], array] = {}
+        self._lock = threading.Lock()
+        # contadores por thread (último = default): lookup incrementa o seu
+        # sem lock; hits() soma todos sob o lock
+        self._local = threading.local()
+        self._hit_arrays: List[array] = []
+
+    @classmethod
+    def from_file(cls, path: str) -> "PolicyTable":
+        with open(path, "r", encoding="utf-8") as f:
+            doc = json.load(f)
+        return cls(doc.get("rules", []), doc.get("default", "allow"))
+
+    # ------------------------- compilação -------------------------
+
+    def _band_bounds(self, band: int) -> Tuple[float, float]:
+        lo = self.cuts[band - 1] if band > 0 else float("-inf")
+        hi = self.cuts[band] if band < len(self.cuts) else float("inf")
+        return lo, hi
+
+    def _row(self, t: str, s: str) -> array:
+        row = self._rows.get((t, s))
+        if row is not None:
+            return row
+        cand_t = sorted(set(self._by_tenant.get(t, ())) | set(self._by_tenant.get(_ANY, ())))
+        cand_s = self._by_scope.get(s, set()) | self._by_scope.get(_ANY, set())
+        cands = [self.rules[i] for i in cand_t if i in cand_s]
+        nb = self._nbands
+        row = array("i", [-1] * (4 * nb))
+        for p in range(4):
+            for band in range(nb):
+                lo, hi = self._band_bounds(band)
+                for r in cands:
+                    # a faixa inteira [lo, hi) está dentro de [r.lo, r.hi)
+                    if (r.prios is None or p in r.prios) and r.lo <= lo and hi <= r.hi:
+                        row[p * nb + band] = r.index
+                        break
+        with self._lock:
+            self._rows.setdefault((t, s), row)
+        return row
+
+    # ------------------------- decisão -------------------------
+
+    def lookup(self, tenant: str, scope: str, priority: int, min_mbps: float) -> Optional[Rule]:
+        """Primeira regra que casa (None = default)."""
+        t = tenant if tenant in self.tenants else _ANY
+        s = scope if scope in self.scopes else _ANY
+        band = bisect.bisect_right(self.cuts, min_mbps)
+        i = self._row(t, s)[min(max(priority, 0), 3) * self._nbands + band]
+        self._counters()[i] += 1   # -1 → contador do default
+        return self.rules[i] if i >= 0 else None
+
+    def decide(self, spec: Any) -> Tuple[str, Optional[Rule]]:
+        it = as_intent(spec)
+        r = self.lookup(it.tenant, it.scope, it.priority, it.min_mbps)
+        return (r.action if r is not None else self.default), r
+
+    def apply(self, spec: Any) -> Tuple[str, Any, List[PolicyMsg]]:
+        """Mesmo contrato de apply_policies: (allow|adjust|deny, spec, mensagens)."""
+        action, r = self.decide(spec)
+        rid = r.id if r is not None else None
+        if action == "deny":
+            code = r.code if r is not None else "E_POLICY_DEFAULT"
+            return "deny", spec, [PolicyMsg(code, f"negado pela regra {rid or 'default'}", rid)]
+        if action == "allow" or r is None or not r.set:
+            return "allow", spec, []
+        spec2, changes = _adjust(spec, r.set)
+        if not changes:
+            return "allow", spec, []
+        return "adjust", spec2, [PolicyMsg(r.code, "; ".join(changes), rid)]
+
+    __call__ = apply
+
+    def _counters(self) -> array:
+        c = getattr(self._local, "hits", None)
+        if c is None:
+            c = self._local.hits = array("Q", [0] * (len(self.rules) + 1))
+            with self._lock:
+                self._hit_arrays.append(c)
+        return c
+
+    def hits(self) -> Dict[str, int]:
+        total = [0] * (len(self.rules) + 1)
+        with self._lock:
+            for c in self._hit_arrays:
+                for k, n in enumerate(c):
+                    total[k] += n
+        out = {r.id: total[r.index] for r in self.rules}
+        out["default"] = total[-1]
+        return out
+
+
+def _adjust(spec: Any, sets: Dict[str, Any]) -> Tuple[Any, List[str]]:
+    spec2 = copy.deepcopy(spec)
+    req = spec2.get("requirements", spec2) if isinstance(spec2, dict) else getattr(spec2, "requirements", spec2)
+    changes: List[str] = []
+
+    def get(obj: Any, k: str) -> Any:
+        return obj.get(k) if isinstance(obj, dict) else getattr(obj, k, None)
+
+    def put(obj: Any, k: str, v: Any) -> None:
+        if isinstance(obj, dict): obj[k] = v
+        else: setattr(obj, k, v)
+
+    if "max_priority" in sets:
+        cap = priority_rank(sets["max_priority"])
+        pr = get(req, "priority")
+        cur = priority_rank(pr) if pr is not None else None
+        if cur is not None and cur < cap:
+            new = PRIORITY_LEVELS[cap]
+            if isinstance(pr, str): put(req, "priority", new)
+            else: put(pr, "level", new)
+            changes.append(f"prioridade {PRIORITY_LEVELS[cur]} → {new}")
+    if "max_mbps" in sets:
+        cap = float(sets["max_mbps"])
+        bw = get(req, "bandwidth")
+        if bw is not None:
+            for k in ("max_mbps", "min_mbps"):
+                v = get(bw, k)
+                if v is not None and v > cap:
+                    put(bw, k, cap)
+                    changes.append(f"{k} {v:g} → {cap:g}")
+            if get(bw, "max_mbps") is None and (get(bw, "min_mbps") or 0) <= cap:
+                put(bw, "max_mbps", cap)
+                changes.append(f"max_mbps → {cap:g}")
+    return spec2, changes
@@ -0,0 +1,205 @@
+"""
+profile_registry.py — registro indexado dos perfis de capacidade (dsl/profiles/*.json).
+
+Carrega e valida (schema l2i-capability-v0, via schema_compiler) cada perfil
+uma única vez e mantém:
+
+  - resolução O(1) por nome: profile_id, nome do arquivo sem extensão e
+    apelidos (legacy, p4, A/B/C — ver ALIASES);
+  - índices por modo multicast, tipo de meter, número de filas e velocidade
+    de porta, para consultas do tipo "perfis com l2mc_static, trtcm e ≥ 8 filas";
+  - recarga a quente: a cada `reload_interval` segundos, no máximo, um
+    os.scandir compara (mtime, tamanho) dos arquivos e recarrega apenas os
+    que mudaram, entraram ou saíram — sem reiniciar o processo.
+
+Perfis inválidos não entram no registro; o motivo fica em `errors`.
+"""
+
+from __future__ import annotations
+
+import bisect
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+PROFILE_DIR = Path(__file__).resolve().parent / "profiles"
+
+# apelidos históricos da CLI (--profile legacy|p4) e dos domínios dos cenários
+ALIASES = {
+    "legacy": "legacy-vlan-tc",
+    "p4": "p4-bmv2-basic",
+    "A": "domA", "B": "domB", "C": "domC",
+}
+
+
+class UnknownProfile(KeyError):
+    pass
+
+
+def _stat_key(entry: os.DirEntry) -> Tuple[int, int]:
+    st = entry.stat()
+    return st.st_mtime_ns, st.st_size
+
+
+class ProfileRegistry:
+    def __init__(self, profile_dir: Any = PROFILE_DIR, reload_interval: float = 1.0,
+                 validator: Optional[Callable[[Dict[str, Any]], List[Dict[str, str]]]] = None):
+        self.profile_dir = Path(profile_dir)
+        self.reload_interval = reload_interval
+        if validator is None:
+            from schema_compiler import CAPABILITY_SCHEMA, load_validator
+            validator = load_validator(CAPABILITY_SCHEMA)
+        self._validate = validator
+        self._lock = threading.RLock()
+        self._files: Dict[str, Tuple[int, int]] = {}     # caminho → (mtime_ns, tamanho)
+        self._by_file: Dict[str, str] = {}                # caminho → profile_id
+        self._profiles: Dict[str, Dict[str, Any]] = {}    # profile_id → perfil
+        self._names: Dict[str, str] = {}                  # apelido/stem/id → profile_id
+        self._version: Dict[str, int] = {}                # profile_id → nº de recargas
+        self.errors: Dict[str, Any] = {}
+        self._last_scan = 0.0
+        self._reindex_needed = True
+        self._by_mc_mode: Dict[str, Set[str]] = {}
+        self._by_meter: Dict[str, Set[str]] = {}
+        self._queues: List[Tuple[int, str]] = []
+        self._speeds: List[Tuple[int, str]] = []
+        self.reload(force=True)
+
+    # ------------------------- carga -------------------------
+
+    def _load_file(self, path: str) -> None:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                prof = json.load(f)
+        except (OSError, ValueError) as e:
+            self.errors[path] = f"{type(e).__name__}: {e}"
+            return
+        errs = self._validate(prof)
+        if errs:
+            self.errors[path] = errs
+            return
+        self.errors.pop(path, None)
+        pid = prof["profile_id"]
+        self._profiles[pid] = prof
+        self._by_file[path] = pid
+        self._version[pid] = self._version.get(pid, 0) + 1
+
+    def _drop_file(self, path: str) -> None:
+        pid = self._by_file.pop(path, None)
+        if pid is not None and pid not in self._by_file.values():
+            self._profiles.pop(pid, None)
+        self.errors.pop(path, None)
+
+    def reload(self, force: bool = False) -> List[str]:
+        """Recarrega os arquivos alterados; devolve os caminhos (re)lidos ou removidos."""
+        now = time.monotonic()
+        if not force and now - self._last_scan < self.reload_interval:
+            return []
+        with self._lock:
+            self._last_scan = now
+            seen: Dict[str, Tuple[int, int]] = {}
+            try:
+                with os.scandir(self.profile_dir) as it:
+                    for e in it:
+                        if e.name.endswith(".json") and e.is_file():
+                            seen[e.path] = _stat_key(e)
+            except OSError:
+                pass
+            changed = [p for p, k in seen.items() if self._files.get(p) != k]
+            removed = [p for p in self._files if p not in seen]
+            for p in removed:
+                self._drop_file(p)
+            for p in changed:
+                self._drop_file(p)
+                self._load_file(p)
+            self._files = seen
+            if changed or removed or self._reindex_needed:
+                self._reindex()
+            return changed + removed
+
+    def _reindex(self) -> None:
+        names: Dict[str, str] = {}
+        for path, pid in self._by_file.items():
+            names[pid] = pid
+            names[Path(path).stem] = pid
+        for alias, target in ALIASES.items():
+            if target in names:
+                names.setdefault(alias, names[target])
+        mc: Dict[str, Set[str]] = {}
+        meters: Dict[str, Set[str]] = {}
+        queues, speeds = [], []
+        for pid, p in self._profiles.items():
+            mc.setdefault(p["multicast"]["mode"], set()).add(pid)
+            if p["meters"].get("supported"):
+                for t in p["meters"].get("types", []):
+                    meters.setdefault(t, set()).add(pid)
+            queues.append((int(p["queues"]["max_queues"]), pid))
+            speeds.append((max((int(x["speed_mbps"]) for x in p.get("ports", [])), default=0), pid))
+        self._names, self._by_mc_mode, self._by_meter = names, mc, meters
+        self._queues, self._speeds = sorted(queues), sorted(speeds)
+        self._reindex_needed = False
+
+    # ------------------------- consulta -------------------------
+
+    def resolve(self, name: str) -> Dict[str, Any]:
+        """Perfil por profile_id, nome de arquivo ou apelido (O(1))."""
+        self.reload()
+        pid = self._names.get(name)
+        if pid is None:
+            raise UnknownProfile(f"perfil desconhecido: {name!r} (conhecidos: {', '.join(self.names())})")
+        return self._profiles[pid]
+
+    def profile_id(self, name: str) -> str:
+        return self.resolve(name)["profile_id"]
+
+    def version(self, name: str) -> int:
+        """Contador que muda a cada recarga do perfil (p/ invalidar o que depende dele)."""
+        return self._version.get(self.profile_id(name), 0)
+
+    def __contains__(self, name: str) -> bool:
+        self.reload()
+        return name in self._names
+
+    def names(self) -> List[str]:
+        return sorted(self._names)
+
+    def ids(self) -> List[str]:
+        return sorted(self._profiles)
+
+    def items(self) -> Iterable[Tuple[str, Dict[str, Any]]]:
+        self.reload()
+        return sorted(self._profiles.items())
+
+    def find(self, multicast_mode: Optional[str] = None, meter_type: Optional[str] = None,
+             min_queues: Optional[int] = None, min_port_speed_mbps: Optional[int] = None) -> List[str]:
+        """profile_ids que atendem a todos os critérios informados."""
+        self.reload()
+        sets: List[Set[str]] = []
+        if multicast_mode is not None:
+            sets.append(self._by_mc_mode.get(multicast_mode, set()))
+        if meter_type is not None:
+            sets.append(self._by_meter.get(meter_type, set()))
+        if min_queues is not None:
+            i = bisect.bisect_left(self._queues, (min_queues, ""))
+            sets.append({pid for _, pid in self._queues[i:]})
+        if min_port_speed_mbps is not None:
+            i = bisect.bisect_left(self._speeds, (min_port_speed_mbps, ""))
+            sets.append({pid for _, pid in self._speeds[i:]})
+        if not sets:
+            return self.ids()
+        sets.sort(key=len)
+        out = set(sets[0]).intersection(*sets[1:])
+        return sorted(out)
+
+
+_default: Optional[ProfileRegistry] = None
+
+
+def default_registry() -> ProfileRegistry:
+    global _default
+    if _default is None:
+        _default = ProfileRegistry()
+    return _default
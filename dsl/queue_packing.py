@@ -0,0 +1,189 @@
+"""
+queue_packing.py — empacota muitos intents nas poucas filas de um perfil.
+
+Perfis como legacy-vlan-tc e netconf-like oferecem max_queues = 4 e pesos
+WFQ limitados a [weights_min, weights_max], mas podem receber centenas de
+intents. Este passo de síntese:
+
+  1) agrupa os intents em classes (nível de prioridade × classe de latência,
+     LATENCY_CLASSES_MS) — O(n);
+  2) ordena as classes por urgência (prioridade, depois latência) e funde
+     classes ADJACENTES nessa ordem, sempre o par de menor custo (heap com
+     invalidação preguiçosa), até caberem em max_queues — O(C log C), C ≤ n.
+     Fundir só vizinhas mantém as filas como faixas contíguas de urgência, então
+     a ordem de prioridade estrita entre filas é preservada;
+  3) deriva os pesos WFQ da garantia agregada (Σ min_mbps) de cada fila,
+     escalados para caber em [weights_min, weights_max].
+
+Erro de QoS introduzido (relatado em `error`):
+  - latency:  Σ_f min_f · (lat_f − lat_q) / lat_f / Σ min — quanto os fluxos
+              são servidos com alvo mais apertado que o seu (lat_q = o mais
+              apertado da fila);
+  - priority: Σ_f min_f · (rank_f − rank_q) / Σ min — níveis promovidos ao
+              dividir fila com um nível mais alto;
+  - weight:   distância L1 entre a fatia de peso e a fatia de garantia de
+              cada fila (vem do clamp em [weights_min, weights_max]).
+"""
+
+from __future__ import annotations
+
+import bisect
+import heapq
+import itertools
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from intent import Intent, as_intent
+from plan_ir import PRIORITY_LEVELS
+
+LATENCY_CLASSES_MS = (2, 5, 10, 20, 50, 100, 200, 500, 1000)
+# fundir níveis de prioridade diferentes custa mais que qualquer fusão de latência
+PRIORITY_PENALTY = 1000.0
+
+
+class _Class:
+    """Classe (ou fila, depois das fusões) com agregados suficientes para o custo."""
+
+    __slots__ = ("prio", "lat", "members", "w", "w_prio", "w_inv_lat", "min_mbps", "max_mbps",
+                 "prev", "next", "alive", "ver")
+
+    def __init__(self, prio: int, lat: float):
+        self.prio = prio; self.lat = lat
+        self.members: List[Intent] = []
+        self.w = 0.0           # Σ peso (min_mbps, com piso)
+        self.w_prio = 0.0      # Σ peso · rank
+        self.w_inv_lat = 0.0   # Σ peso / lat
+        self.min_mbps = 0.0; self.max_mbps = 0.0
+        self.prev: Optional[_Class] = None; self.next: Optional[_Class] = None
+        self.alive = True; self.ver = 0
+
+    def add(self, it: Intent, lat: float) -> None:
+        w = max(it.min_mbps, 1e-3)
+        self.members.append(it)
+        self.lat = min(self.lat, lat)
+        self.w += w; self.w_prio += w * it.priority; self.w_inv_lat += w / lat
+        self.min_mbps += it.min_mbps; self.max_mbps += it.max_mbps
+
+    def error(self) -> Tuple[float, float]:
+        # (latência, prioridade) não normalizados; lat/prio da fila = os mais urgentes
+        lat_err = self.w - self.lat * self.w_inv_lat if self.lat != float("inf") else 0.0
+        return lat_err, self.w_prio - self.w * self.prio
+
+
+def _merge_cost(a: _Class, b: _Class) -> float:
+    prio = min(a.prio, b.prio); lat = min(a.lat, b.lat)
+    w = a.w + b.w
+    lat_err = (w - lat * (a.w_inv_lat + b.w_inv_lat)) if lat != float("inf") else 0.0
+    prio_err = a.w_prio + b.w_prio - w * prio
+    before = sum(a.error()) + sum(b.error())
+    return lat_err + PRIORITY_PENALTY * prio_err - before
+
+
+def _merge(a: _Class, b: _Class) -> _Class:
+    # b (a seguinte) é absorvida por a
+    a.members += b.members
+    a.prio = min(a.prio, b.prio); a.lat = min(a.lat, b.lat)
+    a.w += b.w; a.w_prio += b.w_prio; a.w_inv_lat += b.w_inv_lat
+    a.min_mbps += b.min_mbps; a.max_mbps += b.max_mbps
+    a.next = b.next
+    if b.next is not None:
+        b.next.prev = a
+    b.alive = False
+    a.ver += 1
+    return a
+
+
+def latency_class(latency_ms: Optional[float]) -> float:
+    """Limite superior da classe de latência do intent (inf = sem requisito)."""
+    if latency_ms is None:
+        return float("inf")
+    i = bisect.bisect_left(LATENCY_CLASSES_MS, latency_ms)
+    return float(LATENCY_CLASSES_MS[i]) if i < len(LATENCY_CLASSES_MS) else float("inf")
+
+
+def wfq_weights(shares: Sequence[float], wmin: float, wmax: float) -> List[float]:
+    """Pesos proporcionais às garantias, com o maior em wmax e todos em [wmin, wmax]."""
+    top = max(shares, default=0.0)
+    if top <= 0:
+        return [wmin for _ in shares]
+    return [round(min(max(s / top * wmax, wmin), wmax), 3) for s in shares]
+
+
+class Packing:
+    __slots__ = ("profile_id", "queues", "assignment", "error")
+
+    def __init__(self, profile_id: str, queues: List[Dict[str, Any]],
+                 assignment: Dict[Tuple[str, str, str], int], error: Dict[str, float]):
+        self.profile_id = profile_id; self.queues = queues
+        self.assignment = assignment; self.error = error   # assignment: Intent.flow_key → qid
+
+    def to_json_dict(self) -> Dict[str, Any]:
+        return {"profile_id": self.profile_id, "queues": self.queues,
+                "assignment": {"/".join(k): qid for k, qid in self.assignment.items()}, "error": self.error}
+
+
+def pack(intents: Sequence[Any], profile: Dict[str, Any], max_queues: Optional[int] = None) -> Packing:
+    """Empacota `intents` nas filas de `profile` (max_queues opcional sobrepõe o perfil)."""
+    qcfg = profile.get("queues", {})
+    k = max(1, int(max_queues if max_queues is not None else qcfg.get("max_queues", 1)))
+    wfq = qcfg.get("modes", {}).get("wfq", {})
+    wmin = float(wfq.get("weights_min", 1)); wmax = float(wfq.get("weights_max", 100))
+
+    classes: Dict[Tuple[int, float], _Class] = {}
+    for spec in intents:
+        it = as_intent(spec)
+        lat = latency_class(it.latency_ms)
+        key = (min(max(it.priority, 0), 3), lat)
+        c = classes.get(key)
+        if c is None:
+            c = classes[key] = _Class(key[0], float("inf"))
+        c.add(it, float(it.latency_ms) if it.latency_ms else float("inf"))
+
+    chain = [classes[key] for key in sorted(classes)]
+    for a, b in zip(chain, chain[1:]):
+        a.next = b; b.prev = a
+    seq = itertools.count()   # desempate estável: o heap nunca compara _Class
+    heap = [(_merge_cost(a, b), next(seq), a.ver, b.ver, a, b) for a, b in zip(chain, chain[1:])]
+    heapq.heapify(heap)
+    n = len(chain)
+    while n > k and heap:
+        _, _, va, vb, a, b = heapq.heappop(heap)
+        if not (a.alive and b.alive) or a.next is not b or a.ver != va or b.ver != vb:
+            continue   # par obsoleto
+        m = _merge(a, b)
+        n -= 1
+        if m.prev is not None:
+            heapq.heappush(heap, (_merge_cost(m.prev, m), next(seq), m.prev.ver, m.ver, m.prev, m))
+        if m.next is not None:
+            heapq.heappush(heap, (_merge_cost(m, m.next), next(seq), m.ver, m.next.ver, m, m.next))
+
+    head = chain[0] if chain else None
+    while head is not None and head.prev is not None:
+        head = head.prev
+    qs: List[_Class] = []
+    while head is not None:
+        qs.append(head); head = head.next
+
+    weights = wfq_weights([q.min_mbps for q in qs], wmin, wmax)
+    total_min = sum(q.w for q in qs) or 1.0
+    lat_err = sum(q.error()[0] for q in qs) / total_min
+    prio_err = sum(q.error()[1] for q in qs) / total_min
+    tot_g = sum(q.min_mbps for q in qs) or 1.0
+    tot_w = sum(weights) or 1.0
+    w_err = sum(abs(w / tot_w - q.min_mbps / tot_g) for q, w in zip(qs, weights)) if qs else 0.0
+
+    queues, assignment = [], {}
+    for qid, (q, w) in enumerate(zip(qs, weights), 1):
+        queues.append({
+            "qid": qid,
+            "priority": PRIORITY_LEVELS[q.prio],
+            "latency_ms": None if q.lat == float("inf") else q.lat,
+            "weight": w,
+            "flows": len(q.members),
+            "min_mbps": round(q.min_mbps, 6),
+            "max_mbps": round(q.max_mbps, 6),
+        })
+        for it in q.members:
+            assignment[it.flow_key] = qid
+    error = {"latency": round(lat_err, 6) + 0.0, "priority": round(prio_err, 6) + 0.0,   # + 0.0: sem "-0.0"
+             "weight": round(w_err, 6)}
+    return Packing(profile.get("profile_id", ""), queues, assignment, error)
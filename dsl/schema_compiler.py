@@ -0,0 +1,317 @@
+"""
+schema_compiler.py — compila os JSON Schemas da L2I em código Python especializado.
+
+Em vez de interpretar o schema a cada chamada, gera uma função `validate(doc)`
+com as verificações já achatadas (required/additionalProperties viram testes
+diretos sobre as chaves, regexes são pré-compiladas no módulo gerado). O fonte
+gerado é guardado em disco, chaveado pelo hash do schema + versão do
+compilador, e reaproveitado nas execuções seguintes.
+
+Cobre o subconjunto de palavras-chave usado em dsl/schemas/*.json: type,
+const, enum, pattern, minLength, maxLength, minimum, maximum,
+exclusiveMinimum, exclusiveMaximum, required, properties,
+additionalProperties (bool), minProperties, items, maxItems, minItems.
+Palavras-chave de anotação (title, description, default, format, $schema,
+$id) são ignoradas. Qualquer outra palavra-chave falha na compilação
+(SchemaCompileError) em vez de ser ignorada em silêncio.
+
+const/enum comparam como JSON: true não é 1, e um valor não-hashable (lista,
+objeto) é só mais um valor fora do enum (E_SCHEMA), não uma exceção.
+
+O fonte em disco só é executado se o diretório e o arquivo pertencem ao
+usuário e não são graváveis por grupo/outros, e se o sha256 do conteúdo
+(1ª linha) confere; senão o validador é regerado e o arquivo reescrito.
+
+Uso:
+    v = load_validator("schemas/l2i-v0.json")
+    errs = v(doc)   # [] se válido; senão [{"code","path","msg"}, ...]
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+COMPILER_VERSION = 2
+SCHEMA_DIR = Path(__file__).resolve().parent / "schemas"
+SPEC_SCHEMA = SCHEMA_DIR / "l2i-v0.json"
+CAPABILITY_SCHEMA = SCHEMA_DIR / "l2i-capability-v0.json"
+
+_ANNOTATIONS = {"$schema", "$id", "title", "description", "default", "format", "$comment"}
+_SUPPORTED = _ANNOTATIONS | {
+    "type", "const", "enum", "pattern", "minLength", "maxLength", "minimum", "maximum",
+    "exclusiveMinimum", "exclusiveMaximum", "required", "properties",
+    "additionalProperties", "minProperties", "items", "maxItems", "minItems",
+}
+_TYPE_TEST = {
+    "object": "isinstance({v}, dict)",
+    "array": "isinstance({v}, list)",
+    "string": "isinstance({v}, str)",
+    "boolean": "isinstance({v}, bool)",
+    "number": "(isinstance({v}, (int, float)) and not isinstance({v}, bool))",
+    "integer": "((isinstance({v}, int) and not isinstance({v}, bool))"
+               " or (isinstance({v}, float) and {v}.is_integer()))",
+    "null": "({v} is None)",
+}
+
+Validator = Callable[[Any], List[Dict[str, str]]]
+
+# igualdade JSON para const/enum: bool ≠ número, listas/objetos comparados por elemento
+_JSON_EQ_SRC = """\
+def _json_eq(a, b):
+    if isinstance(a, bool) or isinstance(b, bool) or a is None or b is None:
+        return type(a) is type(b) and a == b
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return a == b
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, list):
+        return len(a) == len(b) and all(_json_eq(x, y) for x, y in zip(a, b))
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(_json_eq(a[k], b[k]) for k in a)
+    return a == b
+"""
+_SOURCE_HASH = "# source sha256 "
+
+
+class SchemaCompileError(ValueError):
+    pass
+
+
+def _frozenset_src(items: Any) -> str:
+    # ordenado: o fonte gerado é determinístico (independe do hash seed)
+    return f"frozenset({sorted(items, key=repr)!r})"
+
+
+class _Gen:
+    def __init__(self) -> None:
+        self.lines: List[str] = []
+        self.consts: List[str] = []
+        self._const_names: Dict[str, str] = {}
+        self._n = 0
+        self.json_eq = False
+
+    def var(self, prefix: str = "v") -> str:
+        self._n += 1
+        return f"{prefix}{self._n}"
+
+    def const(self, expr: str) -> str:
+        name = self._const_names.get(expr)
+        if name is None:
+            name = self._const_names[expr] = f"_K{len(self.consts)}"
+            self.consts.append(f"{name} = {expr}")
+        return name
+
+    def emit(self, depth: int, line: str) -> None:
+        self.lines.append("    " * depth + line)
+
+    def err(self, depth: int, path: str, msg: str) -> None:
+        # path é uma expressão Python (string) — pode ser dinâmica em arrays
+        self.emit(depth, f"errs.append({{'code': 'E_SCHEMA', 'path': {path}, 'msg': {msg!r}}})")
+
+    def node(self, schema: Dict[str, Any], v: str, path: str, depth: int) -> None:
+        unknown = set(schema) - _SUPPORTED
+        if unknown:
+            raise SchemaCompileError(f"palavra-chave não suportada em {path}: {sorted(unknown)}")
+
+        if "const" in schema:
+            c = schema["const"]
+            if isinstance(c, str):
+                self.emit(depth, f"if {v} != {c!r}:")
+            else:
+                self.json_eq = True
+                self.emit(depth, f"if not _json_eq({v}, {c!r}):")
+            self.err(depth + 1, path, f"deve ser {c!r}")
+        if "enum" in schema:
+            # frozenset só com o tipo já garantido (hashable, e sem True == 1)
+            enum = schema["enum"]
+            if all(isinstance(x, str) for x in enum):
+                k = self.const(_frozenset_src(enum))
+                self.emit(depth, f"if not (isinstance({v}, str) and {v} in {k}):")
+            elif all(isinstance(x, (int, float)) and not isinstance(x, bool) for x in enum):
+                k = self.const(_frozenset_src(enum))
+                self.emit(depth, f"if not ({_TYPE_TEST['number'].format(v=v)} and {v} in {k}):")
+            else:
+                self.json_eq = True
+                k = self.const(repr(tuple(enum)))
+                x = self.var("e")
+                self.emit(depth, f"if not any(_json_eq({v}, {x}) for {x} in {k}):")
+            self.err(depth + 1, path, f"deve ser um de {enum!r}")
+
+        t = schema.get("type")
+        if t is None:
+            self._body(schema, v, path, depth, None)
+            return
+        types = t if isinstance(t, list) else [t]
+        test = " or ".join(_TYPE_TEST[x].format(v=v) for x in types)
+        self.emit(depth, f"if not ({test}):")
+        self.err(depth + 1, path, f"tipo esperado: {'/'.join(types)}")
+        self.emit(depth, "else:")
+        n = len(self.lines)
+        self._body(schema, v, path, depth + 1, types[0] if len(types) == 1 else None)
+        if len(self.lines) == n:
+            self.emit(depth + 1, "pass")
+
+    def _body(self, schema: Dict[str, Any], v: str, path: str, depth: int, t: Optional[str]) -> None:
+        if t in (None, "string"):
+            guard = "" if t == "string" else f"isinstance({v}, str) and "
+            if "minLength" in schema:
+                self.emit(depth, f"if {guard}len({v}) < {int(schema['minLength'])}:")
+                self.err(depth + 1, path, f"comprimento mínimo {schema['minLength']}")
+            if "maxLength" in schema:
+                self.emit(depth, f"if {guard}len({v}) > {int(schema['maxLength'])}:")
+                self.err(depth + 1, path, f"comprimento máximo {schema['maxLength']}")
+            if "pattern" in schema:
+                k = self.const(f"_re.compile({schema['pattern']!r})")
+                self.emit(depth, f"if {guard}{k}.search({v}) is None:")
+                self.err(depth + 1, path, f"não casa com {schema['pattern']}")
+        if t in (None, "number", "integer"):
+            guard = "" if t in ("number", "integer") else \
+                f"isinstance({v}, (int, float)) and not isinstance({v}, bool) and "
+            for kw, op, word in (("minimum", "<", "mínimo"), ("maximum", ">", "máximo"),
+                                 ("exclusiveMinimum", "<=", "deve ser >"),
+                                 ("exclusiveMaximum", ">=", "deve ser <")):
+                if kw in schema:
+                    self.emit(depth, f"if {guard}{v} {op} {schema[kw]!r}:")
+                    self.err(depth + 1, path, f"{word} {schema[kw]}")
+        if t in (None, "object"):
+            self._object(schema, v, path, depth, guarded=(t == "object"))
+        if t in (None, "array"):
+            self._array(schema, v, path, depth, guarded=(t == "array"))
+
+    def _object(self, schema: Dict[str, Any], v: str, path: str, depth: int, guarded: bool) -> None:
+        keys = ("properties", "required", "additionalProperties", "minProperties")
+        if not any(k in schema for k in keys):
+            return
+        if not guarded:
+            self.emit(depth, f"if isinstance({v}, dict):")
+            depth += 1
+        props: Dict[str, Any] = schema.get("properties", {})
+        for r in schema.get("required", []):
+            self.emit(depth, f"if {r!r} not in {v}:")
+            self.err(depth + 1, path, f"campo obrigatório ausente: {r}")
+        if "minProperties" in schema:
+            self.emit(depth, f"if len({v}) < {int(schema['minProperties'])}:")
+            self.err(depth + 1, path, f"mínimo de {schema['minProperties']} campos")
+        if schema.get("additionalProperties") is False:
+            k = self.const(_frozenset_src(props))
+            extra = self.var("x")
+            self.emit(depth, f"for {extra} in {v}.keys() - {k}:")
+            self.err(depth + 1, f"{path} + '/' + str({extra})", "campo não permitido")
+        elif isinstance(schema.get("additionalProperties"), dict):
+            raise SchemaCompileError(f"additionalProperties com schema em {path}")
+        for name, sub in props.items():
+            child = self.var()
+            self.emit(depth, f"{child} = {v}.get({name!r}, _MISSING)")
+            self.emit(depth, f"if {child} is not _MISSING:")
+            n = len(self.lines)
+            self.node(sub, child, f"{path} + {'/' + name!r}", depth + 1)
+            if len(self.lines) == n:
+                self.emit(depth + 1, "pass")
+
+    def _array(self, schema: Dict[str, Any], v: str, path: str, depth: int, guarded: bool) -> None:
+        if not any(k in schema for k in ("items", "maxItems", "minItems")):
+            return
+        if not guarded:
+            self.emit(depth, f"if isinstance({v}, list):")
+            depth += 1
+        if "maxItems" in schema:
+            self.emit(depth, f"if len({v}) > {int(schema['maxItems'])}:")
+            self.err(depth + 1, path, f"máximo de {schema['maxItems']} itens")
+        if "minItems" in schema:
+            self.emit(depth, f"if len({v}) < {int(schema['minItems'])}:")
+            self.err(depth + 1, path, f"mínimo de {schema['minItems']} itens")
+        if isinstance(schema.get("items"), dict):
+            i, item = self.var("i"), self.var()
+            self.emit(depth, f"for {i}, {item} in enumerate({v}):")
+            n = len(self.lines)
+            self.node(schema["items"], item, f"{path} + '/' + str({i})", depth + 1)
+            if len(self.lines) == n:
+                self.emit(depth + 1, "pass")
+
+
+def schema_hash(schema: Dict[str, Any]) -> str:
+    blob = json.dumps(schema, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(blob + f":v{COMPILER_VERSION}".encode()).hexdigest()
+
+
+def generate_source(schema: Dict[str, Any]) -> str:
+    """Fonte Python do validador especializado para `schema`."""
+    g = _Gen()
+    g.node(schema, "doc", "''", 1)
+    head = [
+        f"# gerado por schema_compiler.py v{COMPILER_VERSION} — {schema.get('title', '')}",
+        f"# schema sha256 {schema_hash(schema)}",
+        "import re as _re",
+        "_MISSING = object()",
+        *g.consts,
+        *([_JSON_EQ_SRC] if g.json_eq else []),
+        "",
+        "def validate(doc):",
+        "    errs = []",
+    ]
+    body = "\n".join(head + g.lines + ["    return errs", ""])
+    return f"{_SOURCE_HASH}{hashlib.sha256(body.encode('utf-8')).hexdigest()}\n{body}"
+
+
+def _verified(src: str, h: str) -> bool:
+    """1ª linha = sha256 do resto, e o resto é o validador do schema `h`."""
+    first, _, body = src.partition("\n")
+    if not first.startswith(_SOURCE_HASH):
+        return False
+    return (first[len(_SOURCE_HASH):] == hashlib.sha256(body.encode("utf-8")).hexdigest()
+            and f"\n# schema sha256 {h}\n" in body)
+
+
+def _owned(path: Path) -> bool:
+    # do usuário e sem escrita para grupo/outros (sem getuid, só o modo)
+    st = path.stat()
+    if hasattr(os, "getuid") and st.st_uid != os.getuid():
+        return False
+    return not st.st_mode & 0o022
+
+
+def _default_cache_dir() -> Path:
+    base = os.environ.get("L2I_CACHE_DIR") or os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "l2i")
+    return Path(base) / "schemas"
+
+
+_loaded: Dict[str, Validator] = {}
+
+
+def compile_schema(schema: Dict[str, Any], cache_dir: Optional[str] = None) -> Validator:
+    """Validador compilado para `schema` (memória → disco → geração)."""
+    h = schema_hash(schema)
+    fn = _loaded.get(h)
+    if fn is not None:
+        return fn
+    path = Path(cache_dir) if cache_dir else _default_cache_dir()
+    path = path / f"schema_{h[:24]}.py"
+    try:
+        src = path.read_text(encoding="utf-8") if _owned(path.parent) and _owned(path) else None
+    except OSError:
+        src = None
+    if src is None or not _verified(src, h):
+        src = generate_source(schema)
+        try:
+            path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".tmp{os.getpid()}")
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(src)
+            os.replace(tmp, path)
+        except OSError:
+            pass  # sem cache em disco: segue só com a versão em memória
+    ns: Dict[str, Any] = {}
+    exec(compile(src, str(path), "exec"), ns)
+    fn = _loaded[h] = ns["validate"]
+    return fn
+
+
+def load_validator(schema_path: Any = SPEC_SCHEMA, cache_dir: Optional[str] = None) -> Validator:
+    with open(schema_path, "r", encoding="utf-8") as f:
+        return compile_schema(json.load(f), cache_dir=cache_dir)
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+bench_pipeline.py — vazão, latência e memória por estágio do compilador L2I.
+
+Gera specs válidos (gen_specs.py) nos tamanhos pedidos (default 10, 1k, 100k)
+e mede cada estágio separadamente, na ordem do pipeline:
+
+  l2i:   validate → policies → capabilities → compose → synth → emit_netconf / emit_p4
+         (funções do pacote l2i, um spec por chamada, como em e2e_pipeline);
+  batch: os caminhos em lote desta árvore — schema compilado, policy_table,
+         capability_matrix (N specs × M perfis), compose_index, queue_packing.
+         Uma amostra de --verify-cells células da matriz é conferida contra
+         check_capabilities (capability_matrix_vs_scalar no relatório).
+
+Por estágio: n, segundos, itens/s, latência por chamada (p50/p99/máx em µs,
+estágios item a item) e pico de memória alocada (tracemalloc, numa segunda
+passada para não distorcer o tempo). O relatório JSON leva o commit do git;
+--baseline compara com um relatório anterior e lista as regressões de vazão
+acima de --threshold (saída 1 se houver).
+
+Uso:
+    python3 scripts/bench_pipeline.py --sizes 10,1000,100000 --profile A \\
+        [--out results/bench/pipeline.json] [--baseline results/bench/anterior.json]
+"""
+
+import argparse
+import json
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+BASE = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE))
+sys.path.insert(0, str(BASE / "scripts"))
+
+from gen_specs import gen_profiles, gen_specs  # noqa: E402
+from profile_registry import default_registry  # noqa: E402
+
+def git_info() -> Dict[str, Any]:
+    def git(*a: str) -> Optional[str]:
+        try:
+            r = subprocess.run(["git", *a], cwd=BASE, capture_output=True, text=True, timeout=10)
+            return r.stdout.strip() if r.returncode == 0 else None
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+    status = git("status", "--porcelain", "--untracked-files=no")
+    return {"commit": git("rev-parse", "HEAD"), "branch": git("rev-parse", "--abbrev-ref", "HEAD"),
+            "dirty": bool(status) if status is not None else None}
+
+
+def _pct(sorted_ns: List[int], q: float) -> float:
+    return sorted_ns[min(len(sorted_ns) - 1, int(round(q * (len(sorted_ns) - 1))))] / 1000.0
+
+
+def per_item(fn: Callable[[Any], Any], items: Sequence[Any], memory: bool) -> Dict[str, Any]:
+    """Estágio item a item: devolve {"out": saídas, "stats": ...}."""
+    lat = [0] * len(items)
+    out = [None] * len(items)
+    clock = time.perf_counter_ns
+    t0 = clock()
+    for i, x in enumerate(items):
+        a = clock()
+        out[i] = fn(x)
+        lat[i] = clock() - a
+    total = (clock() - t0) / 1e9
+    lat.sort()
+    stats = {"n": len(items), "seconds": round(total, 6),
+             "items_per_s": round(len(items) / total, 1) if total > 0 else None}
+    if lat:
+        stats.update(p50_us=round(_pct(lat, 0.50), 3), p99_us=round(_pct(lat, 0.99), 3),
+                     max_us=round(lat[-1] / 1000.0, 3), mean_us=round(statistics.fmean(lat) / 1000.0, 3))
+    if memory:
+        stats["peak_kib"] = traced_peak(lambda: [fn(x) for x in items])
+    return {"out": out, "stats": stats}
+
+
+def whole(fn: Callable[[], Any], n: int, memory: bool) -> Dict[str, Any]:
+    """Estágio em lote (uma chamada para os n itens)."""
+    t0 = time.perf_counter()
+    out = fn()
+    total = time.perf_counter() - t0
+    stats = {"n": n, "seconds": round(total, 6), "items_per_s": round(n / total, 1) if total > 0 else None}
+    if memory:
+        stats["peak_kib"] = traced_peak(fn)
+    return {"out": out, "stats": stats}
+
+
+def traced_peak(fn: Callable[[], Any]) -> float:
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        fn()
+        return round(tracemalloc.get_traced_memory()[1] / 1024.0, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def bench_l2i(docs: List[Dict[str, Any]], profile: Dict[str, Any], memory: bool) -> Dict[str, Any]:
+    try:
+        from l2i.validator import validate_spec
+        from l2i.policies import apply_policies
+        from l2i.capabilities import check_capabilities
+        from l2i.compose import compose_specs
+        from l2i.synth import synthesize_ir
+        from l2i.emit import emit_netconf_like, emit_p4runtime_like
+    except ImportError as e:
+        return {"skipped": f"pacote l2i ausente ({e})"}
+    res: Dict[str, Any] = {}
+    r = per_item(validate_spec, docs, memory)
+    res["validate"] = r["stats"]
+    specs = [s for s, errs in r["out"] if not errs]
+    r = per_item(apply_policies, specs, memory)
+    res["policies"] = r["stats"]
+    specs = [s for st, s, _ in r["out"] if st != "deny"]
+    r = per_item(lambda s: check_capabilities(s, profile), specs, memory)
+    res["capabilities"] = r["stats"]
+    specs = [s for st, s, _ in r["out"] if st != "deny"]
+    r = per_item(lambda s: compose_specs([s]), specs, memory)
+    res["compose"] = r["stats"]
+    merged = [m for m, confl in r["out"] if not confl]
+    r = per_item(lambda m: synthesize_ir(m, profile), merged, memory)
+    res["synth"] = r["stats"]
+    plans = r["out"]
+    res["emit_netconf"] = per_item(emit_netconf_like, plans, memory)["stats"]
+    res["emit_p4"] = per_item(emit_p4runtime_like, plans, memory)["stats"]
+    return res
+
+
+def bench_batch(docs: List[Dict[str, Any]], profile: Dict[str, Any], profiles: List[Dict[str, Any]],
+                memory: bool, cache_dir: Optional[str], verify_cells: int = 0) -> Dict[str, Any]:
+    import schema_compiler
+    from capability_matrix import ProfileArrays, check_matrix, compare_scalar
+    from compose_index import compose_many
+    from intent import from_specs
+    from policy_table import PolicyTable
+    from queue_packing import pack
+    res: Dict[str, Any] = {}
+    validator = schema_compiler.load_validator(cache_dir=cache_dir)
+    res["validate_compiled"] = per_item(validator, docs, memory)["stats"]
+    res["intents"] = whole(lambda: from_specs(docs), len(docs), memory)["stats"]
+    intents = from_specs(docs)
+    table = PolicyTable.from_file(str(BASE / "policies" / "example.json"))
+    res["policy_table"] = per_item(table.apply, docs, memory)["stats"]
+    cells = len(intents) * len(profiles)
+    parr = ProfileArrays(profiles)
+    r = whole(lambda: check_matrix(intents, parr), cells, memory)
+    res["capability_matrix"] = dict(r["stats"], profiles=len(profiles), unknown_modes=parr.unknown_modes)
+    if verify_cells:
+        # equivalência com o caminho escalar numa amostra de células
+        try:
+            from l2i.capabilities import check_capabilities
+        except ImportError as e:
+            res["capability_matrix_vs_scalar"] = {"skipped": f"pacote l2i ausente ({e})"}
+        else:
+            res["capability_matrix_vs_scalar"] = compare_scalar(
+                check_matrix(intents, parr), docs, profiles, check_capabilities, max_cells=verify_cells)
+    res["compose_index"] = whole(lambda: compose_many(intents, 10000.0), len(intents), memory)["stats"]
+    res["queue_packing"] = whole(lambda: pack(intents, profile), len(intents), memory)["stats"]
+    return res
+
+
+def regressions(prev: Dict[str, Any], cur: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    out = []
+    for size, groups in cur.get("sizes", {}).items():
+        for group, stages in groups.items():
+            if not isinstance(stages, dict):
+                continue
+            for stage, st in stages.items():
+                old = prev.get("sizes", {}).get(size, {}).get(group, {}).get(stage)
+                if not isinstance(st, dict) or not isinstance(old, dict):
+                    continue
+                a, b = old.get("items_per_s"), st.get("items_per_s")
+                if a and b and b < a * (1.0 - threshold):
+                    out.append({"size": size, "group": group, "stage": stage,
+                                "before": a, "after": b, "ratio": round(b / a, 3)})
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark por estágio do pipeline L2I")
+    ap.add_argument("--sizes", default="10,1000,100000", help="números de intents (default: 10,1000,100000)")
+    ap.add_argument("--tenants", type=int, default=50)
+    ap.add_argument("--mc-ratio", type=float, default=0.1)
+    ap.add_argument("--bw", default="lognormal:2:1", help="distribuição de min_mbps (ver gen_specs.py)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--profile", default="A", help="perfil dos estágios por spec (default: A)")
+    ap.add_argument("--synthetic-profiles", type=int, default=16,
+                    help="perfis sintéticos somados aos registrados na matriz de capacidades (default: 16)")
+    ap.add_argument("--no-memory", action="store_true", help="sem a passada com tracemalloc")
+    ap.add_argument("--verify-cells", type=int, default=1000,
+                    help="células da matriz de capacidades conferidas contra check_capabilities (0 desliga; default: 1000)")
+    ap.add_argument("--cache-dir", default=None, help="cache do schema compilado (default: $L2I_CACHE_DIR/schemas)")
+    ap.add_argument("--out", default=None, help="relatório JSON (default: results/bench/pipeline_<commit>.json)")
+    ap.add_argument("--baseline", default=None, help="relatório anterior para comparar a vazão")
+    ap.add_argument("--threshold", type=float, default=0.2, help="queda relativa de itens/s que conta como regressão (default: 0.2)")
+    args = ap.parse_args()
+
+    reg = default_registry()
+    profile = reg.resolve(args.profile)
+    profiles = [p for _, p in reg.items()] + gen_profiles(args.synthetic_profiles, args.seed)
+    memory = not args.no_memory
+    report: Dict[str, Any] = {
+        "timestamp_utc": datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ"),
+        "git": git_info(),
+        "python": sys.version.split()[0], "platform": platform.platform(),
+        "params": {"tenants": args.tenants, "mc_ratio": args.mc_ratio, "bw": args.bw, "seed": args.seed,
+                   "profile": profile["profile_id"], "profiles": len(profiles), "memory": memory},
+        "sizes": {},
+    }
+    for n in [int(x) for x in args.sizes.split(",") if x.strip()]:
+        docs = list(gen_specs(n, args.tenants, args.mc_ratio, args.bw, args.seed))
+        t0 = time.perf_counter()
+        report["sizes"][str(n)] = {"l2i": bench_l2i(docs, profile, memory),
+                                   "batch": bench_batch(docs, profile, profiles, memory, args.cache_dir,
+                                                       args.verify_cells)}
+        print(f"[bench] n={n} em {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+    # ru_maxrss: KiB no Linux, bytes no macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    report["rss_max_kib"] = rss // 1024 if sys.platform == "darwin" else rss
+
+    rc = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            prev = json.load(f)
+        report["baseline"] = {"path": args.baseline, "commit": prev.get("git", {}).get("commit"),
+                              "threshold": args.threshold,
+                              "regressions": regressions(prev, report, args.threshold)}
+        rc = 1 if report["baseline"]["regressions"] else 0
+
+    out = json.dumps(report, indent=2, ensure_ascii=False)
+    print(out)
+    commit = (report["git"].get("commit") or "nogit")[:10]
+    path = Path(args.out) if args.out else BASE / "results" / "bench" / f"pipeline_{commit}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(out + "\n", encoding="utf-8")
+    print(f"[bench] relatório em {path}", file=sys.stderr)
+    sys.exit(rc)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+bench_validator.py — vazão (specs/s) da validação de schema da L2I.
+
+Compara, sobre os specs de specs/valid e specs/invalid (repetidos até
+--n documentos):
+  - compiled:   validador gerado por schema_compiler.py (cache em disco);
+  - jsonschema: interpretação do mesmo schema (se o pacote estiver instalado);
+  - l2i:        l2i.validator.validate_spec, schema + semântica (se importável).
+
+Uso:
+    python3 scripts/bench_validator.py --n 100000 [--out results/bench/validator.json]
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+BASE = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE))
+
+import schema_compiler  # noqa: E402
+
+
+def load_docs():
+    docs = []
+    for sub in ("valid", "invalid"):
+        for f in sorted(glob.glob(str(BASE / "specs" / sub / "*.json"))):
+            with open(f, "r", encoding="utf-8") as fh:
+                docs.append((os.path.basename(f), json.load(fh)))
+    return docs
+
+
+def bench(fn, docs, n):
+    k = len(docs)
+    t0 = time.perf_counter()
+    for i in range(n):
+        fn(docs[i % k][1])
+    dt = time.perf_counter() - t0
+    return {"n": n, "seconds": round(dt, 4), "specs_per_s": round(n / dt, 1) if dt > 0 else None}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark do validador de specs L2I")
+    ap.add_argument("--n", type=int, default=100000, help="documentos validados por variante (default: 100000)")
+    ap.add_argument("--schema", default=str(schema_compiler.SPEC_SCHEMA))
+    ap.add_argument("--cache-dir", default=None, help="cache dos validadores gerados (default: $L2I_CACHE_DIR/schemas)")
+    ap.add_argument("--out", default=None, help="grava o relatório JSON também neste arquivo")
+    args = ap.parse_args()
+
+    docs = load_docs()
+    with open(args.schema, "r", encoding="utf-8") as f:
+        schema = json.load(f)
+
+    t0 = time.perf_counter()
+    compiled = schema_compiler.compile_schema(schema, cache_dir=args.cache_dir)
+    load_ms = (time.perf_counter() - t0) * 1000.0
+
+    report = {
+        "schema": args.schema,
+        "docs": len(docs),
+        "compiled_load_ms": round(load_ms, 3),
+        "verdicts": {name: len(compiled(d)) == 0 for name, d in docs},
+        "results": {"compiled": bench(compiled, docs, args.n)},
+    }
+
+    try:
+        import jsonschema
+        cls = jsonschema.validators.validator_for(schema)
+        interp = cls(schema)
+        report["results"]["jsonschema"] = bench(lambda d: list(interp.iter_errors(d)), docs, args.n)
+    except ImportError:
+        report["results"]["jsonschema"] = "pacote jsonschema ausente"
+
+    try:
+        from l2i.validator import validate_spec
+        report["results"]["l2i"] = bench(validate_spec, docs, args.n)
+    except ImportError:
+        report["results"]["l2i"] = "l2i.validator ausente"
+
+    out = json.dumps(report, indent=2, ensure_ascii=False)
+    print(out)
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(out + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+gen_specs.py — gerador de specs L2I-v0 (válidos no schema) e de perfis sintéticos.
+
+Parâmetros: número de tenants e de fluxos, fração multicast, distribuição de
+banda e semente. Os specs saem em NDJSON (entrada direta de `cli.py batch`);
+com --profiles-dir também grava N perfis variados (filas, meters, modo
+multicast, portas), válidos no schema de capacidades.
+
+Distribuições de banda (min_mbps; max_mbps = min × U[1, 3]):
+  fixed:V  |  uniform:LO:HI  |  lognormal:MU:SIGMA  |  pareto:ALPHA:SCALE
+
+Uso:
+    python3 scripts/gen_specs.py --flows 1000 --tenants 10 --mc-ratio 0.1 \\
+        --bw lognormal:2:1 > /tmp/specs.ndjson
+    python3 scripts/gen_specs.py --flows 0 --profiles 8 --profiles-dir /tmp/profiles
+"""
+
+import argparse
+import json
+import random
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List
+
+LEVELS = ("critical", "high", "medium", "low")
+LEVEL_WEIGHTS = (1, 2, 4, 3)
+LATENCIES_MS = (5, 10, 20, 40, 100, 500)
+BW_MAX = 1000000.0
+
+
+def bw_sampler(spec: str, rng: random.Random) -> Callable[[], float]:
+    kind, *p = spec.split(":")
+    p = [float(x) for x in p]
+    if kind == "fixed":
+        draw = lambda: p[0]
+    elif kind == "uniform":
+        draw = lambda: rng.uniform(p[0], p[1])
+    elif kind == "lognormal":
+        draw = lambda: rng.lognormvariate(p[0], p[1])
+    elif kind == "pareto":
+        draw = lambda: p[1] * rng.paretovariate(p[0])
+    else:
+        raise ValueError(f"distribuição de banda desconhecida: {spec}")
+    # exclusiveMinimum 0 e maximum do schema
+    return lambda: round(min(max(draw(), 0.001), BW_MAX), 3)
+
+
+def gen_specs(flows: int, tenants: int = 1, mc_ratio: float = 0.0, bw: str = "uniform:1:100",
+              seed: int = 0, scopes: int = 4, target_profile: str = "") -> Iterator[Dict[str, Any]]:
+    rng = random.Random(seed)
+    draw = bw_sampler(bw, rng)
+    for i in range(flows):
+        lo = draw()
+        req: Dict[str, Any] = {
+            "bandwidth": {"min_mbps": lo, "max_mbps": round(min(lo * rng.uniform(1, 3), BW_MAX), 3)},
+            "priority": {"level": rng.choices(LEVELS, LEVEL_WEIGHTS)[0]},
+        }
+        if rng.random() < 0.7:
+            req["latency"] = {"max_ms": rng.choice(LATENCIES_MS), "percentile": "P99"}
+        if rng.random() < mc_ratio:
+            req["multicast"] = {"enabled": True, "group_id": f"G{rng.randrange(max(1, flows // 20))}"}
+        doc = {
+            "l2i_version": "0.1",
+            "tenant": f"tenant{i % max(1, tenants)}",
+            "scope": f"scope{rng.randrange(max(1, scopes))}",
+            "flow": {"id": f"flow{i}"},
+            "requirements": req,
+        }
+        if target_profile:
+            doc["target_profile"] = target_profile
+        yield doc
+
+
+def gen_profiles(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        mode = rng.choice(("none", "vlan_flood", "l2mc_static"))
+        mc: Dict[str, Any] = {"mode": mode}
+        if mode != "none":
+            mc.update(max_groups=rng.choice((64, 128, 512, 1024)),
+                      max_replications_per_group=rng.choice((16, 32, 64, 128)))
+        speed = rng.choice((100, 1000, 10000))
+        out.append({
+            "profile_id": f"synth-{i}",
+            "description": "perfil sintético (gen_specs.py)",
+            "queues": {"max_queues": rng.choice((1, 2, 4, 8)), "modes": {
+                "strict": True,
+                "wfq": {"supported": rng.random() < 0.8, "weights_min": 1, "weights_max": rng.choice((16, 64, 100))}}},
+            "meters": {"supported": True, "types": rng.sample(["tbf", "trtcm"], rng.randint(1, 2)),
+                       "min_rate_mbps": 1, "max_rate_mbps": speed},
+            "multicast": mc,
+            "ports": [{"name": f"p{j}", "speed_mbps": speed} for j in range(rng.randint(1, 4))],
+            "atomic_commit": rng.random() < 0.5,
+            "telemetry": {"rtt_percentile": True, "throughput_sustained": True,
+                          "queue_occupancy": rng.random() < 0.5, "delivery_ratio": False},
+        })
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Gerador de specs L2I-v0 e perfis sintéticos")
+    ap.add_argument("--flows", type=int, default=1000)
+    ap.add_argument("--tenants", type=int, default=10)
+    ap.add_argument("--scopes", type=int, default=4, help="scopes distintos por tenant (default: 4)")
+    ap.add_argument("--mc-ratio", type=float, default=0.1, help="fração de fluxos multicast (default: 0.1)")
+    ap.add_argument("--bw", default="uniform:1:100", help="distribuição de min_mbps (default: uniform:1:100)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--target-profile", default="", help="target_profile gravado em cada spec")
+    ap.add_argument("--profiles", type=int, default=0, help="perfis sintéticos a gerar")
+    ap.add_argument("--profiles-dir", default=None, help="onde gravar os perfis (synth-N.json)")
+    args = ap.parse_args()
+
+    out = sys.stdout
+    for doc in gen_specs(args.flows, args.tenants, args.mc_ratio, args.bw, args.seed, args.scopes,
+                         args.target_profile):
+        out.write(json.dumps(doc, separators=(",", ":")) + "\n")
+    if args.profiles and args.profiles_dir:
+        d = Path(args.profiles_dir)
+        d.mkdir(parents=True, exist_ok=True)
+        for p in gen_profiles(args.profiles, args.seed):
+            (d / f"{p['profile_id']}.json").write_text(json.dumps(p, indent=2) + "\n", encoding="utf-8")
+        print(f"[gen] {args.profiles} perfis em {d}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,16 @@
 #!/usr/bin/env python3
-import argparse, ipaddress, sys
+"""
+Instala a regra DSCP do cenário S1 no switch P4 (l2i_minimal), pelo canal
+persistente de p4rt_client.py (manager().client): o pipeline só é enviado se
+o cookie do device for outro, e a regra vai num único RPC Write.
+"""
+import argparse, json, sys
 from pathlib import Path
 
-try:
-    import p4runtime_sh.shell as sh
-except Exception as e:
-    sys.stderr.write("ERRO: p4runtime_sh ausente. Instale via pipx.\n")
-    sys.exit(1)
+BASE = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE))
 
-def to_u32(ip):
-    return int(ipaddress.ip_address(ip))
+from p4rt_client import manager  # noqa: E402
 
 def main():
     ap = argparse.ArgumentParser()
@@ -17,32 +18,32 @@ def main():
     ap.add_argument("--device-id", type=int, default=0)
     ap.add_argument("--outdir", default="/tmp/l2i_minimal")
 
-    # Fluxo padrão dos seus testes (H1->H3, UDP/5001)
-    ap.add_argument("--src", default="10.0.0.1")
+    # Fluxo padrão dos seus testes (H1->H3, UDP/5001); a qos_table do
+    # l2i_minimal casa só o destino (lpm hdr.ipv4.dstAddr)
     ap.add_argument("--dst", default="10.0.0.3")
-    ap.add_argument("--dport", type=int, default=5001)
     ap.add_argument("--dscp", type=int, default=0x28)  # DSCP=40 (AF41). Ajuste se quiser.
+    ap.add_argument("--table", default="qos_table")
+    ap.add_argument("--action", default="set_dscp")
 
     args = ap.parse_args()
 
-    sh.setup(device_id=args.device_id, grpc_addr=args.addr, election_id=(0,1))
-    sh.load_p4info(str(Path(args.outdir) / "l2i_minimal.p4info.txt"))
-    sh.set_fwd_pipe(str(Path(args.outdir) / "l2i_minimal.json"))
-
-    p4 = sh.P4Objects()
-
-    tbl = p4.get_table("tbl_set_dscp")
-    act = p4.get_action("set_dscp")
-
-    key = tbl.make_key([
-        ("hdr.ipv4.srcAddr", to_u32(args.src)),
-        ("hdr.ipv4.dstAddr", to_u32(args.dst)),
-        ("hdr.udp.dstPort",  args.dport),
-    ])
-    data = act.make_data([("new_dscp", args.dscp)])
-    tbl.entry_add([ (key, data) ])
-
-    print("[ok] regra DSCP instalada para {}:{} -> {} dport {}".format(args.src, "", args.dst, args.dport))
+    p4info = str(Path(args.outdir) / "l2i_minimal.p4info.txt")
+    try:
+        client = manager().client(args.addr, args.device_id, p4info=p4info)
+        push = client.push_pipeline(p4info, str(Path(args.outdir) / "l2i_minimal.json"))
+        res = client.write_updates([{"type": "INSERT", "entity": {"table_entry": {
+            "table": args.table,
+            "match": [{"field": "hdr.ipv4.dstAddr", "lpm": f"{args.dst}/32"}],
+            "action": {"name": args.action, "params": {"new_dscp": args.dscp}}}}}])
+    except Exception as e:  # noqa: BLE001 (P4RTError, RpcError do gRPC, arquivos)
+        sys.stderr.write(f"ERRO: {e}\n")
+        sys.exit(1)
+    if res["skipped"]:
+        sys.stderr.write(f"ERRO: {json.dumps(res['skipped'], ensure_ascii=False)}\n")
+        sys.exit(1)
+
+    print(f"[ok] pipeline {push['action']} (cookie {push['cookie']})")
+    print(f"[ok] regra DSCP {args.dscp} instalada para -> {args.dst} ({res['write_ms']} ms)")
 
 if __name__ == "__main__":
     main()
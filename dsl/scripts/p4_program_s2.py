@@ -1,15 +1,17 @@
 #!/usr/bin/env python3
-import argparse, ipaddress, sys
+"""
+Programa o multicast do cenário S2 no switch P4 (l2i_minimal), pelo canal
+persistente de p4rt_client.py (manager().client): grupo do PRE + regra
+dstIP → grupo num único RPC Write; o pipeline só é enviado se o cookie do
+device for outro.
+"""
+import argparse, json, sys
 from pathlib import Path
 
-try:
-    import p4runtime_sh.shell as sh
-except Exception as e:
-    sys.stderr.write("ERRO: p4runtime_sh ausente. Instale via pipx.\n")
-    sys.exit(1)
+BASE = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE))
 
-def to_u32(ip):
-    return int(ipaddress.ip_address(ip))
+from p4rt_client import manager  # noqa: E402
 
 def main():
     ap = argparse.ArgumentParser()
@@ -21,28 +23,37 @@ def main():
     ap.add_argument("--mgrp", type=int, default=1)
     ap.add_argument("--dst-mcast", default="239.1.1.1")
     ap.add_argument("--ports", type=int, nargs="+", default=[0,1])  # replicar em veth0 e veth1
+    ap.add_argument("--table", default="mcast_table")
+    ap.add_argument("--action", default="set_mcast_group")
 
     args = ap.parse_args()
 
-    sh.setup(device_id=args.device_id, grpc_addr=args.addr, election_id=(0,1))
-    sh.load_p4info(str(Path(args.outdir) / "l2i_minimal.p4info.txt"))
-    sh.set_fwd_pipe(str(Path(args.outdir) / "l2i_minimal.json"))
-
-    # 1) PRE: criar MulticastGroupEntry (mgrp -> replicas)
-    # p4runtime_sh fornece helper:
-    sh.create_multicast_group(args.mgrp, args.ports)
+    p4info = str(Path(args.outdir) / "l2i_minimal.p4info.txt")
+    updates = [
+        # 1) PRE: MulticastGroupEntry (mgrp -> réplicas)
+        {"type": "INSERT", "entity": {"packet_replication_engine_entry": {"multicast_group_entry": {
+            "multicast_group_id": args.mgrp,
+            "replicas": [{"egress_port": p, "instance": 1} for p in args.ports]}}}},
+        # 2) Tabela de roteamento multicast: dstIP -> mgrp
+        {"type": "INSERT", "entity": {"table_entry": {
+            "table": args.table,
+            "match": [{"field": "hdr.ipv4.dstAddr", "lpm": f"{args.dst_mcast}/32"}],
+            "action": {"name": args.action, "params": {"grp": args.mgrp}}}}},
+    ]
+    try:
+        client = manager().client(args.addr, args.device_id, p4info=p4info)
+        push = client.push_pipeline(p4info, str(Path(args.outdir) / "l2i_minimal.json"))
+        res = client.write_updates(updates)
+    except Exception as e:  # noqa: BLE001 (P4RTError, RpcError do gRPC, arquivos)
+        sys.stderr.write(f"ERRO: {e}\n")
+        sys.exit(1)
+    if res["skipped"]:
+        sys.stderr.write(f"ERRO: {json.dumps(res['skipped'], ensure_ascii=False)}\n")
+        sys.exit(1)
+
+    print(f"[ok] pipeline {push['action']} (cookie {push['cookie']})")
     print(f"[ok] multicast group {args.mgrp} com ports {args.ports}")
-
-    # 2) Tabela de roteamento multicast: dstIP -> mgrp
-    p4 = sh.P4Objects()
-    tbl = p4.get_table("tbl_route_mcast")
-    act = p4.get_action("set_mcast")
-
-    key = tbl.make_key([ ("hdr.ipv4.dstAddr", to_u32(args.dst_mcast)) ])
-    data = act.make_data([ ("grp", args.mgrp) ])
-    tbl.entry_add([ (key, data) ])
-
-    print(f"[ok] regra mcast: {args.dst_mcast} -> mgrp {args.mgrp}")
+    print(f"[ok] regra mcast: {args.dst_mcast} -> mgrp {args.mgrp} ({res['write_ms']} ms)")
 
 if __name__ == "__main__":
     main()
@@ -2,21 +2,27 @@
 """
 Empurra o pipeline P4 (P4Runtime) para o simple_switch_grpc rodando em 127.0.0.1:PORTA.
 
-Compatível com p4runtime-shell instalado via pip no venv, em que:
-    FwdPipeConfig é chamado com argumentos POSICIONAIS:
-        FwdPipeConfig(<p4info_path>, <bmv2_json_path>)
+Usa o canal de p4rt_client.py: o pipeline (p4info + JSON bmv2) é marcado com
+um cookie (hash do conteúdo). Antes de enviar, lê o cookie do device com
+GetForwardingPipelineConfig(COOKIE_ONLY); se for o mesmo, o push (que
+reinicia o estado do switch e leva segundos) é pulado. --force envia sempre.
+O JSON de saída diz "action": "pushed" ou "skipped".
 """
 
 import argparse
 import json
-import os
 import sys
+import time
 from pathlib import Path
 
+BASE = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE))
+
+from p4rt_client import P4RuntimeClient, P4RTError  # noqa: E402
 
 def main():
     parser = argparse.ArgumentParser(
-        description="Carrega pipeline P4 no simple_switch_grpc via p4runtime-shell"
+        description="Carrega pipeline P4 no simple_switch_grpc via P4Runtime (pula se o cookie bate)"
     )
     parser.add_argument(
         "--addr",
@@ -40,6 +46,11 @@ def main():
         default="/tmp/l2i_minimal/l2i_minimal.json",
         help="caminho do JSON bmv2 (default: /tmp/l2i_minimal/l2i_minimal.json)",
     )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="envia o pipeline mesmo se o cookie do device for igual",
+    )
     args = parser.parse_args()
 
     p4info_path = Path(args.p4info)
@@ -50,6 +61,7 @@ def main():
         "device_id": args.device_id,
         "connected": False,
         "pipeline_loaded": False,
+        "action": None,
         "p4info": str(p4info_path),
         "bmv2_json": str(bmv2_json_path),
         "error": None,
@@ -66,51 +78,24 @@ def main():
         print(json.dumps(result, indent=2))
         sys.exit(1)
 
-    # 2) Importa p4runtime-shell a partir do venv
+    # 2) Conecta (mastership) e envia o pipeline só se o cookie do device difere
+    t0 = time.perf_counter()
+    client = P4RuntimeClient(args.addr, args.device_id, election_id=(0, 1))
     try:
-        import p4runtime_sh.shell as sh
-    except ImportError as e:
-        result["error"] = f"módulo p4runtime_sh não encontrado no venv: {e}"
-        print(json.dumps(result, indent=2))
-        sys.exit(1)
-
-    # 3) Usa FwdPipeConfig POSICIONAL (sem p4info_path=..., bmv2_json_path=...)
-    try:
-        FwdPipeConfig = sh.FwdPipeConfig
-    except AttributeError as e:
-        result["error"] = f"FwdPipeConfig não encontrado em p4runtime_sh.shell: {e}"
-        print(json.dumps(result, indent=2))
-        sys.exit(1)
-
-    try:
-        cfg = FwdPipeConfig(str(p4info_path), str(bmv2_json_path))
-    except TypeError as e:
-        # Aqui capturamos exatamente casos como:
-        #   FwdPipeConfig.__new__() got an unexpected keyword argument ...
-        result["error"] = f"Falha ao instanciar FwdPipeConfig (verifique versão da lib): {e}"
-        print(json.dumps(result, indent=2))
-        sys.exit(1)
-
-    # 4) Faz setup → se não der exceção, consideramos conectado+pipeline carregado
-    try:
-        sh.setup(
-            device_id=args.device_id,
-            grpc_addr=args.addr,
-            election_id=(0, 1),
-            config=cfg,
-        )
+        client.connect()
         result["connected"] = True
+        result.update(client.push_pipeline(str(p4info_path), str(bmv2_json_path), force=args.force))
         result["pipeline_loaded"] = True
+    except P4RTError as e:
+        result["error"] = str(e)
     except Exception as e:  # noqa: BLE001
-        result["error"] = f"Falha no setup P4Runtime: {e}"
+        result["error"] = f"Falha no push P4Runtime: {e}"
+    finally:
+        client.close()
+    result["elapsed_ms"] = round((time.perf_counter() - t0) * 1000.0, 3)
+    if result["error"]:
         print(json.dumps(result, indent=2))
         sys.exit(1)
-    finally:
-        try:
-            sh.teardown()
-        except Exception:
-            # se teardown falhar, não é crítico para nosso resumo
-            pass
 
     print(json.dumps(result, indent=2))
 
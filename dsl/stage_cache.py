@@ -0,0 +1,274 @@
+"""
+stage_cache.py — cache endereçado por conteúdo para os estágios do e2e_pipeline.
+
+Cada estágio (validate → policies → capabilities → compose → synth) é
+identificado por (nome, versão do estágio, impressão digital do código que o
+implementa — o pacote inteiro: versão + hash de todos os .py —, hash canônico
+das entradas). Como a entrada de um estágio é a saída do anterior, editar um
+requisito só reexecuta os estágios a jusante cuja entrada de fato mudou; o
+perfil entra no hash apenas dos estágios que o recebem (capabilities, synth). Entrada sem forma canônica (objeto sem
+to_json_dict/__dict__, cujo repr traria endereço de memória) não é cacheada:
+o estágio roda direto.
+
+Dois níveis:
+  - memória: LRU limitado (OrderedDict), por processo;
+  - disco (opcional): um pickle por chave em <cache_dir>/<ab>/<hash>.pkl,
+    compartilhado entre processos (os sweeps sobem um interpretador por ponto).
+    O diretório é 0700 do usuário (senão o nível em disco fica desligado) e
+    cada arquivo leva um HMAC-SHA256 (chave aleatória em <cache_dir>/hmac.key,
+    0600) conferido antes do pickle.loads.
+
+Os valores são guardados serializados, de modo que o chamador sempre recebe
+uma cópia nova e não consegue corromper o cache mutando o resultado.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import json
+import os
+import pickle
+import secrets
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Incrementar quando a semântica de um estágio mudar sem mudança de código
+# detectável (ex.: regra nova carregada de fora do módulo).
+STAGE_VERSIONS: Dict[str, int] = {
+    "validate": 1,
+    "policies": 1,
+    "capabilities": 1,
+    "compose": 1,
+    "synth": 1,
+}
+
+_MISSING = object()
+_MAC_LEN = 32
+
+
+class Uncacheable(TypeError):
+    pass
+
+
+def _canon_default(o: Any) -> Any:
+    fields = getattr(type(o), "__dataclass_fields__", None)
+    if fields is not None:
+        return {f: getattr(o, f) for f in fields}
+    if isinstance(o, (set, frozenset)):
+        return sorted(o, key=repr)
+    if hasattr(o, "to_json_dict"):
+        return o.to_json_dict()
+    if hasattr(o, "__dict__"):
+        return vars(o)
+    # repr() traria o endereço do objeto: a chave mudaria a cada execução
+    raise Uncacheable(f"sem forma canônica: {type(o).__name__}")
+
+
+def canonical_json(obj: Any) -> str:
+    """JSON determinístico (chaves ordenadas, sem espaços) usado nos hashes."""
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"),
+                      ensure_ascii=False, default=_canon_default)
+
+
+def canonical_hash(obj: Any) -> str:
+    return hashlib.sha256(canonical_json(obj).encode("utf-8")).hexdigest()
+
+
+_fingerprints: Dict[Any, str] = {}
+
+
+def _package_fingerprint(top: str) -> Optional[str]:
+    # versão do pacote + (caminho, sha256) de cada .py: mudar um helper
+    # importado pelo estágio também invalida as chaves
+    import sys
+    pkg = sys.modules.get(top)
+    paths = list(getattr(pkg, "__path__", None) or [])
+    if not paths:
+        return None
+    h = hashlib.sha256(str(getattr(pkg, "__version__", "")).encode("utf-8"))
+    try:
+        from importlib.metadata import PackageNotFoundError, version
+        try:
+            h.update(version(top).encode("utf-8"))
+        except PackageNotFoundError:
+            pass
+    except ImportError:
+        pass
+    for base in paths:
+        for f in sorted(Path(base).rglob("*.py")):
+            h.update(str(f.relative_to(base)).encode("utf-8") + b"\x00")
+            h.update(hashlib.sha256(f.read_bytes()).digest())
+    return h.hexdigest()[:16]
+
+
+def code_fingerprint(fn: Callable) -> str:
+    """
+    Hash do código de `fn` (memoizado por processo): o pacote inteiro a que o
+    módulo pertence, ou só o arquivo-fonte se for um módulo solto.
+    """
+    mod = getattr(fn, "__module__", None) or repr(fn)
+    top = mod.partition(".")[0]
+    fp = _fingerprints.get(top) or _fingerprints.get(mod)
+    if fp is not None:
+        return fp
+    try:
+        fp = _package_fingerprint(top)
+    except OSError:
+        fp = None
+    if fp is not None:
+        _fingerprints[top] = fp
+        return fp
+    import inspect  # só quando o cache é usado; custa ~10 ms no startup
+    try:
+        src = inspect.getsourcefile(fn)
+        with open(src, "rb") as f:
+            fp = hashlib.sha256(f.read()).hexdigest()[:16]
+    except (TypeError, OSError):
+        fp = mod
+    _fingerprints[mod] = fp
+    return fp
+
+
+def _private(path: Path) -> bool:
+    st = path.stat()
+    if hasattr(os, "getuid") and st.st_uid != os.getuid():
+        return False
+    return not st.st_mode & 0o077
+
+
+class StageCache:
+    """LRU em memória + nível opcional em disco, chaveado por conteúdo."""
+
+    def __init__(self, max_entries: int = 1024, cache_dir: Optional[str] = None):
+        self.max_entries = max(1, int(max_entries))
+        self._mem: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()  # o daemon compartilha o cache entre threads
+        self.stats = {"hits_mem": 0, "hits_disk": 0, "misses": 0, "evictions": 0,
+                      "uncacheable": 0, "bad_mac": 0}
+        self.cache_dir: Optional[Path] = None
+        self.disk_error: Optional[str] = None
+        self._mac_key = b""
+        if cache_dir:
+            try:
+                self._open_dir(Path(cache_dir))
+            except OSError as e:
+                self.disk_error = f"{cache_dir}: {e}"
+
+    def _open_dir(self, d: Path) -> None:
+        d.mkdir(mode=0o700, parents=True, exist_ok=True)
+        st = d.stat()
+        if hasattr(os, "getuid") and st.st_uid != os.getuid():
+            raise PermissionError("diretório de cache de outro usuário; nível em disco desligado")
+        if st.st_mode & 0o077:
+            os.chmod(d, 0o700)
+        kp = d / "hmac.key"
+        try:
+            fd = os.open(kp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            if not _private(kp):
+                raise PermissionError(f"{kp} não é privado; nível em disco desligado")
+            key = kp.read_bytes()
+        else:
+            key = secrets.token_bytes(32)
+            with os.fdopen(fd, "wb") as f:
+                f.write(key)
+        if len(key) < 16:
+            raise PermissionError(f"{kp} inválido; nível em disco desligado")
+        self._mac_key = key
+        self.cache_dir = d
+
+    def _mac(self, blob: bytes) -> bytes:
+        return hmac.new(self._mac_key, blob, hashlib.sha256).digest()
+
+    # ------------------------- chaves -------------------------
+
+    def key(self, stage: str, fn: Callable, args: Tuple[Any, ...]) -> str:
+        head = f"{stage}:{STAGE_VERSIONS.get(stage, 0)}:{code_fingerprint(fn)}"
+        h = hashlib.sha256(head.encode("utf-8"))
+        for a in args:
+            h.update(b"\x00")
+            h.update(canonical_hash(a).encode("ascii"))
+        return h.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        assert self.cache_dir is not None
+        return self.cache_dir / key[:2] / f"{key}.pkl"
+
+    # ------------------------- níveis -------------------------
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            blob = self._mem.get(key)
+            if blob is not None:
+                self._mem.move_to_end(key)
+                self.stats["hits_mem"] += 1
+        if blob is not None:
+            return pickle.loads(blob)
+        if self.cache_dir is not None:
+            try:
+                data = self._path(key).read_bytes()
+                blob = data[_MAC_LEN:]
+                if not hmac.compare_digest(data[:_MAC_LEN], self._mac(blob)):
+                    with self._lock:
+                        self.stats["bad_mac"] += 1
+                    raise OSError("HMAC não confere")
+                value = pickle.loads(blob)
+            except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+                pass
+            else:
+                self._remember(key, blob)
+                with self._lock:
+                    self.stats["hits_disk"] += 1
+                return value
+        with self._lock:
+            self.stats["misses"] += 1
+        return _MISSING
+
+    def put(self, key: str, value: Any) -> None:
+        try:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return  # valor não serializável: simplesmente não cacheia
+        self._remember(key, blob)
+        if self.cache_dir is not None:
+            p = self._path(key)
+            try:
+                p.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+                tmp = p.with_suffix(f".tmp{os.getpid()}.{threading.get_ident()}")
+                fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                with os.fdopen(fd, "wb") as f:
+                    f.write(self._mac(blob) + blob)
+                os.replace(tmp, p)
+            except OSError:
+                pass
+
+    def _remember(self, key: str, blob: bytes) -> None:
+        with self._lock:
+            self._mem[key] = blob
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.max_entries:
+                self._mem.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+
+    # ------------------------- execução -------------------------
+
+    def run(self, stage: str, fn: Callable, *args: Any) -> Any:
+        """Executa `fn(*args)` ou devolve o resultado memoizado do estágio."""
+        try:
+            k = self.key(stage, fn, args)
+        except Uncacheable:
+            with self._lock:
+                self.stats["uncacheable"] += 1
+            return fn(*args)
+        value = self.get(k)
+        if value is _MISSING:
+            value = fn(*args)
+            self.put(k, value)
+        return value
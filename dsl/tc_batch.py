@@ -0,0 +1,264 @@
+"""
+tc_batch.py — aplica a configuração HTB de um plano (domínio A) num único `tc -batch -`.
+
+Um processo `tc` por comando (qdisc raiz 1:, classe do enlace 1:1, filas
+1:(10+qid), filtros u32) faz o fork/exec dominar o tempo de apply quando há
+centenas de classes. Aqui:
+
+  - render_batch(): as linhas do plano (ou do delta desde o último plano) no
+    formato do `tc -batch` — tc_class_line / tc_filter_line de plan_delta —,
+    cada uma ligada ao Change (tipo, chave) que a gerou;
+  - um só processo `tc [-force] -batch -` lê tudo pelo stdin;
+  - os erros ("RTNETLINK answers: ..." / "Error: ..." seguidos de
+    "Command failed -:N") voltam para a linha N e dela para o elemento do
+    plano (fila qid, classificador cid);
+  - tudo ou nada para o operador: se alguma linha falha, as que já tinham
+    sido aplicadas são desfeitas (mudanças inversas, do fim para o começo,
+    num segundo batch com -force). Sem -force o tc para na primeira falha;
+    com -force segue, e o rollback desfaz só as que passaram. Se o tc sai
+    com erro sem dizer a linha, qualquer uma pode ter sido aplicada: o
+    rollback desfaz todas (applied = None, desconhecido);
+  - reset=True recria a hierarquia: o `qdisc del root` vai no mesmo batch
+    (com erro rastreado como as outras linhas) e exige o plano anterior
+    (prev), cuja configuração completa é o inverso do reset no rollback —
+    um apply que falha nunca deixa o device sem qdisc.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import re
+import subprocess
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from plan_ir import as_ir
+from plan_delta import (HTB_LINK_CLASS, Change, diff_plans, tc_changes, tc_class_line, tc_filter_line,
+                        tc_link_class_line)
+
+_FAILED = re.compile(r"^Command failed (\S+):(\d+)\s*$")
+_INVERSE = {"add": "delete", "delete": "add", "modify": "modify"}
+
+
+class TcBatchError(ValueError):
+    pass
+
+
+class TcLine:
+    # base: "qdisc" (root htb 1:), "link" (classe 1:1) ou "reset" (del root) —
+    # estrutura fixa, sem Change; undo: linhas que desfazem esta (o reset)
+    __slots__ = ("text", "change", "base", "undo")
+
+    def __init__(self, text: str, change: Optional[Change] = None, base: Optional[str] = None,
+                 undo: Optional[List["TcLine"]] = None):
+        self.text = text; self.change = change; self.base = base; self.undo = undo
+
+    @property
+    def root(self) -> bool:
+        return self.base == "qdisc"
+
+    def to_json_dict(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"cmd": self.text}
+        if self.change is not None:
+            out.update(kind=self.change.kind, op=self.change.op, key=self.change.key)
+        elif self.base == "qdisc":
+            out.update(kind="qdisc", op="add", key="root")
+        elif self.base == "link":
+            out.update(kind="class", op="add", key=HTB_LINK_CLASS)
+        elif self.base == "reset":
+            out.update(kind="qdisc", op="delete", key="root")
+        return out
+
+
+def _line(c: Change, dev: str) -> Optional[str]:
+    if c.kind == "queue":
+        return tc_class_line(c.op, dev, c.elem)
+    if c.kind == "classifier":
+        return tc_filter_line(c.op, dev, c.elem)
+    return None   # meters e grupos multicast não existem no HTB
+
+
+def render_changes(changes: Sequence[Change], dev: str) -> List[TcLine]:
+    # classificador modificado: del + add, cada linha com o seu Change (ver tc_changes)
+    return [TcLine(text, t) for c in changes for t in tc_changes(c) for text in (_line(t, dev),) if text]
+
+
+def default_link_mbps(plan: Any) -> float:
+    # sem a taxa do enlace: a soma dos tetos das filas (HTB não empresta acima do pai)
+    return sum(q.max_mbps or q.min_mbps for q in as_ir(plan).queues) or 1000.0
+
+
+def render_batch(plan: Any, dev: str, prev: Any = None, link_mbps: Optional[float] = None,
+                 reset: bool = False) -> List[TcLine]:
+    """
+    Linhas do batch: prev=None → configuração completa (qdisc raiz 1:, classe
+    do enlace 1:1 a `link_mbps` e tudo; se já houver qdisc raiz a 1ª linha
+    falha e nada muda); senão só o delta prev → plan, sobre a hierarquia que
+    já existe. reset=True: `qdisc del root` + configuração completa, com a
+    configuração de prev como rollback do del (TcBatchError sem prev).
+    """
+    if reset:
+        if prev is None:
+            raise TcBatchError(f"{dev}: reset sem o plano anterior (prev) não teria como restaurar o device")
+        undo = render_batch(prev, dev, None, link_mbps)
+        return [TcLine(f"qdisc del dev {dev} root", base="reset", undo=undo)] + render_batch(plan, dev, None, link_mbps)
+    lines = [] if prev is not None else [
+        TcLine(f"qdisc add dev {dev} root handle 1: htb", base="qdisc"),
+        TcLine(tc_link_class_line(dev, link_mbps or default_link_mbps(plan)), base="link")]
+    return lines + render_changes(diff_plans(prev, plan), dev)
+
+
+def invert(lines: Sequence[TcLine], dev: str) -> List[TcLine]:
+    """
+    Linhas que desfazem `lines` (ordem reversa): add ↔ delete, modify volta ao
+    antigo (classificador: del + add, como em render_changes), o reset volta
+    à configuração anterior.
+    """
+    out: List[TcLine] = []
+    for ln in reversed(lines):
+        if ln.undo is not None:
+            out.extend(ln.undo)
+            continue
+        if ln.root:
+            out.append(TcLine(f"qdisc del dev {dev} root"))
+            continue
+        if ln.change is None:
+            continue   # a classe do enlace sai com a qdisc raiz
+        c = ln.change
+        out.extend(render_changes([Change(_INVERSE[c.op], c.kind, c.key, old=c.new, new=c.old)], dev))
+    return out
+
+
+def parse_errors(stderr: str, lines: Sequence[TcLine]) -> List[Dict[str, Any]]:
+    """'Command failed -:N' → {line, msg, cmd, kind, op, key} (msg = o que o tc disse antes)."""
+    errors, msg = [], []
+    for raw in stderr.splitlines():
+        m = _FAILED.match(raw.strip())
+        if m is None:
+            if raw.strip():
+                msg.append(raw.strip())
+            continue
+        n = int(m.group(2))
+        err: Dict[str, Any] = {"line": n, "msg": "; ".join(msg) or "falhou"}
+        if 0 < n <= len(lines):
+            err.update(lines[n - 1].to_json_dict())
+        errors.append(err)
+        msg = []
+    return errors
+
+
+class BatchResult:
+    __slots__ = ("ok", "lines", "errors", "applied", "ms", "rolled_back", "rollback_errors", "rc")
+
+    def __init__(self, lines: Sequence[TcLine]):
+        self.lines = list(lines)
+        self.ok = False
+        self.errors: List[Dict[str, Any]] = []
+        self.applied: Optional[int] = 0     # None: o tc falhou sem dizer em que linha
+        self.ms = 0.0
+        self.rolled_back = False
+        self.rollback_errors: List[Dict[str, Any]] = []
+        self.rc: Optional[int] = None
+
+    def to_json_dict(self) -> Dict[str, Any]:
+        out = {"ok": self.ok, "commands": len(self.lines), "applied": self.applied,
+               "ms": round(self.ms, 3), "rc": self.rc}
+        if self.errors:
+            out["errors"] = self.errors
+            out["rolled_back"] = self.rolled_back
+        if self.rollback_errors:
+            out["rollback_errors"] = self.rollback_errors
+        return out
+
+
+class TcBatch:
+    def __init__(self, dev: str, force: bool = False, tc: Sequence[str] = ("tc",), rollback: bool = True):
+        self.dev = dev
+        self.force = force
+        self.tc = list(tc)          # ex.: ("sudo", "tc") ou ("ip", "netns", "exec", "h1", "tc")
+        self.rollback = rollback
+
+    def argv(self, force: bool) -> List[str]:
+        return self.tc + (["-force"] if force else []) + ["-batch", "-"]
+
+    @staticmethod
+    def script(lines: Sequence[TcLine]) -> bytes:
+        return "".join(ln.text + "\n" for ln in lines).encode("utf-8")
+
+    def _settle(self, res: BatchResult, rc: int, stderr: str) -> List[TcLine]:
+        """
+        Preenche o resultado; devolve as linhas que podem ter sido aplicadas (a
+        desfazer se falhou) — todas, quando o tc não diz onde parou.
+        """
+        res.rc = rc
+        res.errors = parse_errors(stderr, res.lines)
+        if rc != 0 and not res.errors:
+            res.errors = [{"line": None, "msg": stderr.strip() or f"tc saiu com {rc}"}]
+        failed = {e["line"] for e in res.errors}
+        if None in failed:
+            # ponto de falha desconhecido: o rollback (-force) desfaz tudo, e o
+            # que não chegou a ser aplicado só falha no inverso
+            res.applied = None
+            res.ok = False
+            return list(res.lines)
+        if self.force:
+            done: List[TcLine] = [ln for n, ln in enumerate(res.lines, 1) if n not in failed]
+        else:
+            done = res.lines[:min(failed) - 1] if failed else res.lines
+        res.applied = len(done)
+        res.ok = not res.errors
+        return done
+
+    def _rollback_lines(self, res: BatchResult, done: List[TcLine]) -> List[TcLine]:
+        if res.ok or not self.rollback or not done:
+            return []
+        return invert(done, self.dev)
+
+    # ------------------------- síncrono -------------------------
+
+    def _run(self, lines: Sequence[TcLine], force: bool) -> Tuple[int, str]:
+        p = subprocess.run(self.argv(force), input=self.script(lines),
+                           stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        return p.returncode, p.stderr.decode("utf-8", "replace")
+
+    def apply_lines(self, lines: Sequence[TcLine]) -> BatchResult:
+        res = BatchResult(lines)
+        t0 = time.perf_counter()
+        done = self._settle(res, *self._run(res.lines, self.force))
+        undo = self._rollback_lines(res, done)
+        if undo:
+            rc, err = self._run(undo, True)
+            res.rolled_back = True
+            res.rollback_errors = parse_errors(err, undo)
+        res.ms = (time.perf_counter() - t0) * 1000.0
+        return res
+
+    def apply(self, plan: Any, prev: Any = None, reset: bool = False,
+              link_mbps: Optional[float] = None) -> BatchResult:
+        """prev=None aplica o plano inteiro; prev + reset=True recria a hierarquia (ver render_batch)."""
+        return self.apply_lines(render_batch(plan, self.dev, prev, link_mbps, reset))
+
+    # ------------------------- asyncio -------------------------
+
+    async def _run_async(self, lines: Sequence[TcLine], force: bool) -> Tuple[int, str]:
+        proc = await asyncio.create_subprocess_exec(
+            *self.argv(force), stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE)
+        _, err = await proc.communicate(self.script(lines))
+        return proc.returncode, err.decode("utf-8", "replace")
+
+    async def apply_lines_async(self, lines: Sequence[TcLine]) -> BatchResult:
+        res = BatchResult(lines)
+        t0 = time.perf_counter()
+        done = self._settle(res, *await self._run_async(res.lines, self.force))
+        undo = self._rollback_lines(res, done)
+        if undo:
+            rc, err = await self._run_async(undo, True)
+            res.rolled_back = True
+            res.rollback_errors = parse_errors(err, undo)
+        res.ms = (time.perf_counter() - t0) * 1000.0
+        return res
+
+    async def apply_async(self, plan: Any, prev: Any = None, reset: bool = False,
+                          link_mbps: Optional[float] = None) -> BatchResult:
+        return await self.apply_lines_async(render_batch(plan, self.dev, prev, link_mbps, reset))
@@ -0,0 +1,41 @@
+"""
+Os testes importam os módulos de dsl/ direto (como cli.py e scripts/), sem o
+pacote l2i: só o que roda em lote/IR, fora do pipeline por spec.
+"""
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+BASE = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE))
+
+
+def v0_spec(flow_id, tenant="t", scope="s", min_mbps=0.0, max_mbps=None, priority="medium",
+            latency_ms=None, group=None, port=None):
+    """Spec L2I-v0 mínimo (o formato de specs/valid/t0*.json)."""
+    req = {"priority": {"level": priority}}
+    bw = {"min_mbps": min_mbps}
+    if max_mbps is not None:
+        bw["max_mbps"] = max_mbps
+    req["bandwidth"] = bw
+    if latency_ms is not None:
+        req["latency"] = {"max_ms": latency_ms}
+    if group is not None:
+        req["multicast"] = {"enabled": True, "group_id": group}
+    doc = {"l2i_version": "0.1", "tenant": tenant, "scope": scope, "flow": {"id": flow_id},
+           "requirements": req}
+    if port is not None:
+        doc["port"] = port
+    return doc
+
+
+@pytest.fixture
+def spec():
+    return v0_spec
+
+
+@pytest.fixture
+def valid_specs():
+    return [json.loads(p.read_text(encoding="utf-8")) for p in sorted((BASE / "specs" / "valid").glob("t0*.json"))]
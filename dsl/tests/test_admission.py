@@ -0,0 +1,64 @@
+import threading
+
+from admission import Ledger, env_capacity
+
+
+def test_env_capacity_only_reads_bw_variables():
+    env = {"BW_A_MBPS": "100", "BW_A-B_MBPS": "40", "bwrap": "1", "BW_C_MBPS": "x", "BW_D_MBPS": ""}
+    assert env_capacity(env) == {"A": 100.0, "A-B": 40.0}
+
+
+def test_admit_reserves_and_refuses_with_counter_offer(spec):
+    led = Ledger(capacity_mbps={"A": 10.0})
+    assert led.admit(spec("f1", min_mbps=6), resources=["A"]).admitted
+    d = led.admit(spec("f2", min_mbps=6), resources=["A"])
+    assert not d.admitted
+    assert [m.code for m in d.msgs] == ["E_ADMIT_CAPACITY"]
+    assert d.offer["min_mbps"] == 4.0
+    assert led.free("A") == 4.0
+
+
+def test_resubmitting_a_key_replaces_its_reservation(spec):
+    led = Ledger(capacity_mbps={"A": 10.0})
+    led.admit(spec("f1", min_mbps=6), resources=["A"])
+    assert led.admit(spec("f1", min_mbps=9), resources=["A"]).admitted
+    assert led.reserved("A") == 9.0 and len(led) == 1
+
+
+def test_preemption_offer_counts_only_lower_priority(spec):
+    led = Ledger(capacity_mbps={"A": 10.0})
+    led.admit(spec("low", min_mbps=8, priority="low"), resources=["A"])
+    d = led.admit(spec("crit", min_mbps=5, priority="critical"), resources=["A"])
+    assert not d.admitted and d.offer["preempt_mbps"] == 3.0
+
+
+def test_release_frees_capacity(spec):
+    led = Ledger(capacity_mbps={"A": 10.0})
+    d = led.admit(spec("f1", min_mbps=6), resources=["A"])
+    assert led.release(d.key) and not led.release(d.key)
+    assert led.free("A") == 10.0
+
+
+def test_reservations_round_trip(tmp_path, spec):
+    led = Ledger(capacity_mbps={"A": 10.0, "B": 5.0})
+    led.admit(spec("f1", min_mbps=3, priority="high"), resources=["A", "B"])
+    path = tmp_path / "ledger.json"
+    led.save(str(path))
+    from admission import open_ledger
+    led2 = open_ledger(str(path), capacity_mbps={"A": 10.0, "B": 5.0})
+    assert led2.usage() == led.usage()
+
+
+def test_concurrent_admissions_never_overbook(spec):
+    led = Ledger(capacity_mbps={"A": 100.0})
+    ok = []
+
+    def worker(n):
+        for i in range(50):
+            if led.admit(spec(f"{n}-{i}", min_mbps=1), resources=["A"]).admitted:
+                ok.append(1)
+
+    ths = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in ths: t.start()
+    for t in ths: t.join()
+    assert len(ok) == 100 and led.free("A") == 0.0
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from async_apply import ApplyError, DomainApply, parse_after, run
+
+
+def step(log, name, ms=0.0, fail=False):
+    async def fn():
+        log.append(("start", name))
+        await asyncio.sleep(ms / 1000.0)
+        log.append(("end", name))
+        if fail:
+            raise RuntimeError(f"{name} falhou")
+        return {"domain": name}
+    return fn
+
+
+def test_parse_after():
+    assert parse_after(["C:B", "C:A", "B: A "]) == {"C": ["B", "A"], "B": ["A"]}
+    assert parse_after(None) == {}
+    for bad in ("C", "C:", ":B"):
+        with pytest.raises(ApplyError):
+            parse_after([bad])
+
+
+def test_independent_domains_overlap_and_after_is_respected():
+    log = []
+    summary = run([DomainApply("A", step(log, "A", 30)), DomainApply("B", step(log, "B", 30)),
+                   DomainApply("C", step(log, "C"), after=["B"])])
+    assert summary.ok
+    # A e B começam antes de qualquer um terminar; C só depois de B
+    assert log[:2] == [("start", "A"), ("start", "B")]
+    assert log.index(("start", "C")) > log.index(("end", "B"))
+    assert summary.critical_path() == ["B", "C"]
+    out = summary.to_json_dict()
+    assert out["control_plane_ms_total"] < out["control_plane_ms_sum"]
+
+
+def test_failed_dependency_skips_dependents_only():
+    log = []
+    summary = run([DomainApply("A", step(log, "A", fail=True)), DomainApply("B", step(log, "B")),
+                   DomainApply("C", step(log, "C"), after=["A"])])
+    r = summary.results
+    assert not summary.ok and r["B"].ok
+    assert r["A"].error == "RuntimeError: A falhou"
+    assert r["C"].skipped and ("start", "C") not in log
+
+
+@pytest.mark.parametrize("applies", [
+    [DomainApply("A", None, after=["B"]), DomainApply("B", None, after=["A"])],
+    [DomainApply("A", None, after=["Z"])],
+    [DomainApply("A", None), DomainApply("A", None)],
+])
+def test_bad_order_is_rejected_before_anything_runs(applies):
+    with pytest.raises(ApplyError):
+        run(applies)
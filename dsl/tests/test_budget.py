@@ -0,0 +1,50 @@
+import pytest
+
+from budget import decompose, load_rtt_csv, path_domains, split_latency
+
+PROFILES = {
+    "A": {"profile_id": "pA", "ports": [{"name": "p1", "speed_mbps": 1000}]},
+    "B": {"profile_id": "pB", "ports": [{"name": "p1", "speed_mbps": 10000}],
+          "meters": {"supported": True, "max_rate_mbps": 50}},
+}
+
+
+def codes(msgs):
+    return sorted(m.code for m in msgs)
+
+
+def test_split_gives_slower_domains_more_headroom():
+    shares, t = split_latency(30.0, [5.0, 15.0])
+    assert shares == pytest.approx([7.5, 22.5]) and t == pytest.approx(0.5)
+    assert sum(shares) == pytest.approx(30.0)
+    assert split_latency(10.0, [0.0, 0.0])[0] == pytest.approx([5.0, 5.0])
+    assert split_latency(10.0, [8.0, 4.0])[0] is None
+
+
+def test_decompose_splits_latency_and_caps_at_bottleneck(spec):
+    doc = spec("f1", scope="multidomain-A-B", min_mbps=10, max_mbps=200, latency_ms=30)
+    assert path_domains(doc) == ["A", "B"]
+    budget, errs = decompose(doc, PROFILES.__getitem__, delays_ms={"A": 5.0, "B": 15.0})
+    assert errs == []
+    assert [d.latency_ms for d in budget.domains] == pytest.approx([7.5, 22.5])
+    # B: porta de 10 Gbps, mas meters só até 50 Mbps
+    assert budget.bottleneck == "B" and budget.max_mbps == 50
+    assert all(d.min_mbps == 10 for d in budget.domains)
+
+
+def test_decompose_reports_infeasible_budgets(spec):
+    doc = spec("f1", scope="multidomain-A-B", min_mbps=100, latency_ms=10)
+    budget, errs = decompose(doc, PROFILES.__getitem__, delays_ms={"A": 8.0, "B": 4.0})
+    assert budget is None and codes(errs) == ["E_BUDGET_BANDWIDTH", "E_BUDGET_LATENCY"]
+    _, errs = decompose(spec("f1", scope="multidomain-A-Z"), PROFILES.__getitem__)
+    assert [(e.code, e.domain) for e in errs] == [("E_BUDGET_PROFILE", "Z")]
+
+
+def test_load_rtt_csv_percentiles(tmp_path):
+    path = tmp_path / "rtt.csv"
+    path.write_text("t_ms,seq,rtt_ms\n" + "".join(f"{i},{i},{i + 1}\n" for i in range(101)))
+    assert load_rtt_csv(str(path), "P50") == 51.0
+    assert load_rtt_csv(str(path)) == 100.0
+    empty = tmp_path / "vazio.csv"
+    empty.write_text("t_ms,seq,rtt_ms\n")
+    assert load_rtt_csv(str(empty)) == 0.0
@@ -0,0 +1,48 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from capability_matrix import ProfileArrays, check_matrix, compare_scalar  # noqa: E402
+
+
+def profile(pid, mode="l2mc_static", max_groups=8, meters=True, max_rate=100.0, speed=1000, queues=4):
+    return {"profile_id": pid,
+            "meters": {"supported": meters, "min_rate_mbps": 1.0, "max_rate_mbps": max_rate},
+            "ports": [{"name": "p0", "speed_mbps": speed}],
+            "queues": {"max_queues": queues},
+            "multicast": {"mode": mode, "max_groups": max_groups}}
+
+
+def test_cells(spec):
+    specs = [spec("bw", min_mbps=50, max_mbps=200), spec("mc", group="G1", priority="low")]
+    profiles = [profile("full"), profile("flood", mode="vlan_flood", queues=2), profile("none", mode="none", meters=False)]
+    m = check_matrix(specs, profiles)
+    assert [[m.status_name(i, j) for j in range(3)] for i in range(2)] == [
+        ["adjust", "adjust", "deny"], ["allow", "adjust", "deny"]]
+    assert m.reason_codes(0, 0) == ["W_CAP_MAX_ABOVE_METER"]
+    assert m.reason_codes(0, 2) == ["E_CAP_METER_UNSUPPORTED"]
+    assert set(m.reason_codes(1, 1)) == {"W_CAP_MC_FLOOD", "W_CAP_PRIORITY_MERGED"}
+
+
+def test_unknown_mc_mode_denies_multicast_only(spec):
+    p = ProfileArrays([profile("odd", mode="bier")])
+    assert p.unknown_modes == {"odd": "bier"}
+    m = check_matrix([spec("uni"), spec("mc", group="G1")], p)
+    assert m.status_name(0, 0) == "allow"
+    assert m.reason_codes(1, 0) == ["E_CAP_MC_MODE_UNKNOWN"]
+
+
+def test_compare_scalar_samples_every_column(spec):
+    specs = [spec(f"f{i}") for i in range(10)]
+    profiles = [profile(f"p{j}") for j in range(4)]
+    m = check_matrix(specs, profiles)
+    seen = set()
+
+    def scalar(s, p):
+        seen.add(p["profile_id"])
+        return ("deny" if p["profile_id"] == "p3" else "allow", s, [])
+
+    r = compare_scalar(m, specs, profiles, scalar, max_cells=8)
+    assert seen == {"p0", "p1", "p2", "p3"}
+    assert r["disagree"] == sum(1 for x in r["mismatches"]) and r["disagree"] > 0
+    assert r["agree"] + r["disagree"] == r["cells"]
@@ -0,0 +1,115 @@
+import io
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+import cli
+from mcast_groups import GroupAllocator
+
+S2 = str(Path(cli.__file__).parent / "specs" / "valid" / "s2_multicast_source_oriented.json")
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """Perfis direto do registro, sem o ensure_capability_valid do pacote l2i."""
+    monkeypatch.setattr(cli, "resolve_profile", cli.profile_registry().resolve)
+    return cli.resolve_profile
+
+
+def write(tmp_path, name, doc):
+    path = tmp_path / name
+    path.write_text(json.dumps(doc))
+    return str(path)
+
+
+def run(capsys, argv):
+    with pytest.raises(SystemExit) as exc:
+        cli.main(argv)
+    return exc.value.code, json.loads(capsys.readouterr().out)
+
+
+def test_apply_rejects_bad_after(tmp_path, capsys, spec):
+    argv = ["apply", "--spec", write(tmp_path, "s.json", spec("f1")),
+            "--targets", write(tmp_path, "t.json", {"A": {"dev": "eth0"}}), "--after", "A"]
+    code, out = run(capsys, argv)
+    assert code == 2 and out["errors"][0]["code"] == "E_APPLY"
+
+
+def test_apply_reports_unknown_target_profile(tmp_path, capsys, spec):
+    targets = {"A": {"dev": "eth0", "profile": "no-such-profile"}}
+    argv = ["apply", "--spec", write(tmp_path, "s.json", spec("f1")),
+            "--targets", write(tmp_path, "t.json", targets)]
+    code, out = run(capsys, argv)
+    assert code == 2
+    assert out["errors"] == [{"code": "E_PROFILE", "domain": "A", "msg": out["errors"][0]["msg"]}]
+    assert "no-such-profile" in out["errors"][0]["msg"]
+
+
+def test_gids_of_a_failed_spec_go_back_to_the_pool(registry, monkeypatch, spec):
+    ga, dom = GroupAllocator(registry), registry("domA")
+    kept, _ = cli.assign_gids(ga, spec("f1", group="G1"), dom)
+    assert kept["new"] == ["domA-universal"]
+    # compose com conflito: o 2º fluxo do grupo não alocou nada, o gid do 1º fica
+    monkeypatch.setattr(cli, "l2i", lambda name: lambda *a: (None, SimpleNamespace(code="E_CONFLICT")))
+    run = lambda stage, fn, *a: fn(*a)
+    assert cli.synth_stage(run, {}, spec("f2", group="G1"), dom, None, None, ga, None)[0] is None
+    assert ga.groups["t/G1"] == kept["gids"]
+    ga.free("t/G1")
+    assert cli.synth_stage(run, {}, spec("f2", group="G1"), dom, None, None, ga, None)[0] is None
+    assert "t/G1" not in ga.groups and ga.usage()["domA-universal"]["used"] == 0
+
+
+def test_mc_delta_leave_frees_pruned_domain_gid(registry, tmp_path, capsys):
+    state = str(tmp_path / "gids.json")
+    cli.main(["mc-delta", "--spec", S2, "--mc-gids", state])
+    assert set(json.loads(Path(state).read_text())["groups"]["/G1"]) == {"A", "B", "C"}
+    capsys.readouterr()
+    cli.main(["mc-delta", "--spec", S2, "--mc-gids", state, "--leave", "C:h4"])
+    assert json.loads(capsys.readouterr().out)["changes"]["C"][0]["op"] == "delete"
+    assert json.loads(Path(state).read_text())["groups"]["/G1"] == {"A": 1, "B": 1}
+
+
+def test_batch_reads_json_and_ndjson_files(tmp_path, spec):
+    write(tmp_path, "a.json", spec("f1"))
+    (tmp_path / "b.ndjson").write_text(json.dumps(spec("f2")) + "\n\n" + json.dumps(spec("f3")) + "\n")
+    docs = list(cli.iter_batch_docs(str(tmp_path / "*")))
+    assert [src.rsplit("/", 1)[-1] for src, _ in docs] == ["a.json", "b.ndjson:1", "b.ndjson:3"]
+    assert [json.loads(text)["flow"]["id"] for _, text in docs] == ["f1", "f2", "f3"]
+
+
+def batch(argv):
+    out = io.StringIO()
+    ok = cli.run_batch(cli.build_arg_parser().parse_args(["batch"] + argv), cache={}, out=out)
+    return ok, [json.loads(ln) for ln in out.getvalue().splitlines()]
+
+
+def test_batch_reports_each_bad_spec_and_goes_on(registry, monkeypatch, spec):
+    def pipeline(doc, profile, **kw):
+        if doc["flow"]["id"] == "deny":
+            return None, {"errors": [{"code": "E_POLICY", "msg": "negado"}]}
+        return {"flow_id": doc["flow"]["id"], "profile": profile["profile_id"]}, None
+    monkeypatch.setattr(cli, "e2e_pipeline", pipeline)
+    lines = [spec("f1", min_mbps=5), "not json", spec("f2"), spec("deny", min_mbps=5), spec("f3", min_mbps=5)]
+    stdin = "".join((ln if isinstance(ln, str) else json.dumps(ln)) + "\n" for ln in lines)
+    monkeypatch.setattr(cli.sys, "stdin", io.StringIO(stdin))
+    ok, recs = batch(["--fast-schema", "--profile", "p4"])
+    assert ok is False
+    assert [(r["seq"], r["source"], r["ok"]) for r in recs] == [
+        (0, "<stdin>:1", True), (1, "<stdin>:2", False), (2, "<stdin>:3", False),
+        (3, "<stdin>:4", False), (4, "<stdin>:5", True)]
+    assert recs[0]["result"] == {"flow_id": "f1", "profile": "p4-bmv2-basic"}
+    assert recs[1]["errors"][0]["code"] == "E_BATCH"
+    assert recs[2]["errors"][0]["code"] == "E_SCHEMA"   # min_mbps 0: barrado antes do pipeline
+    assert recs[3]["errors"] == [{"code": "E_POLICY", "msg": "negado"}]
+
+
+def test_batch_compose_rejects_duplicate_flows_before_the_pipeline(registry, monkeypatch, spec):
+    seen = []
+    monkeypatch.setattr(cli, "e2e_pipeline", lambda doc, profile, **kw: seen.append(doc["flow"]["id"]) or ({"ok": 1}, None))
+    stdin = "".join(json.dumps(d) + "\n" for d in (spec("f1"), spec("f1", min_mbps=5), spec("f2")))
+    monkeypatch.setattr(cli.sys, "stdin", io.StringIO(stdin))
+    ok, recs = batch(["--compose", "--profile", "p4"])
+    assert ok is False and seen == ["f2"]
+    assert [r["errors"][0]["code"] for r in recs[:2]] == ["E_COMPOSE_DUP_FLOW"] * 2 and recs[2]["ok"]
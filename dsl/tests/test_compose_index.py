@@ -0,0 +1,70 @@
+import random
+
+from compose_index import ComposeIndex, compose_many
+
+
+def codes(conflicts):
+    return sorted(c.code for c in conflicts)
+
+
+def test_duplicate_flow(spec):
+    _, confl = compose_many([spec("f"), spec("f")])
+    assert codes(confl) == ["E_COMPOSE_DUP_FLOW"]
+    assert confl[0].flow_keys() == [("t", "s", "f")]
+
+
+def test_removing_a_duplicate_releases_its_own_group(spec):
+    idx = ComposeIndex()
+    idx.add(spec("f", group="G1"))
+    idx.add(spec("f", group="G2"))
+    idx.add(spec("b", scope="y", group="G2"))
+    assert codes(idx.conflicts()) == ["E_COMPOSE_DUP_FLOW", "E_COMPOSE_MC_GROUP"]
+    assert idx.remove("t", "s", "f").mc_group == "G2"
+    assert idx.conflicts() == []
+    assert idx.remove("t", "s", "f").mc_group == "G1"
+    assert idx.remove("t", "y", "b").mc_group == "G2"
+    assert len(idx) == 0 and idx.conflicts() == []
+
+
+def test_oversubscription_starves_lowest_priority_first(spec):
+    specs = [spec("hi", min_mbps=6, priority="high"), spec("lo", min_mbps=6, priority="low"),
+             spec("mid", min_mbps=3, priority="medium")]
+    _, confl = compose_many(specs, 10.0)
+    (c,) = [c for c in confl if c.code == "E_COMPOSE_OVERSUB"]
+    assert c.flows == ["lo"]   # hi + mid = 9 cabem em 10
+
+
+def test_priority_inversion_warning(spec):
+    _, confl = compose_many([spec("a", priority="high", latency_ms=50), spec("b", priority="low", latency_ms=5)])
+    assert codes(confl) == ["W_COMPOSE_PRIO_INVERSION"]
+
+
+def test_mc_group_conflict_keys_every_flow(spec):
+    _, confl = compose_many([spec("a", scope="x", group="G1"), spec("b", scope="y", group="G1"),
+                             spec("c", scope="y", group="G2")])
+    (c,) = confl
+    assert c.code == "E_COMPOSE_MC_GROUP"
+    assert c.flow_keys() == [("t", "x", "a"), ("t", "y", "b")]
+
+
+def test_incremental_matches_rebuild(spec):
+    rnd = random.Random(7)
+    specs = [spec(f"f{i}", min_mbps=rnd.uniform(0, 5), priority=rnd.choice(["high", "medium", "low"]),
+                  latency_ms=rnd.randint(1, 50)) for i in range(200)]
+    idx = ComposeIndex(100.0)
+    idx.extend(specs)
+    idx.conflicts()
+    for i in range(0, 200, 3):
+        idx.remove("t", "s", f"f{i}")
+    idx.add(specs[0])
+    kept = [s for i, s in enumerate(specs) if i % 3] + [specs[0]]
+    ref = ComposeIndex(100.0)
+    ref.extend(kept)
+    assert [c.__dict__ for c in idx.conflicts()] == [c.__dict__ for c in ref.conflicts()]
+
+
+def test_bucket_order_is_sorted_after_bulk_insert(spec):
+    idx = ComposeIndex()
+    idx.extend(spec(f"f{i}", min_mbps=i % 7, priority=["low", "high"][i % 2]) for i in range(50))
+    (b,) = idx._buckets.values()
+    assert b.order == sorted(b.order)
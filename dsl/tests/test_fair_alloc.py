@@ -0,0 +1,47 @@
+import pytest
+
+from fair_alloc import FairAllocator, domain_links
+
+
+def test_domain_links():
+    assert domain_links(["A", "B", "C"]) == ["A-B", "B-C"]
+
+
+def test_guarantees_then_weighted_max_min_ceilings():
+    fa = FairAllocator({"A-B": 10.0})
+    fa.add_many([("x", ["A-B"], 2.0, 10.0, "high"), ("y", ["A-B"], 2.0, 10.0, "low")])
+    x, y = fa.get("x"), fa.get("y")
+    assert (x.guaranteed, y.guaranteed) == (2.0, 2.0)
+    # resíduo 6 dividido 4:1 (pesos high/low)
+    assert x.ceil == pytest.approx(2.0 + 4.8) and y.ceil == pytest.approx(2.0 + 1.2)
+
+
+def test_oversubscribed_link_is_reported():
+    fa = FairAllocator({"A-B": 5.0})
+    fa.add_many([("x", ["A-B"], 4.0, 4.0), ("y", ["A-B"], 4.0, 4.0)])
+    assert fa.oversubscribed == {"A-B"}
+    assert fa.get("x").guaranteed + fa.get("y").guaranteed == pytest.approx(5.0)
+
+
+def test_incremental_add_matches_batch():
+    items = [("x", ["A-B"], 1.0, 8.0), ("y", ["A-B", "B-C"], 2.0, 9.0), ("z", ["B-C"], 1.0, 3.0)]
+    caps = {"A-B": 10.0, "B-C": 6.0}
+    batch = FairAllocator(caps); batch.add_many(items)
+    inc = FairAllocator(caps)
+    for fid, links, lo, hi in items:
+        inc.add(fid, links, lo, hi)
+    for fid, *_ in items:
+        assert inc.get(fid).to_json_dict() == batch.get(fid).to_json_dict()
+
+
+def test_remove_recomputes_only_the_component():
+    fa = FairAllocator({"A-B": 10.0, "C-D": 10.0})
+    fa.add_many([("x", ["A-B"], 1.0, 10.0), ("y", ["A-B"], 1.0, 10.0), ("z", ["C-D"], 1.0, 10.0)])
+    fa.recomputed = 0
+    fa.remove("y")
+    assert fa.get("x").ceil == pytest.approx(10.0) and fa.recomputed == 1
+
+
+def test_unknown_link_is_a_key_error():
+    with pytest.raises(KeyError):
+        FairAllocator({"A-B": 1.0}).add("x", ["B-C"], 1.0)
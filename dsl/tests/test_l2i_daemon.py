@@ -0,0 +1,109 @@
+import asyncio
+import json
+import socket
+from types import SimpleNamespace
+
+import pytest
+
+from l2i_daemon import CompileService, DaemonError, _serve_conn, check_loopback, claim_socket
+
+PLAN = {"flow_id": "f1", "tenant": "t", "scope": "s",
+        "queues": [{"qid": 1, "priority": "high", "min_mbps": 10}],
+        "classifiers": [{"cid": 1, "match": {"dst_ip": "10.0.0.3"}, "qid": 1}]}
+
+
+def pipeline(spec_doc, profile, cache=None):
+    """Compilador de mentira: o spec diz o que acontece."""
+    if spec_doc.get("boom"):
+        raise RuntimeError("estágio quebrou")
+    if spec_doc.get("deny"):
+        return None, {"errors": [{"code": "E_POLICY", "msg": "negado"}]}
+    return dict(PLAN, flow_id=spec_doc.get("flow", "f1")), None
+
+
+class FakeP4rt:
+    def __init__(self):
+        self.written = []
+
+    def client(self, addr, device_id, p4info=None):
+        return SimpleNamespace(addr=addr, device_id=device_id,
+                               write_updates=lambda ups: self.written.append(ups) or {"written": len(ups)})
+
+    def stats(self):
+        return {"writes": len(self.written)}
+
+
+@pytest.fixture
+def svc():
+    s = CompileService(pipeline, lambda doc, name: {"profile_id": name or "p4", "ports": []},
+                       lambda cmd, plan: {"cmd": cmd, "flow": plan["flow_id"]}, p4rt=FakeP4rt())
+    yield s
+    s.pool.shutdown(wait=True)
+
+
+def handle(svc, req):
+    return asyncio.run(svc.handle(req))
+
+
+def test_requests_are_answered_even_when_they_fail(svc):
+    assert handle(svc, {"cmd": "ping"})["result"] == "pong"
+    assert handle(svc, {"cmd": "plan", "spec": {"flow": "x"}})["result"] == {"cmd": "plan", "flow": "x"}
+    assert handle(svc, {"cmd": "plan", "spec": {"deny": True}})["errors"][0]["code"] == "E_POLICY"
+    for req in ({"cmd": "plan", "spec": {"boom": True}}, {"cmd": "nope", "spec": {}}, {"cmd": "p4"},
+                {"cmd": "netconf-apply", "spec": {}, "target": {}}):
+        resp = handle(svc, req)
+        assert not resp["ok"] and resp["errors"][0]["code"] == "E_DAEMON"
+    stats = handle(svc, {"cmd": "stats"})["result"]["commands"]["plan"]
+    assert (stats["count"], stats["errors"]) == (3, 2)
+
+
+def test_p4_apply_writes_only_the_delta(svc):
+    req = {"cmd": "p4-apply", "spec": {}, "target": {"addr": "sw1:9559"}}
+    first = handle(svc, req)
+    assert first["ok"] and first["result"]["summary"] == {"queue.add": 1, "classifier.add": 1}
+    assert handle(svc, req)["result"]["summary"] == {}
+    assert [len(w) for w in svc.p4rt.written] == [1, 0]   # só o classificador vira entrada P4
+
+
+def test_connection_pipelines_requests(svc, tmp_path):
+    path = str(tmp_path / "l2i.sock")
+
+    async def talk():
+        server = await asyncio.start_unix_server(lambda r, w: _serve_conn(svc, r, w), path)
+        reader, writer = await asyncio.open_unix_connection(path)
+        writer.write(b'{"id": 1, "cmd": "plan", "spec": {}}\n\nnot json\n{"id": 2, "cmd": "ping"}\n')
+        await writer.drain()
+        writer.write_eof()
+        lines = [json.loads(ln) async for ln in reader]
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return lines
+
+    resps = asyncio.run(talk())
+    assert sorted((r["id"] is None, r["ok"]) for r in resps) == [(False, True), (False, True), (True, False)]
+    assert {r["id"] for r in resps} == {1, 2, None}
+
+
+def test_tcp_is_loopback_only():
+    for host in ("127.0.0.1", "::1", "localhost"):
+        check_loopback(host)
+    with pytest.raises(DaemonError):
+        check_loopback("0.0.0.0")
+
+
+def test_claim_socket_only_removes_orphaned_sockets(tmp_path):
+    path = tmp_path / "l2i.sock"
+    claim_socket(str(path))   # não existe: nada a fazer
+    path.write_text("dados")
+    with pytest.raises(DaemonError):
+        claim_socket(str(path))
+    path.unlink()
+    live = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    live.bind(str(path))
+    live.listen()
+    with pytest.raises(DaemonError):
+        claim_socket(str(path))
+    live.close()              # o arquivo fica, sem ninguém atendendo
+    claim_socket(str(path))
+    assert not path.exists()
@@ -0,0 +1,39 @@
+import pytest
+
+from mcast_groups import GidPool, GroupAllocator, GroupError, open_allocator
+
+
+def test_gid_pool_reuses_freed_ids():
+    p = GidPool(3)
+    assert [p.alloc(), p.alloc()] == [1, 2]
+    p.free(1)
+    assert p.peek() == 1 and p.alloc() == 1
+    assert p.take(3) and p.alloc() is None
+
+
+def test_same_gid_in_every_domain_when_possible():
+    ga = GroupAllocator(max_groups={"A": 4, "B": 2})
+    assert ga.allocate("G1", ["A", "B"]) == {"A": 1, "B": 1}
+    assert ga.allocate("G1", ["A", "B"]) == {"A": 1, "B": 1}   # idempotente
+    assert ga.allocate("G2", ["A"]) == {"A": 2}
+    assert ga.allocate("G2", ["A", "B"]) == {"A": 2, "B": 2}
+    assert ga.consistent("G1") and ga.consistent("G2")
+
+
+def test_exhausted_domain_rolls_back():
+    ga = GroupAllocator(max_groups={"A": 4, "B": 1})
+    ga.allocate("G1", ["B"])
+    with pytest.raises(GroupError):
+        ga.allocate("G2", ["A", "B"])
+    assert "G2" not in ga.groups and ga.usage()["A"]["used"] == 0
+
+
+def test_free_and_reload(tmp_path):
+    ga = GroupAllocator(max_groups={"A": 4, "B": 4})
+    ga.allocate("G1", ["A", "B"]); ga.allocate("G2", ["A"])
+    assert ga.free("G1", ["B"]) == {"B": 1}
+    path = tmp_path / "gids.json"
+    ga.save(str(path))
+    ga2 = open_allocator(str(path), resolve_profile=lambda d: {"multicast": {"mode": "l2mc_static", "max_groups": 4}})
+    assert ga2.groups == ga.groups
+    assert ga2.allocate("G3", ["A"]) == {"A": 3}
@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from mcast_tree import DomainGraph, TreeError, build_tree, cascade
+
+
+@pytest.fixture
+def graph():
+    return DomainGraph({("A", "B"): 1.0, ("B", "C"): 1.0, ("A", "C"): 5.0})
+
+
+def test_tree_follows_shortest_paths(graph):
+    t = build_tree("A", [("C", "h1"), ("C", "h1"), ("B", "h2")], graph, group="G1")
+    assert t.links == [("A", "B"), ("B", "C")]
+    assert t.nodes["C"].receivers == ["h1"]
+    assert t.receivers() == 2
+
+
+def test_unreachable_receivers_are_reported(graph):
+    t = build_tree("A", [("Z", "h9")], graph, group="G1")
+    assert t.unreachable == {"Z": ["h9"]}
+
+
+def test_cascade():
+    assert cascade(0, 4) == (0, 0)
+    assert cascade(4, 4) == (1, 1)
+    assert cascade(5, 4) == (2, 2)
+
+
+def ops(delta):
+    return {d: [(c.op, c.kind) for c in cs] for d, cs in delta.items()}
+
+
+def test_graft_only_touches_new_branch(graph):
+    t = build_tree("A", [("B", "h1")], graph, group="G1")
+    assert ops(t.graft([("C", "h2"), ("C", "h2")])) == {"C": [("add", "mc_group")], "B": [("modify", "mc_group")]}
+    assert t.nodes["C"].receivers == ["h2"]
+    assert t.graft([("C", "h2")]) == {}
+
+
+def test_prune_releases_empty_branch(graph):
+    t = build_tree("A", [("B", "h1"), ("C", "h2")], graph, group="G1")
+    assert ops(t.prune([("C", "h2")])) == {"C": [("delete", "mc_group")], "B": [("modify", "mc_group")]}
+    assert "C" not in t.nodes
+    t.graft([("C", "h2")])
+    assert t.nodes["C"].receivers == ["h2"]
+
+
+def test_graft_beyond_the_cap_is_undone(graph):
+    t = build_tree("A", [("B", "h1")], graph, lambda d: 1, group="G1")
+    snapshot = json.dumps(t.to_json_dict(), sort_keys=True)
+    with pytest.raises(TreeError):
+        t.graft([("B", "h2")])
+    with pytest.raises(TreeError):
+        t.graft([("C", "h3")])   # B passaria a ter h1 + o ramo de C
+    assert json.dumps(t.to_json_dict(), sort_keys=True) == snapshot
@@ -0,0 +1,110 @@
+import sys
+import types
+
+import pytest
+
+import netconf_pool
+
+
+@pytest.fixture
+def ncclient_calls(monkeypatch):
+    """ncclient de mentira: registra os kwargs de manager.connect."""
+    calls = []
+    manager = types.SimpleNamespace(connect=lambda **kw: calls.append(kw) or object())
+    monkeypatch.setitem(sys.modules, "ncclient", types.SimpleNamespace(manager=manager))
+    return calls
+
+
+def test_hostkey_is_verified_by_default(ncclient_calls):
+    netconf_pool._ncclient_connect({"host": "10.0.0.2", "user": "admin"})
+    assert ncclient_calls[0]["hostkey_verify"] is True
+
+
+def test_target_opts_out_of_hostkey_check(ncclient_calls):
+    netconf_pool._ncclient_connect({"host": "127.0.0.1", "hostkey_verify": False})
+    assert ncclient_calls[0]["hostkey_verify"] is False
+
+
+class FakeManager:
+    """Sessão NETCONF de mentira: conta RPCs, pode cair."""
+
+    opened = 0
+
+    def __init__(self, target):
+        FakeManager.opened += 1
+        self.connected = True
+        self.server_capabilities = ["urn:ietf:params:netconf:base:1.1"]
+        self.session_id = FakeManager.opened
+        self.edits, self.probes, self.closed = [], 0, False
+
+    def edit_config(self, target, config):
+        if not self.connected:
+            raise EOFError("transporte fechado")
+        self.edits.append(config)
+        return type("Reply", (), {"ok": True})()
+
+    def get_config(self, source, filter):
+        self.probes += 1
+        if not self.connected:
+            raise EOFError("transporte fechado")
+
+    def close_session(self):
+        self.closed = True
+
+
+TARGET = {"host": "10.0.0.2", "user": "admin"}
+
+
+@pytest.fixture
+def pool():
+    FakeManager.opened = 0
+    p = netconf_pool.NetconfPool(max_per_target=2, connect=FakeManager)
+    yield p
+    p.close_all()
+
+
+def test_sessions_are_reused(pool):
+    assert pool.edit_config(TARGET, "<a/>")["reused"] is False
+    assert pool.edit_config(TARGET, "<b/>")["reused"] is True
+    assert FakeManager.opened == 1
+    assert pool.capabilities(TARGET) == ["urn:ietf:params:netconf:base:1.1"]
+    st = pool.stats()["admin@10.0.0.2:830"]
+    assert (st["opened"], st["reused"], st["idle"], st["in_use"]) == (1, 1, 1, 0)
+
+
+def test_acquire_waits_for_a_free_slot_then_times_out(pool):
+    a, b = pool.acquire(TARGET), pool.acquire(TARGET)
+    with pytest.raises(netconf_pool.PoolError):
+        pool.acquire(TARGET, wait_s=0.01)
+    pool.release(a)
+    assert pool.acquire(TARGET, wait_s=0.01) is a
+    pool.release(a); pool.release(b)
+
+
+def test_dead_session_is_replaced(pool):
+    s = pool.acquire(TARGET)
+    pool.release(s)
+    s.mgr.connected = False          # caiu enquanto ociosa
+    pool.check_after_s = 0.0
+    t = pool.acquire(TARGET)
+    assert t is not s and s.mgr.closed and FakeManager.opened == 2
+    pool.release(t)
+    assert pool.stats()["admin@10.0.0.2:830"]["health_failures"] == 1
+
+
+def test_transport_error_drops_the_session(pool):
+    with pytest.raises(EOFError):
+        with pool.session(TARGET) as mgr:
+            mgr.connected = False
+            mgr.edit_config(target="running", config="<a/>")
+    assert mgr.closed and pool.stats()["admin@10.0.0.2:830"]["idle"] == 0
+
+
+def test_prune_idle_and_close_all(pool):
+    pool.release(pool.acquire(TARGET))
+    pool.max_idle_s = -1.0
+    assert pool.prune_idle() == 1
+    pool.release(pool.acquire(TARGET))
+    pool.close_all()
+    with pytest.raises(netconf_pool.PoolError):
+        pool.acquire(TARGET)
@@ -0,0 +1,90 @@
+from types import SimpleNamespace
+
+import pytest
+
+from p4rt_client import P4Info, P4RTError, P4RuntimeClient, encode_value, pipeline_cookie
+from plan_delta import diff_plans, render_p4runtime_delta
+
+PLAN = {"flow_id": "f1", "tenant": "t", "scope": "s",
+        "queues": [{"qid": 1, "priority": "high", "min_mbps": 10}],
+        "meters": [{"mid": 1, "kind": "trtcm", "rate_mbps": 10, "ceil_mbps": 20}],
+        "classifiers": [{"cid": 1, "match": {"dst_ip": "10.0.0.3"}, "qid": 1}],
+        "mc_groups": [{"group": "G1", "gid": 5, "ports": ["1", "2"]}]}
+
+
+def test_encode_value_is_canonical():
+    assert encode_value("10.0.0.3", 32) == b"\x0a\x00\x00\x03"
+    assert encode_value("00:00:00:00:01:02", 48) == b"\x01\x02"
+    assert encode_value(0, 9) == b"\x00"
+    with pytest.raises(P4RTError):
+        encode_value(64, 6)
+
+
+def test_pipeline_cookie_tracks_content_not_concatenation():
+    assert pipeline_cookie(b"info", b"json") == pipeline_cookie(b"info", b"json")
+    assert pipeline_cookie(b"info", b"json") != pipeline_cookie(b"info", b"json2")
+    assert pipeline_cookie(b"ab", b"c") != pipeline_cookie(b"a", b"bc")
+
+
+def test_p4info_answers_short_names():
+    named = lambda name, **kw: SimpleNamespace(preamble=SimpleNamespace(name=name, id=kw.pop("id", 1)), **kw)
+    info = P4Info(SimpleNamespace(tables=[named("MyIngress.qos_table", id=7)], actions=[], meters=[]))
+    assert info.table("qos_table") is info.table("MyIngress.qos_table")
+    with pytest.raises(P4RTError):
+        info.meter("flow_meter")
+
+
+def test_build_updates_needs_a_p4info():
+    with pytest.raises(P4RTError):
+        P4RuntimeClient().build_updates([])
+
+
+class Device(P4RuntimeClient):
+    """Cliente sem canal: o device só guarda o cookie do pipeline carregado."""
+
+    def __init__(self, cookie=None):
+        super().__init__()
+        self.device_cookie, self.pushed = cookie, 0
+
+    def pipeline_cookie(self, timeout=0):
+        return self.device_cookie
+
+    def set_pipeline(self, p4info, device_config, cookie, timeout=0):
+        self.device_cookie, self.pushed = cookie, self.pushed + 1
+        return 1.0
+
+
+def test_push_pipeline_skips_when_device_has_the_same_cookie(tmp_path):
+    pytest.importorskip("p4.config.v1.p4info_pb2")
+    info, cfg = tmp_path / "p4info.txt", tmp_path / "bmv2.json"
+    info.write_text("")
+    cfg.write_text("{}")
+    dev = Device()
+    assert dev.push_pipeline(str(info), str(cfg))["action"] == "pushed"
+    assert dev.push_pipeline(str(info), str(cfg))["action"] == "skipped"
+    cfg.write_text('{"v": 2}')
+    assert dev.push_pipeline(str(info), str(cfg))["action"] == "pushed"
+    assert dev.push_pipeline(str(info), str(cfg), force=True)["action"] == "pushed" and dev.pushed == 3
+
+
+def test_build_updates_translates_names_and_skips_undeclared_meters():
+    p4info_pb2 = pytest.importorskip("p4.config.v1.p4info_pb2")
+    pytest.importorskip("p4.v1.p4runtime_pb2")
+    msg = p4info_pb2.P4Info()
+    t = msg.tables.add()
+    t.preamble.id, t.preamble.name = 100, "MyIngress.qos_table"
+    t.match_fields.add(id=1, name="hdr.ipv4.dstAddr", bitwidth=32)
+    a = msg.actions.add()
+    a.preamble.id, a.preamble.name = 200, "MyIngress.set_dscp"
+    a.params.add(id=1, name="new_dscp", bitwidth=6)
+    client = P4RuntimeClient(p4info=P4Info(msg))
+    updates = render_p4runtime_delta(diff_plans(None, PLAN), PLAN, meters={"trtcm": "MyIngress.flow_meter"})["updates"]
+    built, skipped = client.build_updates(updates)
+    # o l2i_minimal.p4 não declara meters: a entrada fica de fora, o lote segue
+    assert [list(s["update"]["entity"]) for s in skipped] == [["meter_entry"]]
+    entry = next(u.entity.table_entry for u in built if u.entity.HasField("table_entry"))
+    assert entry.table_id == 100 and entry.match[0].lpm.value == b"\x0a\x00\x00\x03"
+    assert entry.match[0].lpm.prefix_len == 32 and entry.action.action.action_id == 200
+    mge = next(u.entity.packet_replication_engine_entry.multicast_group_entry for u in built
+               if u.entity.HasField("packet_replication_engine_entry"))
+    assert mge.multicast_group_id == 5 and [r.egress_port for r in mge.replicas] == [1, 2]
@@ -0,0 +1,84 @@
+import copy
+
+import pytest
+
+import plan_ir
+from plan_delta import PortMapError, diff_plans, meter_names, port_map, render_netconf_delta, \
+    render_p4runtime_delta, render_tc_delta, summarize
+
+
+def plan(**over):
+    p = {
+        "flow_id": "f1", "tenant": "t", "scope": "s", "profile_id": "p4",
+        "queues": [{"qid": 1, "name": "q1", "priority": "high", "min_mbps": 10, "max_mbps": 20},
+                   {"qid": 2, "name": "q2", "priority": "low", "min_mbps": 1, "max_mbps": 5}],
+        "classifiers": [{"cid": 1, "flow_id": "f1", "match": {"dst_ip": "10.0.0.3"}, "qid": 1}],
+        "mc_groups": [{"group": "G1", "gid": 5, "ports": ["h2", "B"]}],
+    }
+    p.update(over)
+    return p
+
+
+def test_identical_plans_have_no_delta():
+    assert diff_plans(plan(), plan()) == []
+    assert diff_plans(plan(), plan_ir.encode(plan())) == []
+
+
+def test_delta_is_ordered_deletes_then_upserts():
+    new = plan(queues=[{"qid": 1, "name": "q1", "priority": "high", "min_mbps": 12, "max_mbps": 20}])
+    changes = diff_plans(plan(), new)
+    assert summarize(changes) == {"queue.delete": 1, "queue.modify": 1}
+    assert [c.op for c in changes] == ["delete", "modify"]
+
+
+def test_tc_delta_targets_queue_classes_under_link_class():
+    new = copy.deepcopy(plan())
+    new["queues"][0]["max_mbps"] = 30
+    assert render_tc_delta(diff_plans(plan(), new), "eth0") == [
+        "tc class change dev eth0 parent 1:1 classid 1:11 htb rate 10mbit ceil 30mbit prio 1"]
+    assert render_tc_delta(diff_plans(None, plan()), "eth0")[-1] == (
+        "tc filter add dev eth0 parent 1: protocol ip prio 1 u32 match ip dst 10.0.0.3 flowid 1:11")
+
+
+def test_netconf_delta_uses_replace_for_modify():
+    new = plan(mc_groups=[{"group": "G1", "gid": 5, "ports": ["h2"]}])
+    xml = render_netconf_delta(diff_plans(plan(), new))
+    assert 'nc:operation="replace"' in xml and "<port>B</port>" not in xml
+
+
+def test_p4_delta_maps_replica_ports():
+    profile = {"ports": [{"name": "p0"}, {"name": "p1", "port": 7}]}
+    ports = port_map(profile, {"h2": 3, "B": "p1"})
+    ups = render_p4runtime_delta(diff_plans(None, plan()), plan(), ports)["updates"]
+    mge = ups[0]["entity"]["packet_replication_engine_entry"]["multicast_group_entry"]
+    assert mge == {"multicast_group_id": 5, "replicas": [{"egress_port": 3, "instance": 1},
+                                                         {"egress_port": 7, "instance": 1}]}
+    with pytest.raises(PortMapError):
+        render_p4runtime_delta(diff_plans(None, plan()), plan(), port_map(profile))
+    with pytest.raises(PortMapError):
+        port_map(profile, {"h2": "p9"})
+
+
+def test_p4_gid_change_is_delete_plus_insert():
+    new = plan(mc_groups=[{"group": "G1", "gid": 6, "ports": ["1"]}])
+    ups = render_p4runtime_delta(diff_plans(plan(mc_groups=[{"group": "G1", "gid": 5, "ports": ["1"]}]), new), new)
+    assert [u["type"] for u in ups["updates"]] == ["DELETE", "INSERT"]
+
+
+def test_tc_classifier_modify_is_delete_then_add():
+    new = plan(classifiers=[{"cid": 1, "flow_id": "f1", "match": {"dst_ip": "10.0.0.4"}, "qid": 2}])
+    assert render_tc_delta(diff_plans(plan(), new), "eth0") == [
+        "tc filter del dev eth0 parent 1: protocol ip prio 1",
+        "tc filter add dev eth0 parent 1: protocol ip prio 1 u32 match ip dst 10.0.0.4 flowid 1:12"]
+
+
+def test_p4_meters_need_a_p4info_name():
+    new = plan(meters=[{"mid": 3, "kind": "trtcm", "rate_mbps": 10, "ceil_mbps": 20}])
+    changes = diff_plans(plan(), new)
+    assert render_p4runtime_delta(changes, new)["updates"] == []
+    names = meter_names({"meters": {"types": ["trtcm"], "p4_names": {"trtcm": "MyIngress.flow_meter"}}})
+    [up] = render_p4runtime_delta(changes, new, meters=names)["updates"]
+    assert up["type"] == "MODIFY"
+    assert up["entity"]["meter_entry"]["meter"] == "MyIngress.flow_meter"
+    assert up["entity"]["meter_entry"]["index"] == 3
+    assert meter_names({"meters": {"types": ["tbf"]}}) == {}
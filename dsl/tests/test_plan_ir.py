@@ -0,0 +1,59 @@
+import pytest
+
+import plan_ir
+from plan_ir import PlanShapeError, from_plan
+
+
+def plan(**over):
+    p = {
+        "flow_id": "f1", "tenant": "t", "scope": "s", "profile_id": "p4",
+        "queues": [{"qid": 1, "name": "q1", "priority": "high", "min_mbps": 10, "max_mbps": 20},
+                   {"qid": 2, "name": "q2", "priority": "low", "min_mbps": 1, "max_mbps": 5}],
+        "classifiers": [{"cid": 1, "flow_id": "f1", "match": {"dst_ip": "10.0.0.3"}, "qid": 1}],
+        "mc_groups": [{"group": "G1", "gid": 5, "ports": ["h2", "B"]}],
+    }
+    p.update(over)
+    return p
+
+
+def test_from_plan_accepts_maps_keyed_by_id():
+    ir = from_plan({"queues": {"3": {"name": "q"}}, "meters": {"7": {"kind": "tbf"}}, "multicast": {"enabled": False}})
+    assert [q.qid for q in ir.queues] == [3] and [m.mid for m in ir.meters] == [7] and ir.mc_groups == []
+
+
+@pytest.mark.parametrize("bad", [
+    {"queues": [{"name": "sem id"}]},
+    {"queues": [5]},
+    {"meters": {"x": {"kind": "tbf"}}},
+    {"classifiers": "c1"},
+    {"mc_groups": [{"ports": ["p0"]}]},
+    42,
+])
+def test_from_plan_rejects_unrecognised_shapes(bad):
+    with pytest.raises(PlanShapeError):
+        from_plan(bad)
+
+
+@pytest.mark.parametrize("bad", [
+    {"queues": [{"qid": 1, "priority": 256}]},
+    {"queues": [{"qid": -1}]},
+    {"queues": [{"qid": 1 << 32}]},
+    {"classifiers": [{"cid": 1, "qid": -2}]},
+    {"mc_groups": [{"group": "G1", "gid": -5}]},
+])
+def test_out_of_range_ids_are_shape_errors(bad):
+    with pytest.raises(PlanShapeError):
+        plan_ir.encode(bad)
+
+
+def test_encode_checks_a_hand_built_ir():
+    ir = from_plan(plan())
+    ir.queues[0].priority = -1
+    with pytest.raises(PlanShapeError):
+        plan_ir.encode(ir)
+
+
+def test_binary_round_trip():
+    ir = from_plan(plan())
+    view = plan_ir.decode(plan_ir.encode(ir))
+    assert plan_ir.as_ir(view).to_json_dict() == ir.to_json_dict()
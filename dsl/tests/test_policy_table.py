@@ -0,0 +1,30 @@
+import threading
+from pathlib import Path
+
+from policy_table import PolicyTable
+
+EXAMPLE = Path(__file__).resolve().parents[1] / "policies" / "example.json"
+
+
+def test_first_matching_rule(spec):
+    t = PolicyTable.from_file(str(EXAMPLE))
+    assert t.apply(spec("a", tenant="guest", priority="critical"))[0] == "deny"
+    st, spec2, msgs = t.apply(spec("b", tenant="guest", min_mbps=30, max_mbps=50))
+    assert st == "adjust" and spec2["requirements"]["bandwidth"]["max_mbps"] == 20 and msgs[0].rule == "guest-bw-cap"
+    assert t.apply(spec("c", min_mbps=5))[0] == "allow"
+
+
+def test_hits_are_exact_across_threads(spec):
+    t = PolicyTable.from_file(str(EXAMPLE))
+    docs = [spec("a", tenant="guest", priority="critical"), spec("b", min_mbps=1)]
+
+    def worker():
+        for _ in range(5000):
+            for d in docs:
+                t.decide(d)
+
+    ths = [threading.Thread(target=worker) for _ in range(8)]
+    for th in ths: th.start()
+    for th in ths: th.join()
+    hits = t.hits()
+    assert hits["guest-no-critical"] == 40000 and hits["default"] == 40000
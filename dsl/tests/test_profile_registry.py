@@ -0,0 +1,52 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from profile_registry import PROFILE_DIR, ProfileRegistry, UnknownProfile
+
+
+@pytest.fixture
+def reg(tmp_path):
+    for name in ("domA.json", "legacy-vlan-tc.json", "p4-bmv2-basic.json"):
+        shutil.copy(PROFILE_DIR / name, tmp_path / name)
+    return ProfileRegistry(tmp_path, reload_interval=0)
+
+
+def rewrite(path, **over):
+    doc = json.loads(path.read_text())
+    doc.update(over)
+    path.write_text(json.dumps(doc))
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_aliases_stems_and_ids_resolve_to_the_same_profile(reg):
+    assert reg.resolve("p4") is reg.resolve("p4-bmv2-basic")
+    assert reg.resolve("legacy")["profile_id"] == "legacy-vlan-tc"
+    assert reg.resolve("A") is reg.resolve("domA") is reg.resolve(reg.profile_id("domA"))
+    assert "B" not in reg   # domB.json não foi copiado
+    with pytest.raises(UnknownProfile):
+        reg.resolve("B")
+
+
+def test_find_intersects_indexes(reg):
+    assert reg.find(meter_type="trtcm", min_queues=8) == ["p4-bmv2-basic"]
+    assert reg.find(multicast_mode="l2mc_static", min_port_speed_mbps=10000) == ["p4-bmv2-basic"]
+
+
+def test_hot_reload_picks_up_changed_new_and_removed_files(reg, tmp_path):
+    v = reg.version("p4")
+    rewrite(tmp_path / "p4-bmv2-basic.json", description="editado")
+    assert reg.resolve("p4")["description"] == "editado" and reg.version("p4") == v + 1
+    shutil.copy(PROFILE_DIR / "domB.json", tmp_path / "domB.json")
+    assert "B" in reg
+    (tmp_path / "domA.json").unlink()
+    assert "A" not in reg and "domA" not in reg
+
+
+def test_invalid_profile_stays_out_with_the_reason(reg, tmp_path):
+    rewrite(tmp_path / "legacy-vlan-tc.json", queues={"max_queues": 0})
+    assert "legacy" not in reg
+    assert str(tmp_path / "legacy-vlan-tc.json") in reg.errors
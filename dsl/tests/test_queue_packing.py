@@ -0,0 +1,34 @@
+from queue_packing import latency_class, pack, wfq_weights
+
+PROFILE = {"profile_id": "p", "queues": {"max_queues": 2, "modes": {"wfq": {"weights_min": 1, "weights_max": 100}}}}
+
+
+def test_latency_class_rounds_up():
+    assert latency_class(3) == 5
+    assert latency_class(None) == float("inf")
+
+
+def test_wfq_weights_stay_in_range():
+    w = wfq_weights([1.0, 10.0, 100.0], 1, 100)
+    assert min(w) >= 1 and max(w) <= 100 and w == sorted(w)
+
+
+def test_every_flow_gets_one_of_max_queues(spec):
+    specs = [spec(f"f{i}", min_mbps=i + 1, priority=p, latency_ms=lat)
+             for i, (p, lat) in enumerate([("critical", 5), ("high", 20), ("medium", 100), ("low", None)])]
+    pk = pack(specs, PROFILE)
+    assert len(pk.queues) == 2
+    assert set(pk.assignment) == {("t", "s", f"f{i}") for i in range(4)}
+    assert set(pk.assignment.values()) <= {q["qid"] for q in pk.queues}
+    assert sum(q["flows"] for q in pk.queues) == 4
+
+
+def test_same_flow_id_in_two_scopes_keeps_both(spec):
+    pk = pack([spec("f", scope="a"), spec("f", scope="b")], PROFILE)
+    assert set(pk.assignment) == {("t", "a", "f"), ("t", "b", "f")}
+    assert set(pk.to_json_dict()["assignment"]) == {"t/a/f", "t/b/f"}
+
+
+def test_no_merge_error_when_classes_fit(spec):
+    pk = pack([spec("a", priority="high", latency_ms=5), spec("b", priority="low")], PROFILE)
+    assert pk.error["latency"] == 0.0 and pk.error["priority"] == 0.0
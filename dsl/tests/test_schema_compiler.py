@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+import schema_compiler
+from schema_compiler import SchemaCompileError, compile_schema, generate_source, load_validator, schema_hash
+
+
+@pytest.fixture
+def validator(tmp_path):
+    return load_validator(cache_dir=str(tmp_path))
+
+
+def test_valid_specs_pass(validator, valid_specs):
+    assert valid_specs
+    for doc in valid_specs:
+        assert validator(doc) == []
+
+
+def test_errors_carry_path(validator, valid_specs):
+    doc = json.loads(json.dumps(valid_specs[0]))
+    doc["requirements"]["priority"]["level"] = "urgent"
+    del doc["tenant"]
+    errs = validator(doc)
+    assert {e["code"] for e in errs} == {"E_SCHEMA"}
+    assert "/requirements/priority/level" in {e["path"] for e in errs}
+
+
+@pytest.mark.parametrize("value, ok", [(1, True), (1.0, True), (True, False), ("1", False)])
+def test_const_uses_json_equality(tmp_path, value, ok):
+    v = compile_schema({"type": "object", "properties": {"a": {"const": 1}}}, cache_dir=str(tmp_path))
+    assert (v({"a": value}) == []) is ok
+
+
+@pytest.mark.parametrize("enum, value, ok", [
+    (["x", "y"], "x", True),
+    (["x", "y"], "z", False),
+    ([1, 2.5], 1.0, True),
+    ([1, 2.5], True, False),
+    ([None, True, [1]], [1], True),
+    ([None, True, [1]], 1, False),
+])
+def test_enum_is_type_strict(tmp_path, enum, value, ok):
+    v = compile_schema({"type": "object", "properties": {"a": {"enum": enum}}}, cache_dir=str(tmp_path))
+    assert (v({"a": value}) == []) is ok
+
+
+def test_unsupported_keyword_is_an_error(tmp_path):
+    with pytest.raises(SchemaCompileError):
+        compile_schema({"$ref": "#/definitions/x"}, cache_dir=str(tmp_path))
+
+
+def test_tampered_cache_file_is_regenerated(tmp_path, monkeypatch):
+    schema = {"type": "object", "required": ["a"]}
+    compile_schema(schema, cache_dir=str(tmp_path))
+    path = tmp_path / f"schema_{schema_hash(schema)[:24]}.py"
+    assert path.stat().st_mode & 0o077 == 0
+    path.write_text(path.read_text() + "\nvalidate = lambda doc: []\n")
+    monkeypatch.setattr(schema_compiler, "_loaded", {})
+    v = compile_schema(schema, cache_dir=str(tmp_path))
+    assert v({}) != []
+    assert path.read_text() == generate_source(schema)
+
+
+def test_capability_schema_accepts_p4_meter_names(tmp_path):
+    validator = load_validator(schema_compiler.CAPABILITY_SCHEMA, cache_dir=str(tmp_path))
+    profile = json.loads((schema_compiler.SCHEMA_DIR.parent / "profiles" / "p4-bmv2-basic.json").read_text())
+    assert validator(profile) == []
+    profile["meters"]["p4_names"] = {"trtcm": "MyIngress.flow_meter"}
+    assert validator(profile) == []
@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+import stage_cache
+from stage_cache import StageCache, Uncacheable, canonical_hash
+
+
+class Opaque:
+    __slots__ = ("x",)
+
+    def __init__(self, x):
+        self.x = x
+
+
+def double(x):
+    return {"v": x["v"] * 2}
+
+
+def test_canonical_hash_is_order_independent():
+    assert canonical_hash({"a": 1, "b": [1, 2]}) == canonical_hash({"b": [1, 2], "a": 1})
+    assert canonical_hash({1, 2, 3}) == canonical_hash({3, 2, 1})
+
+
+def test_object_without_canonical_form_is_not_keyed_by_repr():
+    with pytest.raises(Uncacheable):
+        canonical_hash(Opaque(1))
+
+
+def test_uncacheable_input_runs_the_stage_directly():
+    c = StageCache()
+    calls = []
+
+    def stage(o):
+        calls.append(o.x)
+        return o.x
+
+    assert c.run("synth", stage, Opaque(1)) == 1
+    assert c.run("synth", stage, Opaque(1)) == 1
+    assert calls == [1, 1]
+    assert c.stats["uncacheable"] == 2 and c.stats["hits_mem"] == 0
+
+
+def test_memory_hit_returns_a_fresh_copy():
+    c = StageCache()
+    first = c.run("compose", double, {"v": 2})
+    first["v"] = 99
+    assert c.run("compose", double, {"v": 2}) == {"v": 4}
+    assert c.stats["hits_mem"] == 1 and c.stats["misses"] == 1
+
+
+def test_key_depends_on_stage_version(monkeypatch):
+    c = StageCache()
+    k1 = c.key("policies", double, ({"v": 1},))
+    monkeypatch.setitem(stage_cache.STAGE_VERSIONS, "policies", 99)
+    assert c.key("policies", double, ({"v": 1},)) != k1
+
+
+def test_package_fingerprint_covers_every_module(tmp_path, monkeypatch):
+    pkg = tmp_path / "fppkg"
+    pkg.mkdir()
+    (pkg / "__init__.py").write_text("")
+    (pkg / "helper.py").write_text("X = 1\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    import fppkg  # noqa: F401
+    before = stage_cache._package_fingerprint("fppkg")
+    (pkg / "helper.py").write_text("X = 2\n")
+    assert stage_cache._package_fingerprint("fppkg") != before
+
+
+def test_disk_level_is_private_and_authenticated(tmp_path):
+    d = tmp_path / "cache"
+    StageCache(cache_dir=str(d)).run("compose", double, {"v": 3})
+    assert os.stat(d).st_mode & 0o077 == 0
+    assert os.stat(d / "hmac.key").st_mode & 0o077 == 0
+
+    c = StageCache(cache_dir=str(d))
+    assert c.run("compose", double, {"v": 3}) == {"v": 6}
+    assert c.stats["hits_disk"] == 1
+
+    blob = next(p for p in d.rglob("*.pkl"))
+    data = bytearray(blob.read_bytes())
+    data[-2] ^= 0xFF
+    blob.write_bytes(bytes(data))
+    c = StageCache(cache_dir=str(d))
+    assert c.run("compose", double, {"v": 3}) == {"v": 6}
+    assert c.stats["bad_mac"] == 1 and c.stats["hits_disk"] == 0
+
+
+def test_shared_cache_dir_disables_disk_level(tmp_path):
+    d = tmp_path / "cache"
+    d.mkdir()
+    (d / "hmac.key").write_bytes(b"k" * 32)
+    os.chmod(d / "hmac.key", 0o644)
+    c = StageCache(cache_dir=str(d))
+    assert c.cache_dir is None and c.disk_error
@@ -0,0 +1,125 @@
+import asyncio
+import sys
+import textwrap
+
+import pytest
+
+from tc_batch import TcBatch, TcBatchError, invert, parse_errors, render_batch
+
+PLAN = {"flow_id": "f1", "tenant": "t", "scope": "s",
+        "queues": [{"qid": 1, "priority": "high", "min_mbps": 10, "max_mbps": 20},
+                   {"qid": 2, "priority": "low", "min_mbps": 1, "max_mbps": 5}],
+        "classifiers": [{"cid": 1, "match": {"dst_ip": "10.0.0.3"}, "qid": 1}]}
+
+
+@pytest.fixture
+def fake_tc(tmp_path):
+    """
+    `tc -batch -` de mentira: registra as linhas e falha as que contêm `fail`;
+    crash=True sai com erro sem dizer a linha (fora do rollback).
+    """
+    log = tmp_path / "tc.log"
+
+    def make(fail=None, crash=False):
+        script = tmp_path / "tc.py"
+        script.write_text(textwrap.dedent(f"""\
+            import sys
+            force = "-force" in sys.argv
+            rc = 0
+            with open({str(log)!r}, "a") as log:
+                for n, line in enumerate(sys.stdin, 1):
+                    line = line.strip()
+                    if {fail!r} and {fail!r} in line:
+                        sys.stderr.write("RTNETLINK answers: File exists\\nCommand failed -:%d\\n" % n)
+                        rc = 1
+                        if not force:
+                            break
+                        continue
+                    log.write(("F " if force else "  ") + line + "\\n")
+            if {crash!r} and not force:
+                sys.stderr.write("tc: killed\\n")
+                rc = 137
+            sys.exit(rc)
+            """))
+        return [sys.executable, str(script)]
+
+    make.log = log
+    return make
+
+
+def test_full_render_builds_hierarchy():
+    lines = render_batch(PLAN, "eth0", link_mbps=100)
+    assert [ln.text for ln in lines[:2]] == ["qdisc add dev eth0 root handle 1: htb",
+                                            "class add dev eth0 parent 1: classid 1:1 htb rate 100mbit ceil 100mbit"]
+    assert [ln.to_json_dict()["kind"] for ln in lines] == ["qdisc", "class", "queue", "queue", "classifier"]
+
+
+def test_reset_requires_previous_plan():
+    with pytest.raises(TcBatchError):
+        render_batch(PLAN, "eth0", reset=True)
+    lines = render_batch(PLAN, "eth0", prev=PLAN, reset=True)
+    assert lines[0].text == "qdisc del dev eth0 root"
+    assert [ln.text for ln in invert(lines[:1], "eth0")] == [ln.text for ln in render_batch(PLAN, "eth0")]
+
+
+def test_parse_errors_points_at_plan_element():
+    lines = render_batch(PLAN, "eth0")
+    errs = parse_errors("RTNETLINK answers: File exists\nCommand failed -:4\n", lines)
+    assert errs == [{"line": 4, "msg": "RTNETLINK answers: File exists", "cmd": lines[3].text,
+                     "kind": "queue", "op": "add", "key": 2}]
+
+
+def test_success(fake_tc):
+    res = TcBatch("eth0", tc=fake_tc()).apply(PLAN)
+    assert res.ok and res.applied == 5 and not res.rolled_back
+    assert len(fake_tc.log.read_text().splitlines()) == 5
+
+
+def test_failure_rolls_back_applied_lines(fake_tc):
+    res = TcBatch("eth0", tc=fake_tc(fail="classid 1:12 ")).apply(PLAN)
+    assert not res.ok and res.applied == 3 and res.rolled_back
+    assert res.errors[0]["line"] == 4 and res.errors[0]["key"] == 2
+    undo = [ln[2:] for ln in fake_tc.log.read_text().splitlines() if ln.startswith("F ")]
+    assert undo == ["class del dev eth0 parent 1:1 classid 1:11", "qdisc del dev eth0 root"]
+
+
+def test_force_rolls_back_every_line_that_passed(fake_tc):
+    res = TcBatch("eth0", force=True, tc=fake_tc(fail="classid 1:12 ")).apply(PLAN)
+    assert res.applied == 4
+    undo = [ln[2:] for ln in fake_tc.log.read_text().splitlines()[4:]]
+    assert undo[0].startswith("filter del dev eth0") and undo[-1] == "qdisc del dev eth0 root"
+
+
+def test_unknown_failure_point_rolls_back_every_line(fake_tc):
+    res = TcBatch("eth0", tc=fake_tc(crash=True)).apply(PLAN)
+    assert not res.ok and res.applied is None and res.rolled_back
+    assert res.errors == [{"line": None, "msg": "tc: killed"}]
+    assert res.to_json_dict()["applied"] is None
+    undo = [ln[2:] for ln in fake_tc.log.read_text().splitlines() if ln.startswith("F ")]
+    assert undo == [ln.text for ln in invert(render_batch(PLAN, "eth0"), "eth0")]
+    assert undo[-1] == "qdisc del dev eth0 root"
+
+
+def test_failed_reset_restores_previous_config(fake_tc):
+    new = dict(PLAN, queues=PLAN["queues"] + [{"qid": 3, "min_mbps": 1}])
+    res = TcBatch("eth0", tc=fake_tc(fail="classid 1:13 ")).apply(new, prev=PLAN, reset=True)
+    assert res.rolled_back and not res.rollback_errors
+    undo = [ln[2:] for ln in fake_tc.log.read_text().splitlines() if ln.startswith("F ")]
+    # desfaz o que entrou do plano novo e recria o anterior
+    assert undo[-5:] == [ln.text for ln in render_batch(PLAN, "eth0", link_mbps=None)]
+
+
+def test_async_matches_sync(fake_tc):
+    res = asyncio.run(TcBatch("eth0", tc=fake_tc(fail="classid 1:12 ")).apply_async(PLAN))
+    assert not res.ok and res.rolled_back and res.applied == 3
+
+
+def test_classifier_modify_and_its_rollback_replace_the_filter():
+    new = dict(PLAN, classifiers=[{"cid": 1, "match": {"dst_ip": "10.0.0.4"}, "qid": 2}])
+    lines = render_batch(new, "eth0", prev=PLAN)
+    assert [(ln.text, ln.change.op) for ln in lines] == [
+        ("filter del dev eth0 parent 1: protocol ip prio 1", "delete"),
+        ("filter add dev eth0 parent 1: protocol ip prio 1 u32 match ip dst 10.0.0.4 flowid 1:12", "add")]
+    assert [ln.text for ln in invert(lines, "eth0")] == [
+        "filter del dev eth0 parent 1: protocol ip prio 1",
+        "filter add dev eth0 parent 1: protocol ip prio 1 u32 match ip dst 10.0.0.3 flowid 1:11"]
@@ -3,20 +3,46 @@
 compatibility_map.py - Ferramenta auxiliar para verificar quais specs
 são aceitos (allow), ajustados (adjust) ou negados (deny) em cada domínio.
 
+Cada spec é validado e passa por apply_policies uma única vez (as políticas
+não dependem do domínio); só check_capabilities roda por célula
+(spec × perfil), distribuído em um pool de processos. As células ficam em
+cache em disco, chaveadas por (hash do spec, hash do perfil) e pela impressão
+digital do código l2i, de modo que alterar um spec recalcula só a sua linha e
+alterar um perfil recalcula só a sua coluna.
+
 Uso:
     python3 tools/compatibility_map.py
+    python3 tools/compatibility_map.py --domains A,B,C --legacy
+    python3 tools/compatibility_map.py --status deny --domain domC
 
 Saída:
-    Um JSON com o mapa de compatibilidade.
+    Um JSON colunar com o mapa de compatibilidade:
+      {"specs": [...], "domains": [...], "profile_ids": [...],
+       "status": [[...]], "detail": [[...]], "stats": {...}}
+    status[i][j] ∈ allow | adjust | deny | invalid (spec i no domínio j);
+    detail[i][j] é o código da mensagem que decidiu a célula (ou null).
+    Com --spec/--domain/--status, imprime só as células que casam.
 """
 
-import os, json, dataclasses
+import os, sys, json, time, argparse, dataclasses
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob
 from pathlib import Path
 
+BASE = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE))
+
 from l2i.validator import validate_spec
 from l2i.capabilities import check_capabilities
 from l2i.policies import apply_policies
 
+from profile_registry import PROFILE_DIR, ProfileRegistry
+from stage_cache import canonical_hash, code_fingerprint
+
+CACHE_VERSION = 1
+COLS_PER_TASK = 64   # perfis por tarefa do pool: amortiza o envio do spec
+ROW_TTL_S = 30 * 86400   # linha sem uso há mais que isso sai do cache
+
 # Helper para serializar dataclasses (ex: ErrorMsg)
 def json_default(o):
     if dataclasses.is_dataclass(o):
@@ -25,44 +51,269 @@ def json_default(o):
         return o.__dict__
     return str(o)
 
-BASE = Path(__file__).resolve().parents[1]
-spec_dir = BASE / "v0/specs/valid"
-profiles = {
-    "A": json.load(open(BASE / "dsl/profiles/domA.json")),
-    "B": json.load(open(BASE / "dsl/profiles/domB.json")),
-    "C": json.load(open(BASE / "dsl/profiles/domC.json")),
-}
 
-results = {}
+def _detail(msgs):
+    if not msgs:
+        return None
+    m = msgs[0]
+    return m.code if hasattr(m, "code") else str(m)
 
-for spec_file in sorted(spec_dir.glob("*.json")):
-    spec_name = spec_file.name
-    spec = json.load(open(spec_file))
-    cspec, errs = validate_spec(spec)
 
-    if errs:
-        results[spec_name] = {"validation": [e.code for e in errs]}
-        continue
+def classify(status, msgs):
+    """(status, detalhe) de uma célula a partir da saída de check_capabilities."""
+    if status == "deny":
+        return "deny", _detail(msgs)
+    if status == "adjust":
+        return "adjust", _detail(msgs)
+    return "allow", None
+
+
+# ------------------------- worker do pool -------------------------
+
+_PROFILES = {}
+
+def _init_worker(profiles):
+    # perfis enviados uma vez por processo, não a cada tarefa
+    _PROFILES.update(profiles)
+
+def _check_block(spec, profile_hashes):
+    out = []
+    for ph in profile_hashes:
+        status, _, msgs = check_capabilities(spec, _PROFILES[ph])
+        out.append(classify(status, msgs))
+    return out
+
+
+# ------------------------- cache de células -------------------------
+
+def _default_cache_dir():
+    return os.environ.get("L2I_CACHE_DIR") or os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "l2i")
+
+
+def code_version(vectorized=False):
+    # o resultado de uma célula muda se o código que a decide mudar
+    fns = [validate_spec, apply_policies, check_capabilities]
+    if vectorized:
+        from capability_matrix import check_matrix
+        fns[-1] = check_matrix
+    return ":".join([f"v{CACHE_VERSION}"] + [code_fingerprint(fn) for fn in fns])
+
+
+def load_cache(path, code):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = None
+    if not isinstance(data, dict) or data.get("code") != code:
+        return {"code": code, "rows": {}, "cells": {}}
+    return data
+
+
+def save_cache(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
 
+def prune(cache, live_cols, now=None):
+    # colunas de perfis que não existem mais no registro e linhas de specs
+    # não vistas há ROW_TTL_S (versões antigas de um spec editado)
+    now = time.time() if now is None else now
+    cache["rows"] = {h: v for h, v in cache["rows"].items() if now - v.get("seen", 0) < ROW_TTL_S}
+    live_rows = cache["rows"]
+    cache["cells"] = {k: v for k, v in cache["cells"].items()
+                      if k.partition(":")[0] in live_rows and k.partition(":")[2] in live_cols}
+
+
+# ------------------------- mapa -------------------------
+
+def spec_row(doc):
+    """Validação + políticas de um spec: (veredito da linha, spec pós-políticas)."""
+    cspec, errs = validate_spec(doc)
+    if errs:
+        return {"status": "invalid", "detail": ",".join(e.code for e in errs)}, None
     # garantir que cspec seja dict
     if not isinstance(cspec, dict):
         cspec = dataclasses.asdict(cspec)
+    status, spec2, msgs = apply_policies(cspec)
+    if status == "deny":
+        return {"status": "deny", "detail": _detail(msgs)}, None
+    return {"status": "allow"}, spec2
+
+
+def _vector_blocks(tasks, profiles):
+    # todas as células pendentes numa passada de capability_matrix.check_matrix
+    from capability_matrix import STATUS, check_matrix
+    cols = sorted({j for _, cs, _ in tasks for j in cs})
+    pos = {j: k for k, j in enumerate(cols)}
+    m = check_matrix([spec2 for _, _, spec2 in tasks], [profiles[j][1] for j in cols])
+    out = []
+    for r, (_, cs, _) in enumerate(tasks):
+        row = []
+        for j in cs:
+            codes = m.reason_codes(r, pos[j])
+            row.append((STATUS[int(m.status[r, pos[j]])], codes[0] if codes else None))
+        out.append(row)
+    return out
 
-    results[spec_name] = {}
-    for dom, prof in profiles.items():
-        status, spec2, msgs = apply_policies(cspec)
-        if status == "deny":
-            results[spec_name][dom] = f"deny ({msgs[0].code})"
+
+def build_map(spec_files, profiles, cache, workers=None, vectorized=False):
+    """
+    Preenche a matriz specs × perfis, reaproveitando as células do `cache`
+    (alterado no lugar). `profiles` é uma lista de (rótulo, perfil).
+    Com vectorized=True as células saem de capability_matrix (NumPy) em vez
+    de check_capabilities.
+    """
+    t0 = time.perf_counter()
+    docs = []
+    for path in spec_files:
+        with open(path, "r", encoding="utf-8") as f:
+            docs.append(json.load(f))
+    row_h = [canonical_hash(d)[:24] for d in docs]
+    col_h = [canonical_hash(p)[:24] for _, p in profiles]
+    n, m = len(docs), len(profiles)
+    status = [[None] * m for _ in range(n)]
+    detail = [[None] * m for _ in range(n)]
+    rows, cells = cache["rows"], cache["cells"]
+    stats = {"cells": n * m, "cached": 0, "computed": 0, "policies_run": 0}
+
+    tasks = []   # (linha, colunas, spec pós-políticas)
+    for i, doc in enumerate(docs):
+        verdict = rows.get(row_h[i])
+        missing = [j for j in range(m) if f"{row_h[i]}:{col_h[j]}" not in cells]
+        spec2 = None
+        fresh = verdict is None or (verdict["status"] == "allow" and missing)
+        if fresh:
+            verdict, spec2 = spec_row(doc)
+            rows[row_h[i]] = verdict
+            stats["policies_run"] += 1
+        verdict["seen"] = int(time.time())
+        if verdict["status"] != "allow":
+            # inválido ou negado por política: a linha inteira herda o veredito
+            status[i] = [verdict["status"]] * m
+            detail[i] = [verdict.get("detail")] * m
+            stats["computed" if fresh else "cached"] += m
             continue
-        status, spec3, msgs = check_capabilities(spec2, prof)
-        if status == "deny":
-            if msgs and hasattr(msgs[0], "code"):
-                results[spec_name][dom] = f"deny ({msgs[0].code})"
-            else:
-                results[spec_name][dom] = "deny"
-        elif status == "adjust":
-            results[spec_name][dom] = f"adjust ({msgs[0]})"
+        for j in range(m):
+            cell = cells.get(f"{row_h[i]}:{col_h[j]}")
+            if cell is not None:
+                status[i][j], detail[i][j] = cell
+                stats["cached"] += 1
+        for k in range(0, len(missing), COLS_PER_TASK):
+            tasks.append((i, missing[k:k + COLS_PER_TASK], spec2))
+
+    if tasks:
+        needed = {col_h[j]: profiles[j][1] for _, cols, _ in tasks for j in cols}
+        if vectorized:
+            results = _vector_blocks(tasks, profiles)
+        elif workers == 1 or len(tasks) == 1:
+            _init_worker(needed)
+            results = [_check_block(spec2, [col_h[j] for j in cols]) for _, cols, spec2 in tasks]
         else:
-            results[spec_name][dom] = "allow"
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(needed,)) as pool:
+                futs = [pool.submit(_check_block, spec2, [col_h[j] for j in cols])
+                        for _, cols, spec2 in tasks]
+                results = [f.result() for f in futs]
+        for (i, cols, _), res in zip(tasks, results):
+            for j, cell in zip(cols, res):
+                status[i][j], detail[i][j] = cell
+                cells[f"{row_h[i]}:{col_h[j]}"] = list(cell)
+                stats["computed"] += 1
+
+    stats["elapsed_ms"] = round((time.perf_counter() - t0) * 1000.0, 3)
+    return {
+        "specs": [Path(p).name for p in spec_files],
+        "domains": [label for label, _ in profiles],
+        "profile_ids": [p["profile_id"] for _, p in profiles],
+        "status": status,
+        "detail": detail,
+        "stats": stats,
+    }
+
+
+def query(cmap, specs=None, domains=None, statuses=None):
+    """Células que casam com os filtros (None = qualquer)."""
+    out = []
+    for i, s in enumerate(cmap["specs"]):
+        if specs and s not in specs:
+            continue
+        for j, d in enumerate(cmap["domains"]):
+            if domains and d not in domains and cmap["profile_ids"][j] not in domains:
+                continue
+            st = cmap["status"][i][j]
+            if statuses and st not in statuses:
+                continue
+            out.append({"spec": s, "domain": d, "status": st, "detail": cmap["detail"][i][j]})
+    return out
+
+
+def legacy_view(cmap):
+    # formato antigo: {spec: {domínio: "allow" | "adjust (...)" | "deny (...)"}}
+    out = {}
+    for i, s in enumerate(cmap["specs"]):
+        if cmap["status"][i] and cmap["status"][i][0] == "invalid":
+            out[s] = {"validation": (cmap["detail"][i][0] or "").split(",")}
+            continue
+        out[s] = {}
+        for j, d in enumerate(cmap["domains"]):
+            st, det = cmap["status"][i][j], cmap["detail"][i][j]
+            out[s][d] = f"{st} ({det})" if det else st
+    return out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="mapa de compatibilidade specs × domínios")
+    ap.add_argument("--specs", default=str(BASE / "specs/valid/*.json"), help="glob dos specs")
+    ap.add_argument("--profiles", default=str(PROFILE_DIR), help="diretório dos perfis")
+    ap.add_argument("--domains", help="perfis (profile_id, arquivo ou apelido) separados por vírgula; default: todos")
+    ap.add_argument("--workers", type=int, default=None, help="processos do pool (default: nº de CPUs; 1 = sem pool)")
+    ap.add_argument("--cache-dir", default=_default_cache_dir(), help="onde guardar as células (default: $L2I_CACHE_DIR ou ~/.cache/l2i)")
+    ap.add_argument("--vectorized", action="store_true", help="decide as células com capability_matrix (NumPy, limites numéricos dos perfis) em vez de check_capabilities")
+    ap.add_argument("--no-cache", action="store_true", help="recalcula tudo e não grava o cache")
+    ap.add_argument("--spec", action="append", help="filtra por nome de arquivo do spec (repetível)")
+    ap.add_argument("--domain", action="append", help="filtra por domínio (repetível)")
+    ap.add_argument("--status", action="append", choices=["allow", "adjust", "deny", "invalid"], help="filtra por status (repetível)")
+    ap.add_argument("--legacy", action="store_true", help="saída no formato aninhado antigo {spec: {domínio: status}}")
+    ap.add_argument("--out", help="grava o JSON em arquivo em vez de stdout")
+    args = ap.parse_args(argv)
+
+    reg = ProfileRegistry(args.profiles)
+    names = args.domains.split(",") if args.domains else reg.ids()
+    profiles = [(name, reg.resolve(name)) for name in names]
+    spec_files = sorted(glob(args.specs))
+
+    code = code_version(args.vectorized)
+    cache_path = os.path.join(args.cache_dir, "compat_cells_vec.json" if args.vectorized else "compat_cells.json")
+    cache = {"code": code, "rows": {}, "cells": {}} if args.no_cache else load_cache(cache_path, code)
+    cmap = build_map(spec_files, profiles, cache, workers=args.workers, vectorized=args.vectorized)
+    prune(cache, {canonical_hash(p)[:24] for _, p in reg.items()})
+    if not args.no_cache:
+        try:
+            save_cache(cache_path, cache)
+        except OSError as e:
+            sys.stderr.write(f"[compat] cache não gravado: {e}\n")
+    st = cmap["stats"]
+    sys.stderr.write(f"[compat] {len(spec_files)} specs × {len(profiles)} perfis: "
+                     f"{st['computed']} calculadas, {st['cached']} do cache, {st['elapsed_ms']} ms\n")
+
+    if args.spec or args.domain or args.status:
+        result = query(cmap, args.spec, args.domain, args.status)
+    elif args.legacy:
+        result = legacy_view(cmap)
+    else:
+        result = cmap
+    text = json.dumps(result, indent=2, default=json_default, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
 
-print(json.dumps(results, indent=2, default=json_default))
+if __name__ == "__main__":
+    main()